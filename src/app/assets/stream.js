@@ -0,0 +1,105 @@
+// Muestra la respuesta del asistente a medida que el servidor la genera (server-sent events)
+(function () {
+    let source = null;
+
+    // identificador anónimo del navegador para el perfil de recomendaciones
+    function userId() {
+        let id = window.localStorage.getItem("forkpilot-user");
+        if (!id) {
+            id = (window.crypto && crypto.randomUUID) ? crypto.randomUUID() : String(Date.now()) + Math.random().toString(16).slice(2);
+            window.localStorage.setItem("forkpilot-user", id);
+        }
+        return id;
+    }
+
+    function loadRecommendations() {
+        const list = document.getElementById("recommendations-list");
+        if (!list) {
+            return;
+        }
+        fetch("/api/recommendations?user=" + encodeURIComponent(userId()))
+            .then(function (response) { return response.json(); })
+            .then(function (data) {
+                list.innerHTML = "";
+                data.recommendations.forEach(function (doc) {
+                    const item = document.createElement("li");
+                    const link = document.createElement("a");
+                    link.textContent = doc.title;
+                    link.href = doc.url;
+                    link.target = "_blank";
+                    item.appendChild(link);
+                    list.appendChild(item);
+                });
+            })
+            .catch(function () {});
+    }
+
+    function renderSources(container, sources) {
+        container.innerHTML = "";
+        sources.forEach(function (doc) {
+            const item = document.createElement("div");
+            item.className = "document-item";
+            const title = document.createElement("strong");
+            title.textContent = doc.title;
+            const link = document.createElement("a");
+            link.textContent = "Acceder a la receta";
+            link.href = doc.url;
+            link.target = "_blank";
+            link.className = "link-item";
+            item.appendChild(title);
+            item.appendChild(document.createElement("br"));
+            item.appendChild(link);
+            container.appendChild(item);
+        });
+    }
+
+    function search() {
+        const input = document.getElementById("user-query");
+        const responseContainer = document.getElementById("response-container");
+        const linksContainer = document.getElementById("links-container");
+        const query = input && input.value.trim();
+        if (!query || !responseContainer || !linksContainer) {
+            return;
+        }
+        if (source) {
+            source.close();
+        }
+
+        const text = document.createElement("div");
+        text.className = "response-text";
+        responseContainer.innerHTML = "";
+        responseContainer.appendChild(text);
+        linksContainer.innerHTML = "";
+
+        source = new EventSource("/api/stream?query=" + encodeURIComponent(query) + "&user=" + encodeURIComponent(userId()));
+        source.addEventListener("sources", function (e) {
+            renderSources(linksContainer, JSON.parse(e.data));
+        });
+        source.addEventListener("token", function (e) {
+            text.textContent += JSON.parse(e.data);
+        });
+        source.addEventListener("done", function () {
+            source.close();
+            loadRecommendations();
+        });
+        source.onerror = function () {
+            source.close();
+        };
+    }
+
+    // el layout lo renderiza Dash después de cargar la página
+    let attempts = 0;
+    const waitForSidebar = setInterval(function () {
+        attempts += 1;
+        if (document.getElementById("recommendations-list") || attempts > 50) {
+            clearInterval(waitForSidebar);
+            loadRecommendations();
+        }
+    }, 200);
+
+    document.addEventListener("click", function (e) {
+        if (e.target && e.target.closest && e.target.closest("#search-button")) {
+            search();
+        }
+    });
+})();
@@ -1,45 +1,43 @@
+from dash import ctx, no_update
 from dash.dependencies import Input, Output, State
-from dash import html
+
+# sondeos sin estado que se esperan tras una búsqueda a que se encole su crawl (2 s cada uno)
+MAX_EMPTY_POLLS = 15
 
 def register_callbacks(app, rag): 
     @app.callback(
-        [Output("response-container", "children"),
-         Output("links-container", "children")],
-        [Input("search-button", "n_clicks")],
+        [Output("crawl-status", "children"),
+         Output("crawl-status-interval", "disabled"),
+         Output("crawl-status-interval", "n_intervals")],
+        [Input("search-button", "n_clicks"),
+         Input("crawl-status-interval", "n_intervals")],
         [State("user-query", "value")]
     )
-    def generate_response(n_clicks, query):
+    def poll_crawl_status(n_clicks, n_intervals, query):
         """
-        Responde a la consulta del usuario y le proporciona los enlaces de los documentos 
-        que utilizo para la respuesta
-            
-            n_clicks (int): Clics en el botón de búsqueda.
-            query (str): Consulta ingresada por el usuario.
+        Consulta periódicamente el estado del crawl en segundo plano de la consulta
 
         Devuelve:
             tuple:
-                - html.Div: Contenedor con la respuesta generada.
-                - list[html.Div]: Lista de enlaces a los documentos fuente únicos.
+                - str: Mensaje con el progreso del crawl.
+                - bool: Si el intervalo de consulta debe desactivarse.
+                - int: Sondeos desde la búsqueda (se reinicia con cada clic).
         """
-        if not n_clicks or not query:
-            return "", ""
-
-        response, docs = rag.generate(query)
-        response_display = html.Div(response, className="response-text")
-
-        unique_docs = {}
-        for doc in docs:
-            uid = doc.metadata.get("id")
-            if uid and uid not in unique_docs:
-                unique_docs[uid] = doc
-
-        links_display = [
-            html.Div([
-                html.Strong(unique_docs[uid].metadata["title"]),
-                html.Br(),
-                html.A("Acceder a la receta", href=unique_docs[uid].metadata["url"], target="_blank", className="link-item")
-            ], className="document-item")
-            for uid in unique_docs.values()
-        ]
+        # cada búsqueda vuelve a contar los sondeos desde cero
+        ticks = 0 if ctx.triggered_id == "search-button" else no_update
+        if not query:
+            return "", True, ticks
 
-        return response_display, links_display
\ No newline at end of file
+        status = rag.crawl_status(query)
+        if not status:
+            # la respuesta se genera por streaming y el crawl puede encolarse después del
+            # clic: se sigue sondeando un tiempo limitado
+            waited = 0 if ctx.triggered_id == "search-button" else (n_intervals or 0)
+            return "", waited >= MAX_EMPTY_POLLS, ticks
+        if status["status"] in ("pending", "running"):
+            return f"Buscando nuevas recetas… ({status['added']} añadidas)", False, ticks
+        if status["status"] == "failed":
+            return "No se pudieron obtener nuevas recetas.", True, ticks
+        if status["added"]:
+            return f"Se añadieron {status['added']} recetas nuevas. Vuelve a buscar para verlas.", True, ticks
+        return "", True, ticks
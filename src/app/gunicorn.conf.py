@@ -0,0 +1,83 @@
+# Configuración de producción: gunicorn -c src/app/gunicorn.conf.py (desde la raíz del repositorio)
+#
+# El proceso maestro arranca un único servicio de embeddings (socket Unix) y un servidor
+# de Chroma que comparten todos los workers, así que cada worker solo guarda clientes
+# ligeros y la memoria no crece con el número de workers.
+# Si FORKPILOT_EMBEDDING_SOCKET o FORKPILOT_CHROMA_URL ya están definidos se usan esos servicios.
+# El estado de los crawls y la caché de respuestas están en SQLite dentro de chroma_lan,
+# así que cualquier worker puede atender el sondeo del progreso de un crawl.
+# Cada worker vuelca sus métricas en FORKPILOT_METRICS_DIR y /metrics devuelve la suma de todos.
+import os
+import sys
+import time
+import shutil
+import subprocess
+import multiprocessing
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+sys.path.insert(0, ROOT)
+
+from src.rag.embeddings import EMBEDDING_SOCKET_ENV
+from src.rag.metrics import METRICS_DIR_ENV
+from src.rag.rag_model import CHROMA_URL_ENV
+
+EMBEDDING_SOCKET = os.path.join(ROOT, ".forkpilot-embeddings.sock")
+METRICS_DIR = os.path.join(ROOT, ".forkpilot-metrics")
+CHROMA_HOST = "127.0.0.1"
+CHROMA_PORT = int(os.environ.get("FORKPILOT_CHROMA_PORT", 8000))
+CHROMA_PATH = os.environ.get("FORKPILOT_CHROMA_PATH", os.path.join(ROOT, "chroma_lan"))
+
+bind = os.environ.get("FORKPILOT_BIND", "0.0.0.0:8050")
+workers = int(os.environ.get("FORKPILOT_WORKERS", multiprocessing.cpu_count()))
+# hilos por worker: las respuestas por streaming mantienen la conexión abierta
+worker_class = "gthread"
+threads = int(os.environ.get("FORKPILOT_THREADS", 8))
+timeout = 300
+pythonpath = os.path.join(ROOT, "src", "app")
+wsgi_app = "wsgi:server"
+preload_app = False
+
+_services = []
+
+def _wait_for_chroma(url: str, timeout: float = 120) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        for path in ("/api/v2/heartbeat", "/api/v1/heartbeat"):
+            try:
+                with urllib.request.urlopen(url + path, timeout=2):
+                    return True
+            except OSError:
+                pass
+        time.sleep(0.5)
+    return False
+
+def on_starting(server):
+    if not os.environ.get(METRICS_DIR_ENV):
+        # las métricas empiezan de cero en cada arranque, como con un solo proceso
+        shutil.rmtree(METRICS_DIR, ignore_errors=True)
+        os.environ[METRICS_DIR_ENV] = METRICS_DIR
+
+    if not os.environ.get(EMBEDDING_SOCKET_ENV):
+        from src.rag.embedding_service import wait_for_service
+        _services.append(subprocess.Popen(
+            [sys.executable, "-m", "src.rag.embedding_service", "--socket", EMBEDDING_SOCKET], cwd=ROOT
+        ))
+        if not wait_for_service(EMBEDDING_SOCKET):
+            raise RuntimeError("El servicio de embeddings no arrancó")
+        os.environ[EMBEDDING_SOCKET_ENV] = EMBEDDING_SOCKET
+
+    if not os.environ.get(CHROMA_URL_ENV):
+        url = f"http://{CHROMA_HOST}:{CHROMA_PORT}"
+        _services.append(subprocess.Popen(
+            ["chroma", "run", "--path", CHROMA_PATH, "--host", CHROMA_HOST, "--port", str(CHROMA_PORT)], cwd=ROOT
+        ))
+        if not _wait_for_chroma(url):
+            raise RuntimeError("El servidor de Chroma no arrancó")
+        os.environ[CHROMA_URL_ENV] = url
+
+def on_exit(server):
+    for process in _services:
+        process.terminate()
+    for process in _services:
+        process.wait(timeout=30)
@@ -23,6 +23,8 @@ layout = html.Div([
                         className="search-bar"
                     ),
                     dbc.Button("Buscar", id="search-button", className="btn-search"),
+                    html.Div(id="crawl-status", className="crawl-status"),
+                    dcc.Interval(id="crawl-status-interval", interval=2000, disabled=True),
                     html.Div(id="response-container", className="response-container"),
                     html.Div(id="links-container", className="links-container")
                 ])
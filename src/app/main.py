@@ -1,17 +1,35 @@
-import dash
-from dash import html, dcc, Dash
-import dash_bootstrap_components as dbc
-from dash.dependencies import Input, Output
 import os
+import sys
+from dash import Dash
+import dash_bootstrap_components as dbc
+
+# la app se ejecuta como src/app/main.py; la raíz del repositorio hace falta para importar src.*
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
 from layout import layout
 from callbacks import register_callbacks
-from rag import RAG
+from stream import register_stream_routes
+from monitoring import register_health_routes, register_metrics_routes
+from recommendations import register_recommendation_routes
+from src.rag.rag_model import RAG
+from src.recommender.profiles import ProfileStore
+from src.recommender.batch import RecommendationCache
 
+# RAG carga los modelos al usarse por primera vez; warm_up los precarga en segundo plano
 rag = RAG()
+profiles = ProfileStore()
+recommendation_cache = RecommendationCache()
 app = Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP, "/assets/styles.css" ])
 app.layout = layout
 
 register_callbacks(app, rag)
+register_stream_routes(app.server, rag, profiles)
+register_recommendation_routes(app.server, recommendation_cache)
+register_metrics_routes(app.server)
+register_health_routes(app.server, rag)
 
 if __name__ == "__main__":
-    app.run(debug=True, use_reloader=False)
\ No newline at end of file
+    rag.start_warm_up()
+    app.run(debug=True, use_reloader=False)
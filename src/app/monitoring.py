@@ -0,0 +1,45 @@
+import os
+from flask import Response
+from src.rag.metrics import METRICS_DIR_ENV, render, start_dump
+from src.rag.batching import BATCH_METRICS
+from src.rag.embeddings import EMBEDDING_SOCKET_ENV
+
+def register_metrics_routes(server):
+    # con varios workers cada uno vuelca sus métricas en el directorio compartido y /metrics las suma
+    metrics_dir = os.environ.get(METRICS_DIR_ENV)
+    if metrics_dir:
+        start_dump(metrics_dir)
+
+    @server.route("/metrics")
+    def metrics():
+        """
+        Métricas del RAG (tiempos por etapa, caché, crawls, tokens) en formato Prometheus,
+        sumadas entre los workers si hay directorio de métricas compartido.
+        Con el servicio de embeddings compartido, las de los lotes de queries se piden a ese servicio
+        """
+        text = render(directory=metrics_dir)
+        socket_path = os.environ.get(EMBEDDING_SOCKET_ENV)
+        if socket_path:
+            from src.rag.embeddings import get_embeddings
+            try:
+                remote = get_embeddings().metrics()
+                text = render(skip={metric.name for metric in BATCH_METRICS}, directory=metrics_dir) + remote
+            except (OSError, RuntimeError, AttributeError) as e:
+                print(f"No se pudieron leer las métricas del servicio de embeddings: {e}")
+        return Response(text, mimetype="text/plain; version=0.0.4; charset=utf-8")
+
+def register_health_routes(server, rag):
+    @server.route("/healthz")
+    def healthz():
+        """
+        Liveness: el proceso está vivo y atiende peticiones
+        """
+        return {"status": "ok"}
+
+    @server.route("/readyz")
+    def readyz():
+        """
+        Readiness: 200 solo cuando los modelos están cargados y precalentados
+        """
+        status = rag.status()
+        return status, 200 if status["ready"] else 503
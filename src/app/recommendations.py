@@ -0,0 +1,10 @@
+from flask import request
+
+def register_recommendation_routes(server, cache):
+    @server.route("/api/recommendations")
+    def recommendations():
+        """
+        Recomendaciones precalculadas por el job batch (src/recommender/batch.py) para el usuario
+        """
+        user_id = request.args.get("user", "").strip()
+        return {"recommendations": cache.get(user_id) if user_id else []}
@@ -0,0 +1,43 @@
+import json
+from flask import Response, request, stream_with_context
+
+def sse(event: str, data) -> str:
+    """
+    Formatea un evento server-sent events
+    """
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def register_stream_routes(server, rag, profiles=None):
+    @server.route("/api/stream")
+    def stream_response():
+        """
+        Responde a la consulta del usuario por server-sent events: primero un evento
+        'sources' con los documentos usados y luego un evento 'token' por cada
+        fragmento generado por el LLM, terminando con 'done'.
+        Con el parámetro user la query se añade al perfil del usuario para las recomendaciones
+        """
+        query = request.args.get("query", "").strip()
+        user_id = request.args.get("user", "").strip()
+        if not query:
+            return Response(sse("error", "Consulta vacía"), status=400, mimetype="text/event-stream")
+
+        def events():
+            urls = []
+            for event, payload in rag.generate_stream(query):
+                if event == "sources":
+                    payload = [
+                        {"title": doc.metadata.get("title", ""), "url": doc.metadata.get("url", "")}
+                        for doc in payload
+                    ]
+                    urls = [doc["url"] for doc in payload]
+                elif event == "done" and user_id and profiles is not None:
+                    # antes de enviar 'done', porque el navegador cierra la conexión al recibirlo
+                    profiles.update(user_id, rag.embed_query(query))
+                    profiles.mark_seen(user_id, urls)
+                yield sse(event, payload)
+
+        return Response(
+            stream_with_context(events()),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
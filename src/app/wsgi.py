@@ -0,0 +1,5 @@
+from main import app, rag
+
+# punto de entrada WSGI: cada worker importa este módulo y precarga el RAG en segundo plano
+server = app.server
+rag.start_warm_up()
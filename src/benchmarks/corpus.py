@@ -0,0 +1,137 @@
+import os
+import random
+from datetime import date, timedelta
+from src.crawler.article_store import ArticleStore, article_file_name
+
+INGREDIENTS = [
+    "tomate", "cebolla", "ajo", "pimiento", "zanahoria", "patata", "huevo", "harina", "azúcar", "sal",
+    "aceite de oliva", "mantequilla", "leche", "queso", "arroz", "pollo", "ternera", "cerdo", "merluza",
+    "gambas", "calamar", "garbanzos", "lentejas", "espinacas", "calabacín", "berenjena", "champiñones",
+    "limón", "naranja", "manzana", "canela", "comino", "pimentón", "perejil", "cilantro", "orégano",
+    "nata", "chocolate", "almendras", "nueces", "miel", "vinagre", "vino blanco", "caldo de pollo",
+]
+DISHES = [
+    "tortilla", "guiso", "paella", "crema", "ensalada", "bizcocho", "estofado", "sopa", "tarta", "croquetas",
+    "empanada", "salsa", "pisto", "flan", "arroz meloso", "lasaña", "fideuá", "gazpacho", "albóndigas", "pan",
+]
+VERBS = [
+    "pica", "sofríe", "añade", "mezcla", "hornea", "remueve", "deja reposar", "cuece", "tritura", "sazona",
+    "incorpora", "bate", "escurre", "dora", "reserva", "calienta", "sirve",
+]
+ADJECTIVES = ["fino", "dorado", "tierno", "crujiente", "suave", "caliente", "templado", "jugoso", "casero", "ligero"]
+TOPICS = [
+    "la cocina mediterránea", "los mercados de abastos", "la temporada de setas", "el aceite de oliva virgen",
+    "la repostería tradicional", "los vinos de la región", "la cocina de aprovechamiento", "los quesos artesanos",
+]
+PROMOTIONS = [
+    "Síguenos en Instagram para más recetas.",
+    "Descubre más en nuestra web https://gourmetjournal.example/recetas",
+    "P.D. No olvides suscribirte a @gourmetjournal",
+    "Ver: https://gourmetjournal.example/agenda",
+]
+
+
+class CorpusGenerator:
+    def __init__(self, seed: int = 42):
+        """
+        Genera recetas, artículos y libros sintéticos en español.
+        Con la misma semilla produce siempre el mismo corpus
+        """
+        self.random = random.Random(seed)
+
+    def sentence(self) -> str:
+        r = self.random
+        verb = r.choice(VERBS)
+        first, second = r.sample(INGREDIENTS, 2)
+        sentence = f"{verb.capitalize()} el {first} con el {second} hasta que esté {r.choice(ADJECTIVES)}"
+        if r.random() < 0.3:
+            sentence += f", unos {r.randint(2, 40)} minutos a {r.choice([120, 160, 180, 200, 220])} °C"
+        return sentence + r.choice([".", ".", ".", "!", "?"])
+
+    def paragraph(self, sentences: int = 5) -> str:
+        return " ".join(self.sentence() for _ in range(sentences))
+
+    def publication_date(self) -> str:
+        day = date(2010, 1, 1) + timedelta(days=self.random.randint(0, 5000))
+        return day.isoformat()
+
+    def recipe(self, recipe_id: int) -> dict:
+        """
+        Receta con la misma forma que las que extrae el crawler de Cookpad
+        """
+        r = self.random
+        ingredients = r.sample(INGREDIENTS, r.randint(4, 10))
+        title = f"{r.choice(DISHES).capitalize()} de {ingredients[0]} y {ingredients[1]}"
+        return {
+            "id": str(recipe_id),
+            "title": title,
+            "url": f"https://cookpad.com/es/recetas/{recipe_id}",
+            "ingredients": "\n".join(f"{r.randint(1, 500)} g de {name}" for name in ingredients),
+            "steps": [self.paragraph(r.randint(1, 3)) for _ in range(r.randint(3, 8))],
+            "publication_date": self.publication_date(),
+        }
+
+    def article(self, index: int) -> dict:
+        """
+        Artículo de blog con promociones y enlaces, como los de The Gourmet Journal
+        """
+        r = self.random
+        title = f"{r.choice(['Guía de', 'Todo sobre', 'Un paseo por', 'Secretos de'])} {r.choice(TOPICS)} {index}"
+        lines = []
+        for _ in range(r.randint(4, 12)):
+            lines.append(self.paragraph(r.randint(3, 8)))
+            if r.random() < 0.2:
+                lines.append(r.choice(PROMOTIONS))
+        lines.append(r.choice(PROMOTIONS))
+        return {
+            "title": title,
+            "url": f"https://gourmetjournal.example/{index}",
+            "publication_date": self.publication_date(),
+            "content": "\n\n".join(lines),
+        }
+
+    def book(self, index: int, paragraphs: int = 200) -> str:
+        """
+        Libro con cabecera, índice, secciones y licencia al estilo de Project Gutenberg
+        """
+        r = self.random
+        header = (
+            f"The Project Gutenberg eBook of Recetario {index}\n\n"
+            "This ebook is for the use of anyone anywhere in the United States.\n\n"
+            "PREFACE\n\n" + self.paragraph(4) + "\n\nCONTENTS\n\n" +
+            "\n".join(f"Capítulo {i}" for i in range(1, 11)) + "\n\n"
+        )
+        body = []
+        for i in range(paragraphs):
+            if i % 20 == 0:
+                body.append(f"SECTION {i // 20 + 1}")
+            body.append(self.paragraph(r.randint(3, 8)))
+        footer = (
+            f"\n\n*** END OF THE PROJECT GUTENBERG EBOOK RECETARIO {index} ***\n\n"
+            "START: FULL LICENSE\n\n" + "Redistribution is subject to the license. " * 200
+        )
+        return header + "\n\n".join(body) + footer
+
+    def recipes(self, n: int) -> list[dict]:
+        return [self.recipe(100000 + i) for i in range(n)]
+
+    def articles(self, n: int) -> list[dict]:
+        return [self.article(i) for i in range(n)]
+
+    def books(self, n: int, paragraphs: int = 200) -> list[str]:
+        return [self.book(i, paragraphs) for i in range(n)]
+
+def write_articles(articles: list[dict], folder: str) -> str:
+    """
+    Guarda los artículos en folder igual que el crawler de The Gourmet Journal
+    (un .txt por artículo y sus metadatos en articles.db)
+    """
+    store = ArticleStore(folder)
+    for article in articles:
+        file_name = article_file_name(article["title"], article["url"])
+        with open(os.path.join(folder, file_name), "w", encoding="utf-8") as f:
+            f.write(article["content"])
+        store.add({**article, "file_name": file_name})
+    store.flush()
+    store.close()
+    return folder
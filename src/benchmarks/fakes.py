@@ -0,0 +1,52 @@
+import re
+import time
+import hashlib
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+def _token_seed(token: str) -> int:
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class FakeEmbeddings(Embeddings):
+    def __init__(self, dim: int = 512, delay: float = 0.0):
+        """
+        Embeddings deterministas sin modelo: cada palabra tiene un vector aleatorio fijo
+        (sembrado con su hash) y el texto es la media normalizada de sus palabras, así
+        que textos con palabras en común son similares. delay simula el coste por texto
+        """
+        self.dim = dim
+        self.delay = delay
+        self._vectors = {}
+
+    def _token_vector(self, token: str) -> np.ndarray:
+        vector = self._vectors.get(token)
+        if vector is None:
+            vector = np.random.default_rng(_token_seed(token)).standard_normal(self.dim).astype(np.float32)
+            self._vectors[token] = vector
+        return vector
+
+    def _embed(self, text: str) -> list[float]:
+        tokens = re.findall(r"\w+", text.lower())
+        if not tokens:
+            return [0.0] * self.dim
+        vector = np.sum([self._token_vector(token) for token in tokens], axis=0)
+        return (vector / np.linalg.norm(vector)).tolist()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if self.delay:
+            time.sleep(self.delay * len(texts))
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text: str) -> list[float]:
+        if self.delay:
+            time.sleep(self.delay)
+        return self._embed(text)
+
+def fake_llm(answer: str = "Respuesta de prueba basada en el contexto recuperado.", sleep: float = None) -> FakeListChatModel:
+    """
+    Modelo de chat falso que siempre responde answer; en streaming emite un carácter
+    por fragmento, esperando sleep segundos entre ellos
+    """
+    return FakeListChatModel(responses=[answer], sleep=sleep)
@@ -0,0 +1,287 @@
+import os
+import sys
+import json
+import time
+import random
+import platform
+import argparse
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+import numpy as np
+from src.benchmarks.corpus import CorpusGenerator, INGREDIENTS, DISHES, write_articles
+from src.benchmarks.fakes import FakeEmbeddings, fake_llm
+from src.preprocessing import gourmet, gutenberg
+from src.preprocessing.engine import clean_gourmet, clean_gutenberg, clean_many
+from src.preprocessing.dates import DATE_FIELD
+from src.chunking.gourmet import chunk_article
+from src.chunking.semantic import SEMANTIC_MODEL, SemanticChunkingEngine
+from src.rag.embeddings import DEFAULT_MODEL, set_embeddings
+
+RESULTS_DIR = "benchmark_results"
+VOCABULARY = sorted({word for phrase in INGREDIENTS + DISHES for word in phrase.split()})
+
+
+def percentiles(latencies: list[float]) -> dict:
+    """
+    Resumen de latencias en milisegundos
+    """
+    values = np.asarray(latencies) * 1000
+    return {
+        "n": len(values),
+        "mean_ms": float(values.mean()),
+        "p50_ms": float(np.percentile(values, 50)),
+        "p95_ms": float(np.percentile(values, 95)),
+        "p99_ms": float(np.percentile(values, 99)),
+        "max_ms": float(values.max()),
+    }
+
+def timed(fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+def megabytes(texts: list[str]) -> float:
+    return sum(len(text.encode("utf-8")) for text in texts) / 1e6
+
+def random_query(rng: random.Random) -> str:
+    return " ".join(rng.sample(VOCABULARY, rng.randint(2, 4)))
+
+
+def bench_cleaners(generator: CorpusGenerator, n_books: int, n_articles: int, processes: int) -> dict:
+    """
+    Throughput (MB/s) de la limpieza paso a paso y del motor compilado, y si ambas
+    producen exactamente el mismo texto
+    """
+    books = generator.books(n_books)
+    articles = [article["content"] for article in generator.articles(n_articles)]
+    results = {}
+    for kind, texts, stepwise, engine in [
+        ("gutenberg", books, gutenberg.clean_text_stepwise, lambda t: clean_gutenberg(t, None, None)),
+        ("gourmet", articles, gourmet.cleaned_text_stepwise, clean_gourmet),
+    ]:
+        size = megabytes(texts)
+        expected, stepwise_seconds = timed(lambda: [stepwise(text) for text in texts])
+        cleaned, engine_seconds = timed(lambda: [engine(text) for text in texts])
+        _, many_seconds = timed(clean_many, texts, kind, processes)
+        results[kind] = {
+            "documents": len(texts),
+            "megabytes": size,
+            "stepwise_mb_s": size / stepwise_seconds,
+            "engine_mb_s": size / engine_seconds,
+            "clean_many_mb_s": size / many_seconds,
+            "equivalent": cleaned == expected,
+        }
+    return results
+
+def bench_chunkers(generator: CorpusGenerator, embeddings: FakeEmbeddings, n_books: int, n_articles: int) -> dict:
+    """
+    Documentos por segundo del chunker de artículos y del semántico de libros
+    """
+    articles = [gourmet.cleaned_text(article["content"]).lower() for article in generator.articles(n_articles)]
+    books = [gutenberg.clean_text(book) for book in generator.books(n_books)]
+
+    article_chunks, article_seconds = timed(lambda: [chunk_article(text) for text in articles])
+    engine = SemanticChunkingEngine(embeddings=embeddings)
+    book_chunks, book_seconds = timed(engine.split_many, books)
+    return {
+        "gourmet": {
+            "documents": len(articles),
+            "chunks": sum(len(chunks) for chunks in article_chunks),
+            "docs_s": len(articles) / article_seconds,
+        },
+        "gutenberg_semantic": {
+            "documents": len(books),
+            "chunks": sum(len(chunks) for chunks in book_chunks),
+            "docs_s": len(books) / book_seconds,
+        },
+    }
+
+def bench_ingestion(generator: CorpusGenerator, workdir: str, n_articles: int) -> dict:
+    """
+    Ingesta completa de artículos en Chroma y una segunda pasada sin cambios
+    """
+    from src.rag.rag_model import RAG
+    from src.ingestion.pipeline import ingest
+
+    folder = write_articles(generator.articles(n_articles), os.path.join(workdir, "articles"))
+    rag = RAG(persist_directory=os.path.join(workdir, "chroma_ingest"), llm=fake_llm())
+    stats, seconds = timed(ingest, "gourmet", folder, rag=rag)
+    _, noop_seconds = timed(ingest, "gourmet", folder, rag=rag)
+    return {
+        "documents": n_articles,
+        "chunks": stats["added_chunks"],
+        "seconds": seconds,
+        "docs_s": n_articles / seconds,
+        "chunks_s": stats["added_chunks"] / seconds,
+        "unchanged_rerun_seconds": noop_seconds,
+    }
+
+def fill_collection(rag, embeddings: FakeEmbeddings, size: int, rng: random.Random, batch_size: int = 5000):
+    """
+    Llena la colección hasta size chunks sintéticos. Los vectores se calculan en bloque
+    a partir de los de cada palabra (igual que FakeEmbeddings) y se insertan directamente
+    en Chroma para poder llegar al millón; el índice BM25 y el de documentos se
+    actualizan con cada bloque para que la búsqueda híbrida vea toda la colección
+    """
+    # como en RAG.add_documents, los índices se abren antes de insertar para no reconstruirlos desde Chroma
+    bm25 = rag.bm25
+    doc_index = rag.doc_index
+    collection = rag.vector_store._collection
+    token_vectors = np.stack([embeddings._token_vector(word) for word in VOCABULARY])
+    start = collection.count()
+    while start < size:
+        count = min(batch_size, size - start)
+        counts = np.zeros((count, len(VOCABULARY)), dtype=np.float32)
+        texts, metadatas = [], []
+        for row in range(count):
+            words = rng.sample(range(len(VOCABULARY)), rng.randint(4, 12))
+            counts[row, words] = 1
+            texts.append(" ".join(VOCABULARY[w] for w in words))
+            recipe_id = str(start + row)
+            metadatas.append({
+                "title": f"Receta {recipe_id}",
+                "url": f"https://cookpad.com/es/recetas/{recipe_id}",
+                "id": recipe_id,
+                "source_type": "cookpad",
+                DATE_FIELD: rng.randint(1262304000, 1735689600),
+            })
+        vectors = counts @ token_vectors
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        ids = [f"bench-{start + row}" for row in range(count)]
+        collection.add(ids=ids, embeddings=vectors.tolist(), documents=texts, metadatas=metadatas)
+        bm25.add(ids, texts)
+        doc_index.add(metadatas)
+        start += count
+
+def bench_retrieve(rag, queries: list[str], k: int) -> dict:
+    embeddings = [rag.embed_query(query) for query in queries]
+    latencies = []
+    returned = 0
+    for query, embedding in zip(queries, embeddings):
+        docs, seconds = timed(rag.retrieve, query, k=k, verbose=False, embedding=embedding)
+        latencies.append(seconds)
+        returned += len(docs)
+    return {**percentiles(latencies), "mean_docs": returned / len(queries)}
+
+def bench_generate(rag, queries: list[str], k: int) -> dict:
+    """
+    Latencia de generate de extremo a extremo, sin caché y con la caché de respuestas caliente
+    """
+    cold = []
+    for query in queries:
+        rag.answer_cache.clear()
+        cold.append(timed(rag.generate, query, k=k, verbose=False)[1])
+    rag.answer_cache.hits = rag.answer_cache.misses = 0
+    warm = [timed(rag.generate, query, k=k, verbose=False)[1] for query in queries]
+    return {
+        "cold": percentiles(cold),
+        "cached": {**percentiles(warm), "hit_rate": rag.answer_cache.hits / len(queries)},
+    }
+
+def offline_rag(persist_directory: str):
+    """
+    RAG con el LLM falso y el crawler de Cookpad desactivado
+    """
+    from src.rag.rag_model import RAG
+
+    class OfflineRAG(RAG):
+        def _crawl(self, job):
+            pass
+
+    return OfflineRAG(persist_directory=persist_directory, llm=fake_llm())
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args) -> dict:
+    generator = CorpusGenerator(args.seed)
+    rng = random.Random(args.seed)
+    embeddings = FakeEmbeddings(dim=args.dim)
+    set_embeddings(DEFAULT_MODEL, embeddings)
+    set_embeddings(SEMANTIC_MODEL, embeddings)
+
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "date": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "args": vars(args),
+        }
+    }
+    with tempfile.TemporaryDirectory(prefix="forkpilot-bench-") as workdir:
+        print("Limpieza…")
+        results["cleaners"] = bench_cleaners(generator, args.books, args.articles, args.processes)
+        print("Fragmentación…")
+        results["chunkers"] = bench_chunkers(generator, embeddings, args.books, args.articles)
+        print("Ingesta…")
+        results["ingestion"] = bench_ingestion(generator, workdir, args.articles)
+
+        rag = offline_rag(os.path.join(workdir, "chroma_search"))
+        queries = [random_query(rng) for _ in range(args.queries)]
+        results["retrieve"] = {}
+        for i, size in enumerate(sorted(args.sizes)):
+            print(f"Recuperación con {size} chunks…")
+            fill_collection(rag, embeddings, size, rng)
+            results["retrieve"][str(size)] = bench_retrieve(rag, queries, args.k)
+            if i == 0:
+                results["generate"] = {"chunks": size, **bench_generate(rag, queries, args.k)}
+    return results
+
+def flatten(results: dict, prefix: str = "") -> dict:
+    flat = {}
+    for key, value in results.items():
+        if key == "meta":
+            continue
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(old: dict, new: dict):
+    """
+    Imprime la variación de cada métrica entre dos ejecuciones
+    """
+    before, after = flatten(old), flatten(new)
+    print(f"{'métrica':<55} {old['meta'].get('commit')!s:>12} {new['meta'].get('commit')!s:>12} {'cambio':>9}")
+    for name in sorted(before.keys() & after.keys()):
+        change = (after[name] - before[name]) / before[name] * 100 if before[name] else 0.0
+        print(f"{name:<55} {before[name]:>12.3f} {after[name]:>12.3f} {change:>8.1f}%")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de ForkPilot sin red ni Ollama")
+    parser.add_argument("--sizes", type=lambda s: [int(x) for x in s.split(",")], default=[1_000, 100_000, 1_000_000],
+                        help="tamaños de la colección para medir retrieve, separados por comas")
+    parser.add_argument("--books", type=int, default=20)
+    parser.add_argument("--articles", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--processes", type=int, default=None, help="procesos para clean_many")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help=f"fichero JSON de resultados (por defecto en {RESULTS_DIR}/)")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con el que comparar")
+    args = parser.parse_args(argv)
+
+    results = run(args)
+    output = args.output or os.path.join(
+        RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{results['meta']['commit'] or 'local'}.json"
+    )
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
+    print(f"Resultados guardados en {output}")
+
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            compare(json.load(f), results)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,41 +1,15 @@
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
 from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain.schema import Document
-import os      
-from gourmet import cleaned_text
 
-#configurando la base de datos de chroma
-vector_store = Chroma(
-    collection_name="gastronomia",
-    embedding_function=HuggingFaceEmbeddings(model_name="sentence-transformers/distiluse-base-multilingual-cased-v2"),
-    persist_directory="./chroma_gastronomy"
-)
+text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200, add_start_index=True)
 
-#carpeta en la que se encuentra la raw data
-folder_path = "saved_articles"
-documents = []
+def chunk_article(text: str) -> list[tuple[int, str]]:
+    """
+    Divide un artículo en chunks de 1000 caracteres con solapamiento de 200.
+    Devuelve (posición de inicio, texto) de cada chunk
+    """
+    docs = text_splitter.create_documents([text])
+    return [(doc.metadata["start_index"], doc.page_content) for doc in docs]
 
-#cargar los arcivos .txt y limpiarlos
-for file_name in os.listdir(folder_path):
-    file_path = os.path.join(folder_path, file_name)
-    if file_name.endswith(".txt") and os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            raw_text = f.read()
-            clean_text = cleaned_text(raw_text)
-            documents.append(Document(page_content = clean_text.lower(),metadata={"source": file_path}))
-
-print(f"Se cargaron {len(documents)} documentos correctamente.")
-
-#dividir en chunks
-text_splitter = RecursiveCharacterTextSplitter(chunk_size=1000, chunk_overlap=200)
-split_docs = text_splitter.split_documents(documents)
-
-#insertar en Chroma
-batch_size = 1000
-for i in range(0, len(split_docs), batch_size):
-    batch = split_docs[i:i+batch_size]
-    vector_store.add_documents(batch)
-    print(f"Se añadieron documentos del batch {i} al {i+len(batch)}")
-
-print("Vectores añadidos correctamente.")
\ No newline at end of file
+if __name__ == "__main__":
+    from src.ingestion.pipeline import main
+    main(["gourmet"])
@@ -0,0 +1,161 @@
+import os
+import re
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from src.rag.embeddings import get_model
+
+SEMANTIC_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+SENTENCE_SPLIT_REGEX = r"(?<=[.?!])\s+"
+BREAKPOINT_DEFAULTS = {
+    "percentile": 95,
+    "standard_deviation": 3,
+    "interquartile": 1.5,
+    "gradient": 95,
+}
+
+def combine_sentences(sentences: list[str], buffer_size: int = 1) -> list[str]:
+    """
+    Une cada oración con sus buffer_size vecinas a cada lado (igual que SemanticChunker)
+    """
+    combined = []
+    for i in range(len(sentences)):
+        start = max(0, i - buffer_size)
+        combined.append(" ".join(sentences[start:i + buffer_size + 1]))
+    return combined
+
+def breakpoint_threshold(distances: np.ndarray, breakpoint_type: str, amount: float):
+    """
+    Calcula el umbral de corte y el array que se compara con él
+    """
+    if breakpoint_type == "percentile":
+        return np.percentile(distances, amount), distances
+    if breakpoint_type == "standard_deviation":
+        return np.mean(distances) + amount * np.std(distances), distances
+    if breakpoint_type == "interquartile":
+        q1, q3 = np.percentile(distances, [25, 75])
+        return np.mean(distances) + amount * (q3 - q1), distances
+    if breakpoint_type == "gradient":
+        gradient = np.gradient(distances, range(0, len(distances)))
+        return np.percentile(gradient, amount), gradient
+    raise ValueError(f"Tipo de umbral desconocido: {breakpoint_type}")
+
+def cosine_distances(vectors: np.ndarray) -> np.ndarray:
+    """
+    Distancia coseno entre cada vector y el siguiente
+    """
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    normalized = vectors / np.where(norms == 0, 1, norms)
+    return 1 - np.sum(normalized[:-1] * normalized[1:], axis=1)
+
+
+class SemanticChunkingEngine:
+    def __init__(self, model_name: str = SEMANTIC_MODEL, breakpoint_type: str = "gradient", breakpoint_amount: float = None,
+                 buffer_size: int = 1, batch_size: int = 1024, embeddings=None):
+        """
+        Fragmentación semántica equivalente a SemanticChunker de langchain, pero cargando
+        el modelo una sola vez y embebiendo las oraciones de muchos documentos en lotes
+        grandes de batch_size oraciones. Se usa el modelo sin caché (en float32, como
+        SemanticChunker) para que los cortes no cambien y la caché de embeddings no se
+        llene de oraciones
+        """
+        self.embeddings = embeddings or get_model(model_name)
+        self.breakpoint_type = breakpoint_type
+        self.breakpoint_amount = breakpoint_amount if breakpoint_amount is not None else BREAKPOINT_DEFAULTS[breakpoint_type]
+        self.buffer_size = buffer_size
+        self.batch_size = batch_size
+
+    def split_text(self, text: str) -> list[str]:
+        return self.split_many([text])[0]
+
+    def split_many(self, texts: list[str]) -> list[list[str]]:
+        """
+        Divide cada texto en fragmentos semánticos
+        """
+        sentences_per_text = [re.split(SENTENCE_SPLIT_REGEX, text) for text in texts]
+        pending = []
+        combined = []
+        for i, sentences in enumerate(sentences_per_text):
+            if len(sentences) == 1 or (self.breakpoint_type == "gradient" and len(sentences) == 2):
+                continue
+            pending.append((i, len(combined), len(sentences)))
+            combined.extend(combine_sentences(sentences, self.buffer_size))
+
+        vectors = self._embed(combined)
+        results = [list(sentences) for sentences in sentences_per_text]
+        for i, start, count in pending:
+            distances = cosine_distances(vectors[start:start + count])
+            results[i] = self._group(sentences_per_text[i], distances)
+        return results
+
+    def _embed(self, texts: list[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        batches = [
+            self.embeddings.embed_documents(texts[i:i + self.batch_size])
+            for i in range(0, len(texts), self.batch_size)
+        ]
+        return np.asarray([vector for batch in batches for vector in batch], dtype=np.float32)
+
+    def _group(self, sentences: list[str], distances: np.ndarray) -> list[str]:
+        threshold, values = breakpoint_threshold(distances, self.breakpoint_type, self.breakpoint_amount)
+        chunks = []
+        start = 0
+        for index in np.flatnonzero(values > threshold):
+            chunks.append(" ".join(sentences[start:index + 1]))
+            start = index + 1
+        if start < len(sentences):
+            chunks.append(" ".join(sentences[start:]))
+        return chunks
+
+
+_worker_engine = None
+
+def _init_worker(model_name: str, breakpoint_type: str, torch_threads: int):
+    global _worker_engine
+    try:
+        import torch
+        torch.set_num_threads(torch_threads)
+    except ImportError:
+        pass
+    _worker_engine = SemanticChunkingEngine(model_name, breakpoint_type)
+
+def _split_in_worker(texts: list[str]) -> list[list[str]]:
+    return _worker_engine.split_many(texts)
+
+def imap_chunks(groups, model_name: str = SEMANTIC_MODEL, breakpoint_type: str = "gradient", processes: int = None):
+    """
+    Fragmenta grupos de textos (un iterable, que puede ser perezoso) y devuelve, en orden,
+    los fragmentos de cada grupo. Con varios procesos cada uno carga el modelo una vez y
+    usa cpu_count / processes hilos de torch para no competir por los mismos núcleos;
+    como mucho hay 2 * processes grupos en vuelo para acotar la memoria
+    """
+    processes = processes or os.cpu_count() or 1
+    if processes == 1:
+        engine = SemanticChunkingEngine(model_name, breakpoint_type)
+        for texts in groups:
+            yield engine.split_many(texts)
+        return
+
+    torch_threads = max(1, (os.cpu_count() or 1) // processes)
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context, initializer=_init_worker,
+                             initargs=(model_name, breakpoint_type, torch_threads)) as executor:
+        in_flight = deque()
+        for texts in groups:
+            in_flight.append(executor.submit(_split_in_worker, texts))
+            if len(in_flight) >= 2 * processes:
+                yield in_flight.popleft().result()
+        while in_flight:
+            yield in_flight.popleft().result()
+
+def chunk_corpus(texts: list[str], model_name: str = SEMANTIC_MODEL, breakpoint_type: str = "gradient",
+                 processes: int = None, docs_per_task: int = 8) -> list[list[str]]:
+    """
+    Fragmenta un corpus repartiendo los documentos en un pool de procesos
+    """
+    if len(texts) <= docs_per_task:
+        processes = 1
+    groups = (texts[i:i + docs_per_task] for i in range(0, len(texts), docs_per_task))
+    return [chunks for result in imap_chunks(groups, model_name, breakpoint_type, processes) for chunks in result]
@@ -0,0 +1,150 @@
+import os
+import json
+import hashlib
+import sqlite3
+import threading
+
+def article_file_name(title: str, url: str) -> str:
+    """
+    Nombre del fichero .txt en el que se guarda el contenido del artículo; lleva un
+    hash de la URL para que dos artículos con el mismo título no compartan fichero
+    """
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()[:10]
+    return legacy_file_name(title)[:-len(".txt")] + f"_{digest}.txt"
+
+def legacy_file_name(title: str) -> str:
+    """
+    Nombre que usaba el crawler antes del hash (solo el título), con el que están
+    guardados los .txt de los artículos importados de articles.json
+    """
+    return title.replace(" ", "_").replace("/", "_")[:50] + ".txt"
+
+
+class ArticleStore:
+    def __init__(self, folder: str = "saved_articles", batch_size: int = 20):
+        """
+        Almacén de artículos en SQLite (solo se añaden filas, nunca se reescribe el fichero).
+        Las escrituras se confirman en disco cada batch_size artículos o al llamar a flush().
+        Si existe un articles.json antiguo, se importa la primera vez
+        """
+        os.makedirs(folder, exist_ok=True)
+        self.folder = folder
+        self.db_path = os.path.join(folder, "articles.db")
+        self.batch_size = batch_size
+        self._pending = 0
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS articles (
+                url TEXT PRIMARY KEY,
+                title TEXT NOT NULL,
+                publication_date TEXT,
+                content TEXT,
+                file_name TEXT
+            )
+        """)
+        # get_by_file es la búsqueda de la ingesta (una por fichero)
+        self.conn.execute("DROP INDEX IF EXISTS articles_title")
+        try:
+            self.conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS articles_file_name ON articles(file_name)")
+        except sqlite3.IntegrityError:
+            # almacenes anteriores con nombres repetidos por título: índice no único
+            self.conn.execute("CREATE INDEX IF NOT EXISTS articles_file_name_dup ON articles(file_name)")
+        self.conn.commit()
+        self._urls = {row[0] for row in self.conn.execute("SELECT url FROM articles")}
+        self._import_legacy_json()
+
+    def _import_legacy_json(self):
+        json_path = os.path.join(self.folder, "articles.json")
+        if self._urls or not os.path.exists(json_path):
+            return
+        with open(json_path, "r", encoding="utf-8") as f:
+            legacy = json.load(f)
+        for article in legacy.values():
+            # si dos artículos comparten título, el segundo recibe el nombre con hash
+            self.add({**article, "file_name": article.get("file_name") or legacy_file_name(article["title"])})
+        self.flush()
+        print(f"Se importaron {len(legacy)} artículos desde {json_path}.")
+
+    def __contains__(self, url: str) -> bool:
+        return url in self._urls
+
+    def __len__(self) -> int:
+        return len(self._urls)
+
+    def __iter__(self):
+        """
+        Recorre los artículos guardados sin cargarlos todos en memoria
+        """
+        self.flush()
+        cursor = self.conn.execute("SELECT url, title, publication_date, content, file_name FROM articles ORDER BY rowid")
+        for row in cursor:
+            yield self._to_dict(row)
+
+    def get(self, url: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT url, title, publication_date, content, file_name FROM articles WHERE url = ?", (url,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def get_by_file(self, file_name: str) -> dict | None:
+        """
+        Busca el artículo asociado a un fichero .txt de saved_articles
+        """
+        row = self.conn.execute(
+            "SELECT url, title, publication_date, content, file_name FROM articles WHERE file_name = ?", (file_name,)
+        ).fetchone()
+        return self._to_dict(row) if row else None
+
+    def add(self, article: dict) -> bool:
+        """
+        Añade un artículo. Devuelve False si su URL ya estaba guardada
+        """
+        url = article["url"]
+        with self._lock:
+            if url in self._urls:
+                return False
+            file_name = article.get("file_name") or article_file_name(article["title"], url)
+            try:
+                self._insert(article, file_name)
+            except sqlite3.IntegrityError:
+                # nombre antiguo (solo por título) ya usado por otro artículo
+                self._insert(article, article_file_name(article["title"], url))
+            self._urls.add(url)
+            self._pending += 1
+            if self._pending >= self.batch_size:
+                self.conn.commit()
+                self._pending = 0
+        return True
+
+    def _insert(self, article: dict, file_name: str):
+        self.conn.execute(
+            "INSERT INTO articles (url, title, publication_date, content, file_name) VALUES (?, ?, ?, ?, ?)",
+            (article["url"], article["title"], article.get("publication_date"), article.get("content"), file_name)
+        )
+
+    def flush(self):
+        """
+        Confirma en disco los artículos pendientes
+        """
+        with self._lock:
+            if self._pending:
+                self.conn.commit()
+                self._pending = 0
+
+    def close(self):
+        self.flush()
+        self.conn.close()
+
+    @staticmethod
+    def _to_dict(row) -> dict:
+        url, title, publication_date, content, file_name = row
+        return {
+            "title": title,
+            "url": url,
+            "publication_date": publication_date,
+            "content": content,
+            "file_name": file_name
+        }
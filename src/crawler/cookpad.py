@@ -1,13 +1,28 @@
 import time, urllib.parse, re
+from concurrent.futures import ThreadPoolExecutor
+import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.chrome.options import Options
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from langchain.schema import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
+from src.preprocessing.dates import with_date_index
+from src.crawler.driver_pool import get_driver_pool
+from src.crawler.ingredients import parse_ingredients
+
+try:
+    import lxml  # noqa: F401
+    HTML_PARSER = "lxml"
+except ImportError:
+    HTML_PARSER = "html.parser"
+
+HEADERS = {
+    "User-Agent": "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36",
+    "Accept-Language": "es-ES,es;q=0.9",
+}
 
 def clean_text(text: str) -> str:
     return re.sub(r"\s+", " ", text).strip()
@@ -27,12 +42,15 @@ def create_documents_from_recipe(recipe: dict) -> list[Document]:
     """
     Crea documentos por receta 
     """
-    metadata = {
+    metadata = with_date_index({
         "title": recipe["title"],
         "url": recipe["url"],
         "publication_date": recipe["publication_date"],
-        "id": recipe["id"]
-    }
+        "id": recipe["id"],
+        "source_type": "cookpad"
+    })
+    if recipe.get("ingredient_list"):
+        metadata["ingredients"] = "; ".join(parse_ingredients(recipe["ingredient_list"]))
 
     ingredients = clean_text(recipe["ingredients"])
     steps = [clean_text(s) for s in recipe["steps"] if s.strip()]
@@ -50,23 +68,66 @@ def create_documents_from_recipe(recipe: dict) -> list[Document]:
     return [Document(page_content=full_text.strip(), metadata=metadata)]
 
 
+def parse_recipe(html: str, url: str, recipe_id: str) -> dict | None:
+    """
+    Extrae título, ingredientes, pasos y fecha del HTML de una receta
+    """
+    soup = BeautifulSoup(html, HTML_PARSER)
+
+    title_el = soup.select_one("h1")
+    if not title_el:
+        print("No se encontró el título.")
+        return None
+    title = title_el.text.strip()
+
+    ingredients_div = soup.select_one("#ingredients")
+    ingredients = ingredients_div.text.strip() if ingredients_div else ""
+    # una línea por ingrediente; si la página no usa lista se separa por saltos de línea
+    items = ingredients_div.select("li") if ingredients_div else []
+    lines = [li.get_text(" ") for li in items] if items else ingredients.splitlines()
+    ingredient_list = [clean_text(line) for line in lines if line.strip()]
+
+    steps_ol = soup.select_one("#steps > ol")
+    steps = [li.text.strip() for li in steps_ol.find_all("li")] if steps_ol else []
+
+    time_tag = soup.find("time")
+    publication_date = time_tag.get("datetime") if time_tag and time_tag.get("datetime") else ""
+
+    if not ingredients and not steps:
+        print(f"Receta vacía: {title}")
+        return None
+
+    return {
+        "id": recipe_id,
+        "url": url,
+        "title": title,
+        "ingredients": ingredients,
+        "ingredient_list": ingredient_list,
+        "steps": steps,
+        "publication_date": publication_date
+    }
+
+
 class CookpadCrawler:
-    def __init__(self, query: str, min_new: int = 10, exclude_ids: set = None):
+    def __init__(self, query: str, min_new: int = 10, exclude_ids: set = None, pool=None, workers: int = 8):
         """ 
-        Inicializa crawler para Cookpad
+        Inicializa crawler para Cookpad.
+        El navegador se toma prestado del pool compartido durante search() y solo
+        se usa para el listado; las recetas se descargan por HTTP en paralelo
         """
         self.query = query
         self.min_new = min_new
         self.exclude_ids = exclude_ids or set()
         self.documents = []
-
-        chrome_options = Options()
-        chrome_options.add_argument("--headless")
-        chrome_options.add_argument("--disable-gpu")
-        chrome_options.add_argument("--no-sandbox")
-        chrome_options.add_argument("--disable-dev-shm-usage")
-        chrome_options.add_argument("--blink-settings=imagesEnabled=false")
-        self.driver = webdriver.Chrome(options=chrome_options)
+        self.recipes = []
+        self.collected = 0
+        self.pool = pool or get_driver_pool()
+        self.driver = None
+        self.workers = workers
+        self.session = requests.Session()
+        self.session.headers.update(HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+        self.session.mount("https://", adapter)
 
     def search(self):
         """ 
@@ -74,105 +135,120 @@ class CookpadCrawler:
         """
         encoded_query = urllib.parse.quote(self.query)
         url = f"https://cookpad.com/es/buscar/{encoded_query}?order=recent"
-        self.driver.get(url)
-        WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.ID, "search-recipes-pagination")))
-        self.scroll_and_collect()
-        self.driver.quit()
+        with self.pool.lease() as driver:
+            self.driver = driver
+            try:
+                self.driver.get(url)
+                WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.ID, "search-recipes-pagination")))
+                self.scroll_and_collect()
+            finally:
+                self.driver = None
 
     def scroll_and_collect(self):
         """ 
-        Recorre la página y extrae recetas
+        Recorre la página y extrae recetas.
+        Los enlaces nuevos de cada scroll se descargan por HTTP en paralelo; los que
+        fallan se reintentan con Selenium al terminar el scroll
         """
         seen_links = set()
-        collected = 0
+        fallback = []
         attempts = 10
         prev_collected = -1
 
-        while collected < self.min_new and attempts > 0:
-            if collected == prev_collected:
-                print("No se encontraron nuevas recetas.")
-                break
-            prev_collected = collected
-            soup = BeautifulSoup(self.driver.page_source, "html.parser")
-            results = soup.select("#search-recipes-list li a")
-
-            for a in results:
-                link = a.get("href")
-                if not link or link in seen_links:
-                    continue
-                seen_links.add(link)
-
-                recipe_id = str(link.strip("/").split("/")[-1])
-                if recipe_id in self.exclude_ids or not recipe_id.isdigit():
-                    continue
-
-                full_url = f"https://cookpad.com{link}"
-                recipe = self.extract_recipe(full_url, recipe_id)
-
-                if recipe:
-                    new_docs = create_documents_from_recipe(recipe)
-                    if recipe_id not in self.exclude_ids:
-                        self.documents.extend(new_docs)
-                        self.exclude_ids.add(recipe_id)  
-                        collected += 1
-                        print(f"Nueva receta agregada: {recipe['title']} - ID: {recipe_id}")
-                        if collected >= self.min_new:
-                            break
-
-            try:
-                more = self.driver.find_element(By.XPATH, "//button[contains(text(), 'Cargar más')]")
-                more.click()
-                time.sleep(3)
-            except:
-                pass
-
-            try:
-                paginator = self.driver.find_element(By.ID, "search-recipes-pagination")
-                ActionChains(self.driver).move_to_element(paginator).perform()
-                time.sleep(3)
-            except:
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while self.collected < self.min_new and attempts > 0:
+                if self.collected == prev_collected:
+                    print("No se encontraron nuevas recetas.")
+                    break
+                prev_collected = self.collected
+                soup = BeautifulSoup(self.driver.page_source, HTML_PARSER)
+                results = soup.select("#search-recipes-list li a")
+
+                candidates = []
+                for a in results:
+                    link = a.get("href")
+                    if not link or link in seen_links:
+                        continue
+                    seen_links.add(link)
+
+                    recipe_id = str(link.strip("/").split("/")[-1])
+                    if recipe_id in self.exclude_ids or not recipe_id.isdigit():
+                        continue
+                    candidates.append((f"https://cookpad.com{link}", recipe_id))
+
+                for i in range(0, len(candidates), self.workers):
+                    if self.collected >= self.min_new:
+                        break
+                    batch = candidates[i:i + self.workers]
+                    recipes = executor.map(lambda c: self.fetch_recipe(*c), batch)
+                    for (url, recipe_id), recipe in zip(batch, recipes):
+                        if recipe:
+                            self.add_recipe(recipe)
+                        else:
+                            fallback.append((url, recipe_id))
+
+                if self.collected >= self.min_new:
+                    break
+
+                try:
+                    more = self.driver.find_element(By.XPATH, "//button[contains(text(), 'Cargar más')]")
+                    more.click()
+                    time.sleep(3)
+                except:
+                    pass
+
+                try:
+                    paginator = self.driver.find_element(By.ID, "search-recipes-pagination")
+                    ActionChains(self.driver).move_to_element(paginator).perform()
+                    time.sleep(3)
+                except:
+                    break
+
+                attempts -= 1
+
+        for url, recipe_id in fallback:
+            if self.collected >= self.min_new:
                 break
+            recipe = self.extract_recipe(url, recipe_id)
+            if recipe:
+                self.add_recipe(recipe)
 
-            attempts -= 1
+    def add_recipe(self, recipe: dict):
+        """
+        Convierte la receta en documentos si todavía no se había añadido
+        """
+        recipe_id = recipe["id"]
+        if recipe_id in self.exclude_ids or self.collected >= self.min_new:
+            return
+        self.documents.extend(create_documents_from_recipe(recipe))
+        self.recipes.append(recipe)
+        self.exclude_ids.add(recipe_id)
+        self.collected += 1
+        print(f"Nueva receta agregada: {recipe['title']} - ID: {recipe_id}")
+
+    def fetch_recipe(self, url, recipe_id):
+        """ 
+        Descarga la receta por HTTP sin navegador. Devuelve None si no se pudo
+        obtener o interpretar
+        """
+        try:
+            response = self.session.get(url, timeout=10)
+            if response.status_code != 200:
+                return None
+            return parse_recipe(response.text, url, recipe_id)
+        except requests.RequestException as e:
+            print(f"Error descargando receta en {url}: {e}")
+            return None
 
     def extract_recipe(self, url, recipe_id):
         """ 
-        Extrae la receta del URL
+        Extrae la receta del URL con Selenium
         """
         try:
             self.driver.get(url)
             WebDriverWait(self.driver, 10).until(EC.presence_of_element_located((By.TAG_NAME, "h1")))
-
-            soup = BeautifulSoup(self.driver.page_source, "html.parser")
-
-            title_el = soup.select_one("h1")
-            if not title_el:
-                print("No se encontró el título.")
-                return None
-            title = title_el.text.strip()
-
-            ingredients_div = soup.select_one("#ingredients")
-            ingredients = ingredients_div.text.strip() if ingredients_div else ""
-            
-            steps_ol = soup.select_one("#steps > ol")
-            steps = [li.text.strip() for li in steps_ol.find_all("li")] if steps_ol else []
-
-            time_tag = soup.find("time")
-            publication_date = time_tag.get("datetime") if time_tag and time_tag.get("datetime") else ""
-
-            if not ingredients and not steps:
-                print(f"Receta vacía: {title}")
-                return None
-
-            return {
-                "id": recipe_id,
-                "url": url,
-                "title": title,
-                "ingredients": ingredients,
-                "steps": steps,
-                "publication_date": publication_date
-            }
+            return parse_recipe(self.driver.page_source, url, recipe_id)
 
         except Exception as e:
             print(f"Error extrayendo receta en {url}: {e}")
-            return None
\ No newline at end of file
+            return None
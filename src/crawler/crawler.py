@@ -1,22 +1,44 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib.parse import urlparse
+from concurrent.futures import ThreadPoolExecutor
 from bs4 import BeautifulSoup
 import os
 import json
+import threading
 import time
 
 class Gutenberg:
     BASE_URL = "https://www.gutenberg.org"
     SAVE_PATH = "./gutemberg_texts/"
     METADATA_FILE = "./gutemberg_texts/metadata.json"
+    CHECKPOINT_FILE = "./gutemberg_texts/checkpoint.json"
 
-    def __init__(self, max_books=None):
+    def __init__(self, max_books=None, workers=8, per_host=4, checkpoint_every=20):
         """
-        Inicializa la clase Gutenberg
+        Inicializa la clase Gutenberg.
+        Las descargas se hacen en paralelo con una sesión HTTP compartida, como máximo
+        per_host peticiones simultáneas por host, y cada checkpoint_every libros se
+        guardan los metadatos y la posición del crawl para poder reanudarlo
         """
         os.makedirs(self.SAVE_PATH, exist_ok=True)
-        self.max_books = max_books
+        self.max_books = max_books if max_books is not None else float("inf")
+        self.workers = workers
+        self.per_host = per_host
+        self.checkpoint_every = checkpoint_every
         self.downloaded_books = set([f.replace(".txt", "") for f in os.listdir(self.SAVE_PATH) if f.endswith(".txt")])
         self.metadata_store = self.load_metadata()
+        self.checkpoint = self.load_checkpoint()
+        self.visited = set(self.checkpoint.get("visited", []))
+
+        self._lock = threading.Lock()
+        self._host_slots = {}
+        self.session = requests.Session()
+        retry = Retry(total=5, backoff_factor=1, status_forcelist=[429, 500, 502, 503, 504], allowed_methods=["GET"])
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=workers, max_retries=retry)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
 
     def load_metadata(self):
         """Carga los metadatos desde un archivo JSON o inicia un diccionario vacío."""
@@ -27,28 +49,66 @@ class Gutenberg:
 
     def save_metadata(self):
         """Guarda los metadatos en un archivo JSON."""
-        with open(self.METADATA_FILE, "w", encoding="utf-8") as file:
-            json.dump(self.metadata_store, file, indent=4)
+        with self._lock:
+            metadata = dict(self.metadata_store)
+        self._write_json(self.METADATA_FILE, metadata, indent=4)
+
+    def load_checkpoint(self):
+        """Carga el estado del crawl (página siguiente, enlaces pendientes y visitados)."""
+        if os.path.exists(self.CHECKPOINT_FILE):
+            with open(self.CHECKPOINT_FILE, "r", encoding="utf-8") as file:
+                return json.load(file)
+        return {}
+
+    def save_checkpoint(self, page_url, pending):
+        """Guarda los metadatos y el estado del crawl para poder reanudarlo."""
+        self.save_metadata()
+        with self._lock:
+            visited = sorted(self.visited)
+        self._write_json(self.CHECKPOINT_FILE, {"page_url": page_url, "pending": pending, "visited": visited})
+
+    @staticmethod
+    def _write_json(path, data, indent=None):
+        """Escribe el JSON en un fichero temporal y lo renombra para no dejarlo corrupto."""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            json.dump(data, file, indent=indent)
+        os.replace(tmp_path, path)
+
+    def _get(self, url):
+        """Petición GET limitada por host."""
+        host = urlparse(url).netloc
+        with self._lock:
+            slot = self._host_slots.setdefault(host, threading.BoundedSemaphore(self.per_host))
+        with slot:
+            try:
+                return self.session.get(url, timeout=30)
+            except requests.RequestException as e:
+                print(f"Error al acceder a {url}: {e}")
+                return None
 
     def get_books_links(self, page_url):
-        """Obtiene los enlaces de los libros en la página actual y el enlace de la siguiente página."""
-        response = requests.get(page_url)
-        if response.status_code != 200:
+        """
+        Obtiene los enlaces de los libros en la página actual y el enlace de la siguiente página.
+        Si la página no se pudo descargar devuelve None como lista de enlaces
+        """
+        response = self._get(page_url)
+        if response is None or response.status_code != 200:
             print(f"Error al acceder a {page_url}")
-            return [], None
+            return None, page_url
 
         soup = BeautifulSoup(response.text, "html.parser")
         books = soup.select('li.booklink a')
         book_links = [self.BASE_URL + book["href"] for book in books]
-        next_button = soup.find("a", string="Next")  
+        next_button = soup.find("a", string="Next")
         next_page_url = self.BASE_URL + next_button["href"] if next_button else None
 
         return book_links, next_page_url
 
     def get_book_metadata(self, book_url):
         """Extrae los metadatos y genera el enlace al texto plano."""
-        response = requests.get(book_url)
-        if response.status_code != 200:
+        response = self._get(book_url)
+        if response is None or response.status_code != 200:
             return None
 
         soup = BeautifulSoup(response.text, "html.parser")
@@ -66,18 +126,26 @@ class Gutenberg:
                     if th.text.strip() == "EBook-No.":
                         ebook_no = td.text.strip()
 
-        if not ebook_no or ebook_no in self.downloaded_books:
-            return None
+        with self._lock:
+            if not ebook_no:
+                self.visited.add(book_url)
+                return None
+            if ebook_no in self.downloaded_books:
+                # libro descargado antes de una interrupción sin checkpoint de sus metadatos
+                self.metadata_store.setdefault(ebook_no, metadata)
+                self.visited.add(book_url)
+                return None
+            # se reserva el libro para que otro hilo no lo descargue a la vez
+            self.downloaded_books.add(ebook_no)
+            self.metadata_store[ebook_no] = metadata
 
         txt_page_link = f"https://www.gutenberg.org/cache/epub/{ebook_no}/pg{ebook_no}.txt"
-        self.metadata_store[ebook_no] = metadata
-
         return {"metadata": metadata, "txt_page_link": txt_page_link, "ebook_no": ebook_no}
 
     def extract_text(self, txt_page_link, ebook_no):
         """Extrae el contenido del libro """
-        response = requests.get(txt_page_link)
-        if response.status_code == 200:
+        response = self._get(txt_page_link)
+        if response is not None and response.status_code == 200:
             text_content = response.text.strip()
             lines = text_content.splitlines()
             filtered_text = "\n".join(lines[20:]) if len(lines) > 20 else text_content
@@ -87,41 +155,72 @@ class Gutenberg:
                 file.write(filtered_text)
 
             print(f"Descarga de {ebook_no} completada.")
-            self.downloaded_books.add(ebook_no)  
-        else:
-            print(f"Error al descargar el libro {ebook_no}")
+            return True
+
+        print(f"Error al descargar el libro {ebook_no}")
+        with self._lock:
+            self.downloaded_books.discard(ebook_no)
+            self.metadata_store.pop(ebook_no, None)
+        return False
+
+    def download_book(self, book_url):
+        """
+        Descarga metadatos y texto de un libro. Devuelve True si se descargó uno nuevo.
+        Si la descarga falla el libro no se marca como visitado para reintentarlo
+        """
+        book_data = self.get_book_metadata(book_url)
+        downloaded = bool(book_data) and self.extract_text(book_data["txt_page_link"], book_data["ebook_no"])
+        if downloaded:
+            with self._lock:
+                self.visited.add(book_url)
+        return downloaded
 
     def run(self):
-        """Ejecuta el scraper."""
-        downloaded_count = 0 
-        total_downloaded = len(self.downloaded_books)  
-        page_url = f"{self.BASE_URL}/ebooks/bookshelf/431"
-
-        while downloaded_count < self.max_books and page_url:
-            book_links, next_page_url = self.get_books_links(page_url)
-
-            for book_url in book_links:
-                if downloaded_count >= self.max_books:
-                    break 
-
-                book_data = self.get_book_metadata(book_url)
-                if book_data:
-                    ebook_no = book_data["ebook_no"]
-                    
-                    if ebook_no not in self.downloaded_books:
-                        self.extract_text(book_data["txt_page_link"], ebook_no)
-                        self.downloaded_books.add(ebook_no) 
-                        downloaded_count += 1 
-
-            if downloaded_count < self.max_books and next_page_url:
-                print(f"Moviéndonos a la siguiente página: {next_page_url}")
-                page_url = next_page_url
-            else:
-                break 
-
-        self.save_metadata() 
-        print(f"Descarga completada: {total_downloaded + downloaded_count}/{total_downloaded + self.max_books} libros almacenados.")
+        """Ejecuta el scraper, reanudando desde el último checkpoint si existe."""
+        downloaded_count = 0
+        total_downloaded = len(self.downloaded_books)
+        page_url = self.checkpoint.get("page_url", f"{self.BASE_URL}/ebooks/bookshelf/431")
+        pending = [url for url in self.checkpoint.get("pending", []) if url not in self.visited]
+        # libros que fallaron en esta ejecución: se guardan en el checkpoint para la siguiente
+        failed = []
+        since_checkpoint = 0
+        start = time.time()
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            while downloaded_count < self.max_books:
+                if not pending:
+                    if not page_url:
+                        break
+                    book_links, next_page_url = self.get_books_links(page_url)
+                    if book_links is None:
+                        # se conserva la página que falló para reanudar desde ella
+                        print("Crawl interrumpido; se reanudará desde esta página.")
+                        break
+                    page_url = next_page_url
+                    pending = [url for url in book_links if url not in self.visited]
+                    self.save_checkpoint(page_url, pending + failed)
+                    if page_url:
+                        print(f"Siguiente página: {page_url}")
+                    continue
+
+                remaining = self.max_books - downloaded_count
+                batch_size = int(min(remaining, self.workers * 2))
+                batch, pending = pending[:batch_size], pending[batch_size:]
+
+                for book_url, downloaded in zip(batch, executor.map(self.download_book, batch)):
+                    if downloaded:
+                        downloaded_count += 1
+                        since_checkpoint += 1
+                    elif book_url not in self.visited:
+                        failed.append(book_url)
+                if since_checkpoint >= self.checkpoint_every:
+                    self.save_checkpoint(page_url, pending + failed)
+                    since_checkpoint = 0
+
+        self.save_checkpoint(page_url, pending + failed)
+        elapsed = time.time() - start
+        print(f"Descarga completada: {total_downloaded + downloaded_count} libros almacenados ({downloaded_count} nuevos en {elapsed:.1f}s).")
 
 if __name__ == "__main__":
-    scraper = Gutenberg(max_books=760)  
-    scraper.run()
\ No newline at end of file
+    scraper = Gutenberg(max_books=760)
+    scraper.run()
@@ -0,0 +1,159 @@
+import atexit
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from selenium import webdriver
+from selenium.common.exceptions import WebDriverException
+from selenium.webdriver.chrome.options import Options
+
+def chrome_options() -> Options:
+    """
+    Opciones de Chrome headless compartidas por los crawlers
+    """
+    options = Options()
+    options.add_argument("--headless")
+    options.add_argument("--disable-gpu")
+    options.add_argument("--no-sandbox")
+    options.add_argument("--disable-dev-shm-usage")
+    options.add_argument("--blink-settings=imagesEnabled=false")
+    return options
+
+
+class PooledDriver:
+    def __init__(self, driver, factory=None, max_pages: int = None):
+        """
+        Envuelve un webdriver y cuenta las páginas abiertas para poder reciclarlo.
+        Con factory y max_pages el navegador se sustituye por uno nuevo antes de abrir
+        una página más, aunque siga prestado (un recorrido largo con un solo préstamo)
+        """
+        self.driver = driver
+        self.factory = factory
+        self.max_pages = max_pages
+        self.pages = 0
+        self.created_at = time.time()
+
+    def get(self, url):
+        if self.factory is not None and self.max_pages and self.pages >= self.max_pages:
+            self.recycle()
+        self.pages += 1
+        return self.driver.get(url)
+
+    def recycle(self):
+        try:
+            self.driver.quit()
+        except Exception:
+            pass
+        self.driver = self.factory()
+        self.pages = 0
+        self.created_at = time.time()
+
+    def __getattr__(self, name):
+        return getattr(self.driver, name)
+
+
+class DriverPool:
+    def __init__(self, size: int = 2, max_pages: int = 200, options_factory=chrome_options):
+        """
+        Pool acotado de navegadores Chrome headless.
+        Como máximo hay size navegadores prestados a la vez y cada uno se recicla
+        tras abrir max_pages páginas, también dentro de un mismo préstamo
+        """
+        self.size = size
+        self.max_pages = max_pages
+        self.options_factory = options_factory
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._live = set()
+        self._closed = False
+
+    @contextmanager
+    def lease(self, timeout: float = None):
+        """
+        Presta un navegador del pool y lo devuelve al salir del bloque
+        """
+        if self._closed:
+            raise RuntimeError("El pool de navegadores está cerrado.")
+        if not self._slots.acquire(timeout=timeout):
+            raise TimeoutError("No hay navegadores libres en el pool.")
+        driver = None
+        try:
+            driver = self._acquire()
+            yield driver
+        finally:
+            if driver is not None:
+                self._release(driver)
+            self._slots.release()
+
+    def shutdown(self):
+        """
+        Cierra todos los navegadores del pool
+        """
+        self._closed = True
+        with self._lock:
+            drivers = list(self._live)
+        for driver in drivers:
+            self._destroy(driver)
+
+    def _acquire(self) -> PooledDriver:
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return self._create()
+            if self._healthy(driver):
+                return driver
+            self._destroy(driver)
+
+    def _release(self, driver: PooledDriver):
+        if self._closed or driver.pages >= self.max_pages or not self._healthy(driver):
+            self._destroy(driver)
+            return
+        try:
+            driver.driver.get("about:blank")
+            driver.delete_all_cookies()
+        except WebDriverException:
+            self._destroy(driver)
+            return
+        self._idle.put(driver)
+
+    def _create(self) -> PooledDriver:
+        driver = PooledDriver(
+            webdriver.Chrome(options=self.options_factory()),
+            factory=lambda: webdriver.Chrome(options=self.options_factory()), max_pages=self.max_pages
+        )
+        with self._lock:
+            self._live.add(driver)
+        return driver
+
+    def _destroy(self, driver: PooledDriver):
+        with self._lock:
+            self._live.discard(driver)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _healthy(driver: PooledDriver) -> bool:
+        try:
+            driver.window_handles
+            return True
+        except WebDriverException:
+            return False
+
+
+_default_pool = None
+_default_lock = threading.Lock()
+
+def get_driver_pool(size: int = 2, max_pages: int = 200) -> DriverPool:
+    """
+    Devuelve el pool compartido por los crawlers (se crea en la primera llamada)
+    """
+    global _default_pool
+    with _default_lock:
+        if _default_pool is None:
+            _default_pool = DriverPool(size=size, max_pages=max_pages)
+            atexit.register(_default_pool.shutdown)
+        return _default_pool
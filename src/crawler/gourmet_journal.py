@@ -1,41 +1,32 @@
 import os
-import json
-from selenium import webdriver
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
 from selenium.webdriver.common.keys import Keys
 from bs4 import BeautifulSoup
 import time
-from selenium.webdriver.chrome.options import Options
+from src.crawler.driver_pool import get_driver_pool
+from src.crawler.article_store import ArticleStore, article_file_name
  
 class GourmetJournal:
-    def __init__(self):
+    def __init__(self, pool=None):
         """
         Inicializa la clase y configura la URL base, rutas de salida, 
-        carga artículos guardados.
+        carga artículos guardados. Los navegadores se toman del pool compartido.
         """
         self.base_url = "https://www.thegourmetjournal.com/"
         self.articles = []
         self.output_folder = "saved_articles"
-        self.json_path = os.path.join(self.output_folder, "articles.json")
 
         os.makedirs(self.output_folder, exist_ok=True)
-        self._load_json()
-        self.chrome_options = Options()
-        self.chrome_options.add_argument("--disable-gpu")  
-        self.chrome_options.add_argument("--headless")
-        self.driver = webdriver.Chrome(options=self.chrome_options)
+        self._load_store()
+        self.pool = pool or get_driver_pool()
+        self.driver = None
 
-    def _load_json(self):
+    def _load_store(self):
         """
-        Carga los artículos guardados en el json.
-        Si no existe, crea un diccionario vacío.
+        Abre el almacén de artículos guardados (importa articles.json si existe).
         """  
-        if os.path.exists(self.json_path):
-            with open(self.json_path, "r", encoding="utf-8") as f:
-                self.saved_articles = json.load(f)
-        else:
-            self.saved_articles = {}
+        self.saved_articles = ArticleStore(self.output_folder)
 
     def open_page(self):
         """
@@ -110,6 +101,10 @@ class GourmetJournal:
         """
         Obtiene el contenido de un artículo.
         """
+        if url in self.saved_articles:
+            print(f"El articulo '{url}', ya esta guardado.")
+            return None
+
         self.driver.get(url)
         time.sleep(2)
         soup = BeautifulSoup(self.driver.page_source, "html.parser")
@@ -117,10 +112,6 @@ class GourmetJournal:
         title_element = soup.select_one("h1.entry-title")
         title = title_element.get_text().strip() if title_element else "Sin titulo"
 
-        if title in self.saved_articles:
-            print(f"El articulo '{title}', ya esta guardado.")
-            return None
-
         content_div = soup.select_one("#primary > article > div:nth-of-type(2)")
         content = content_div.get_text().strip() if content_div else "Contenido no encontrado"
         
@@ -131,15 +122,12 @@ class GourmetJournal:
             "title": title,
             "url": url,
             "publication_date": publication_date,
-            "content": content
+            "content": content,
+            "file_name": article_file_name(title, url)
         }
 
-        self.saved_articles[title] = article
-        with open(self.json_path, "w", encoding="utf-8") as f:
-            json.dump(self.saved_articles, f, ensure_ascii=False, indent=4)
-
-        title_clean = title.replace(" ", "_").replace("/", "_")[:50]
-        txt_path = os.path.join(self.output_folder, f"{title_clean}.txt")
+        self.saved_articles.add(article)
+        txt_path = os.path.join(self.output_folder, article["file_name"])
 
         with open(txt_path, "w", encoding="utf-8") as f:
             f.write(article["content"])
@@ -150,18 +138,24 @@ class GourmetJournal:
         """
         Inicia la busqueda y recopilación de artículos.
         """
-        self.open_page()
-        self.open_main_menu()
-        categories = self.get_menu_links()
-
-        for category_url in categories:
-            articles = self.get_articles(category_url)
-            for article_url in articles:
-                article = self.extract_content(article_url)
-                if article:
-                    self.articles.append(article)
-
-        self.driver.quit()
+        with self.pool.lease() as self.driver:
+            self.open_page()
+            self.open_main_menu()
+            categories = self.get_menu_links()
+
+        # cada categoría toma su propio préstamo para que el pool pueda reciclar el navegador
+        try:
+            for category_url in categories:
+                with self.pool.lease() as self.driver:
+                    articles = self.get_articles(category_url)
+                    for article_url in articles:
+                        article = self.extract_content(article_url)
+                        if article:
+                            self.articles.append(article)
+        finally:
+            self.saved_articles.flush()
+
+        self.driver = None
         return self.articles
 
 if __name__ == "__main__": 
@@ -0,0 +1,321 @@
+import re
+import json
+import sqlite3
+import threading
+import unicodedata
+import numpy as np
+from src.rag.bm25 import STOPWORDS, stem
+
+UNITS = {
+    "g", "gr", "grs", "gramo", "gramos", "kg", "kilo", "kilos", "mg", "ml", "cc", "l", "lt", "lts", "litro", "litros",
+    "taza", "tazas", "tacita", "tacitas", "vaso", "vasos", "cucharada", "cucharadas", "cucharadita", "cucharaditas",
+    "cda", "cdas", "cdta", "cdtas", "cdita", "cditas", "cs", "pizca", "pizcas", "chorro", "chorrito", "punado", "punados",
+    "diente", "dientes", "unidad", "unidades", "u", "lata", "latas", "paquete", "paquetes", "sobre", "sobres",
+    "rebanada", "rebanadas", "rodaja", "rodajas", "ramita", "ramitas", "trozo", "trozos", "hoja", "hojas",
+    "medio", "media", "cuarto", "poco", "poca", "pocos", "pocas", "cantidad", "necesaria", "opcional", "aprox",
+}
+DESCRIPTORS = {
+    "picado", "picada", "picados", "picadas", "rallado", "rallada", "rallados", "ralladas", "cortado", "cortada",
+    "cortados", "cortadas", "fresco", "fresca", "frescos", "frescas", "grande", "grandes", "pequeno", "pequena",
+    "pequenos", "pequenas", "mediano", "mediana", "medianos", "medianas", "gusto", "cubos", "cubitos", "tiras",
+    "finamente", "troceado", "troceada", "pelado", "pelada", "pelados", "peladas", "molido", "molida", "maduro",
+    "madura", "maduros", "maduras", "aproximadamente", "extra", "virgen",
+}
+QUERY_PREFIX = re.compile(
+    r"^\s*(?:que|como)?\s*(?:puedo|podria|se puede|hago|hacer)?\s*(?:cocinar|hacer|preparar)?\s*"
+    r"(?:recetas?\s+)?(?:con|tengo)\s+"
+)
+# "con" no separa: "pan con tomate" o "arroz con pollo" son platos
+QUERY_SEPARATORS = re.compile(r"[,;+/]|\by\b|\be\b")
+MIN_QUERY_INGREDIENTS = 2
+# rank lee de SQLite como mucho RANK_CANDIDATES * k recetas para desempatar
+RANK_CANDIDATES = 4
+# parámetros por consulta, por debajo del límite de variables de SQLite
+SQL_CHUNK = 900
+
+def _ascii(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("utf-8").lower()
+
+def normalize_ingredient(line: str) -> str:
+    """
+    Nombre normalizado de un ingrediente: sin cantidades, unidades ni descripciones,
+    sin tildes y en singular ("2 dientes de ajo picados" -> "ajo",
+    "200 g de pechuga de pollo" -> "pechuga pollo")
+    """
+    text = re.sub(r"\([^)]*\)", " ", _ascii(line))
+    words = re.findall(r"[a-z]+", text)
+    words = [w for w in words if w not in UNITS and w not in DESCRIPTORS and w not in STOPWORDS and len(w) > 1]
+    return " ".join(stem(w) for w in words)
+
+def parse_ingredients(lines: list[str]) -> list[str]:
+    """
+    Nombres normalizados y sin repetir de las líneas de ingredientes de una receta
+    """
+    names = []
+    for line in lines:
+        name = normalize_ingredient(line)
+        if name and name not in names:
+            names.append(name)
+    return names
+
+
+class IngredientIndex:
+    def __init__(self, path: str):
+        """
+        Índice de ingredientes de las recetas de Cookpad: para cada ingrediente
+        normalizado, la lista ordenada de ids de receta que lo usan. Una consulta
+        ("pollo") coincide con los ingredientes que contienen todos sus términos
+        ("pechuga pollo"), nunca con términos sueltos de ingredientes distintos.
+        Se guarda en SQLite (listas como arrays uint64) y se consulta en memoria
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS recipes (
+                id INTEGER PRIMARY KEY,
+                title TEXT,
+                url TEXT,
+                ingredients TEXT NOT NULL
+            )
+        """)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS names (name TEXT PRIMARY KEY, ids BLOB NOT NULL)")
+        # la versión anterior indexaba términos sueltos; sus listas se reconstruyen por ingrediente
+        self.conn.execute("DROP TABLE IF EXISTS postings")
+        self.conn.commit()
+        self.postings = {}
+        self.terms = {}
+        # número de ingredientes de cada receta (ids ordenados), para desempatar en rank
+        self.size_ids = np.zeros(0, dtype=np.uint64)
+        self.sizes = np.zeros(0, dtype=np.int64)
+        self._data_version = None
+        self._reload()
+        if not self.postings and len(self):
+            self._rebuild()
+
+    @classmethod
+    def load(cls, path: str, vector_store, batch_size: int = 1000):
+        """
+        Abre el índice; si está vacío lo reconstruye con los metadatos de las recetas de Chroma
+        """
+        index = cls(path)
+        if len(index):
+            return index
+        collection = vector_store._collection
+        offset = 0
+        recipes = []
+        while True:
+            batch = collection.get(where={"source_type": "cookpad"}, include=["metadatas"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            for meta in batch["metadatas"]:
+                if meta and meta.get("ingredients") and meta.get("id"):
+                    recipes.append({"id": meta["id"], "title": meta.get("title"), "url": meta.get("url"),
+                                    "ingredient_names": meta["ingredients"].split("; ")})
+            offset += len(batch["ids"])
+        if recipes:
+            index.add_many(recipes)
+        return index
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM recipes").fetchone()[0]
+
+    def add_many(self, recipes: list[dict]):
+        """
+        Indexa recetas con id, title, url e ingredient_names (ya normalizados)
+        o ingredient_list (líneas sin normalizar)
+        """
+        new_names = {}
+        rows = []
+        for recipe in recipes:
+            names = recipe.get("ingredient_names") or parse_ingredients(recipe.get("ingredient_list", []))
+            if not names or not str(recipe["id"]).isdigit():
+                continue
+            recipe_id = int(recipe["id"])
+            rows.append((recipe_id, recipe.get("title"), recipe.get("url"), json.dumps(names, ensure_ascii=False)))
+            for name in set(names):
+                new_names.setdefault(name, []).append(recipe_id)
+        if not rows:
+            return
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self.conn.executemany("INSERT OR REPLACE INTO recipes (id, title, url, ingredients) VALUES (?, ?, ?, ?)", rows)
+            for name, ids in new_names.items():
+                self._store(name, np.union1d(self._stored(name), np.asarray(ids, dtype=np.uint64)))
+            self._set_sizes(
+                np.asarray([row[0] for row in rows], dtype=np.uint64), np.asarray([len(json.loads(row[3])) for row in rows])
+            )
+
+    def remove(self, recipe_ids: list):
+        ids = [int(i) for i in recipe_ids if str(i).isdigit()]
+        if not ids:
+            return
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            placeholders = ",".join("?" * len(ids))
+            names = {
+                name for (stored,) in self.conn.execute(f"SELECT ingredients FROM recipes WHERE id IN ({placeholders})", ids)
+                for name in json.loads(stored)
+            }
+            self.conn.execute(f"DELETE FROM recipes WHERE id IN ({placeholders})", ids)
+            removed = np.asarray(ids, dtype=np.uint64)
+            for name in names:
+                self._store(name, np.setdiff1d(self._stored(name), removed))
+            self._set_sizes(removed, np.zeros(0, dtype=np.int64))
+
+    def matching_names(self, name: str) -> set:
+        """
+        Ingredientes indexados que contienen todos los términos de name
+        """
+        self._refresh()
+        found = None
+        with self._lock:
+            for term in name.split():
+                names = self.terms.get(term, set())
+                found = set(names) if found is None else found & names
+                if not found:
+                    return set()
+        return found or set()
+
+    def knows(self, name: str) -> bool:
+        """
+        Si algún ingrediente indexado contiene todos los términos de name
+        """
+        return bool(self.matching_names(name))
+
+    def recipes_with(self, name: str) -> np.ndarray:
+        """
+        Ids de las recetas con un ingrediente que contiene todos los términos de name
+        """
+        lists = [self.postings[match] for match in self.matching_names(name) if match in self.postings]
+        if not lists:
+            return np.zeros(0, dtype=np.uint64)
+        return np.unique(np.concatenate(lists))
+
+    def containing(self, names: list[str]) -> list[int]:
+        """
+        Ids de las recetas que contienen todos los ingredientes
+        """
+        ids = None
+        for name in names:
+            found = self.recipes_with(name)
+            ids = found if ids is None else np.intersect1d(ids, found, assume_unique=True)
+        return [] if ids is None else ids.tolist()
+
+    def rank(self, names: list[str], k: int = 10) -> list[dict]:
+        """
+        Recetas ordenadas por cuántos de los ingredientes usan y, a igualdad, por
+        cuántos ingredientes más necesitan. Devuelve id, title, url, matched y missing.
+        Los candidatos se ordenan en memoria y solo se leen de SQLite los RANK_CANDIDATES * k mejores
+        """
+        per_name = [self.recipes_with(name) for name in names]
+        if not any(len(ids) for ids in per_name):
+            return []
+        candidates, counts = np.unique(np.concatenate(per_name), return_counts=True)
+        # orden aproximado en memoria (coincidencias y, a igualdad, ingredientes de más);
+        # solo se leen de SQLite los mejores candidatos para calcular el orden exacto
+        with self._lock:
+            positions = np.minimum(np.searchsorted(self.size_ids, candidates), max(len(self.size_ids) - 1, 0))
+            sizes = np.where(self.size_ids[positions] == candidates, self.sizes[positions], 0) if len(self.size_ids) else 0
+        order = np.lexsort((sizes - counts, -counts))
+        selected = candidates[order[:RANK_CANDIDATES * k]].tolist()
+
+        rows = []
+        with self._lock:
+            for start in range(0, len(selected), SQL_CHUNK):
+                chunk = selected[start:start + SQL_CHUNK]
+                placeholders = ",".join("?" * len(chunk))
+                rows.extend(self.conn.execute(
+                    f"SELECT id, title, url, ingredients FROM recipes WHERE id IN ({placeholders})", chunk
+                ).fetchall())
+        covers = lambda query, name: set(query.split()) <= set(name.split())
+        results = []
+        for recipe_id, title, url, ingredients in rows:
+            recipe_names = json.loads(ingredients)
+            matched = [name for name in names if any(covers(name, recipe_name) for recipe_name in recipe_names)]
+            missing = [name for name in recipe_names if not any(covers(q, name) for q in matched)]
+            results.append({"id": str(recipe_id), "title": title, "url": url, "matched": matched, "missing": missing,
+                            "ingredients": recipe_names})
+        results.sort(key=lambda r: (-len(r["matched"]), len(r["missing"])))
+        return results[:k]
+
+    def close(self):
+        self.conn.close()
+
+    def _stored(self, name: str) -> np.ndarray:
+        row = self.conn.execute("SELECT ids FROM names WHERE name = ?", (name,)).fetchone()
+        return np.frombuffer(row[0], dtype=np.uint64) if row else np.zeros(0, dtype=np.uint64)
+
+    def _store(self, name: str, ids: np.ndarray):
+        if len(ids):
+            self.conn.execute("INSERT OR REPLACE INTO names (name, ids) VALUES (?, ?)", (name, ids.tobytes()))
+            self.postings[name] = ids
+            for term in name.split():
+                self.terms.setdefault(term, set()).add(name)
+            return
+        self.conn.execute("DELETE FROM names WHERE name = ?", (name,))
+        self.postings.pop(name, None)
+        for term in name.split():
+            self.terms.get(term, set()).discard(name)
+
+    def _set_sizes(self, ids: np.ndarray, sizes: np.ndarray):
+        """
+        Sustituye el número de ingredientes de estas recetas (sin sizes, las quita)
+        """
+        keep = ~np.isin(self.size_ids, ids)
+        size_ids = np.concatenate([self.size_ids[keep], ids[:len(sizes)]])
+        all_sizes = np.concatenate([self.sizes[keep], sizes])
+        order = np.argsort(size_ids, kind="stable")
+        self.size_ids, self.sizes = size_ids[order], all_sizes[order]
+
+    def _rebuild(self):
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            by_name = {}
+            for recipe_id, stored in self.conn.execute("SELECT id, ingredients FROM recipes"):
+                for name in set(json.loads(stored)):
+                    by_name.setdefault(name, []).append(recipe_id)
+            for name, ids in by_name.items():
+                self._store(name, np.unique(np.asarray(ids, dtype=np.uint64)))
+
+    def _refresh(self):
+        # otro proceso pudo añadir recetas; data_version cambia cuando otra conexión confirma cambios
+        with self._lock:
+            if self.conn.execute("PRAGMA data_version").fetchone()[0] != self._data_version:
+                self._reload()
+
+    def _reload(self):
+        self.postings = {name: np.frombuffer(ids, dtype=np.uint64) for name, ids in self.conn.execute("SELECT name, ids FROM names")}
+        self.terms = {}
+        for name in self.postings:
+            for term in name.split():
+                self.terms.setdefault(term, set()).add(name)
+        rows = self.conn.execute("SELECT id, json_array_length(ingredients) FROM recipes ORDER BY id").fetchall()
+        self.size_ids = np.asarray([row[0] for row in rows], dtype=np.uint64)
+        self.sizes = np.asarray([row[1] for row in rows], dtype=np.int64)
+        self._data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+def ingredient_query(query: str, index: IngredientIndex) -> list[str] | None:
+    """
+    Si la query es explícitamente una lista de ingredientes ("pollo, limón y ajo",
+    "¿qué puedo cocinar con arroz y huevo?", "tengo patatas y cebolla") devuelve sus
+    nombres normalizados; si no, None. Hacen falta al menos dos ingredientes conocidos
+    separados por comas o "y"; un plato ("pan con tomate", "tortilla de patatas")
+    no es una lista aunque sus palabras sean ingredientes
+    """
+    text = re.sub(r"[¿?¡!.]", " ", _ascii(query)).strip()
+    text = QUERY_PREFIX.sub("", text)
+    pieces = [piece.strip() for piece in QUERY_SEPARATORS.split(text) if piece.strip()]
+    if len(pieces) < MIN_QUERY_INGREDIENTS:
+        return None
+    names = []
+    for piece in pieces:
+        name = normalize_ingredient(piece)
+        # una palabra que no aparece en ningún ingrediente (p. ej. "rapida") indica una pregunta normal
+        if not name or not index.knows(name):
+            return None
+        if name not in names:
+            names.append(name)
+    return names if len(names) >= MIN_QUERY_INGREDIENTS else None
@@ -0,0 +1,262 @@
+import os
+import sys
+import json
+import hashlib
+import sqlite3
+import argparse
+from collections import deque
+from itertools import islice
+from langchain.schema import Document
+from src.preprocessing.gourmet import cleaned_text
+from src.preprocessing.gutenberg import clean_text
+from src.chunking.gourmet import chunk_article
+from src.chunking.gutenberg import chunk_books
+from src.crawler.article_store import ArticleStore
+
+SOURCES = {
+    "gourmet": "saved_articles",
+    "gutenberg": "gutemberg_texts",
+}
+
+
+class SourceFile:
+    def __init__(self, path: str, name: str, sha: str, text: str):
+        self.path = path
+        self.name = name
+        self.sha = sha
+        self.text = text
+
+
+class Manifest:
+    def __init__(self, path: str):
+        """
+        Registro de los ficheros ingeridos: hash del contenido y ids de sus chunks
+        """
+        # RAG ya no crea persist_directory al construirse
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, kind TEXT NOT NULL, sha TEXT NOT NULL)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS chunks (id TEXT PRIMARY KEY, path TEXT NOT NULL)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS chunks_path ON chunks(path)")
+        self.conn.commit()
+
+    def sha(self, path: str) -> str | None:
+        row = self.conn.execute("SELECT sha FROM files WHERE path = ?", (path,)).fetchone()
+        return row[0] if row else None
+
+    def paths(self, kind: str) -> set:
+        return {row[0] for row in self.conn.execute("SELECT path FROM files WHERE kind = ?", (kind,))}
+
+    def chunk_ids(self, path: str) -> set:
+        return {row[0] for row in self.conn.execute("SELECT id FROM chunks WHERE path = ?", (path,))}
+
+    def replace(self, path: str, kind: str, sha: str, ids: list[str]):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+            self.conn.executemany("INSERT OR REPLACE INTO chunks (id, path) VALUES (?, ?)", [(i, path) for i in ids])
+            self.conn.execute("INSERT OR REPLACE INTO files (path, kind, sha) VALUES (?, ?, ?)", (path, kind, sha))
+
+    def add_chunks(self, path: str, kind: str, ids: list[str]):
+        """
+        Registra un lote de chunks ya insertados. El fichero queda sin hash hasta replace,
+        así que si la ingesta se interrumpe se vuelve a procesar sin insertar otra vez estos chunks
+        """
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO chunks (id, path) VALUES (?, ?)", [(i, path) for i in ids])
+            self.conn.execute(
+                "INSERT INTO files (path, kind, sha) VALUES (?, ?, '') ON CONFLICT(path) DO UPDATE SET sha = ''", (path, kind)
+            )
+
+    def remove(self, path: str):
+        with self.conn:
+            self.conn.execute("DELETE FROM chunks WHERE path = ?", (path,))
+            self.conn.execute("DELETE FROM files WHERE path = ?", (path,))
+
+    def close(self):
+        self.conn.close()
+
+
+def file_sha(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def chunk_id(path: str, offset: int, text: str) -> str:
+    """
+    Id determinista del chunk: mismo fichero, posición y texto dan el mismo id
+    """
+    return hashlib.sha1(f"{path}\0{offset}\0{text}".encode("utf-8")).hexdigest()
+
+def read_sources(folder: str, manifest: Manifest, seen: set, stats: dict, force: bool = False):
+    """
+    Lee uno a uno los .txt que cambiaron desde la última ingesta
+    """
+    for name in sorted(os.listdir(folder)):
+        path = os.path.join(folder, name)
+        if not name.endswith(".txt") or not os.path.isfile(path):
+            continue
+        seen.add(path)
+        sha = file_sha(path)
+        if not force and manifest.sha(path) == sha:
+            stats["unchanged"] += 1
+            continue
+        with open(path, "r", encoding="utf-8") as f:
+            yield SourceFile(path, name, sha, f.read())
+
+def clean(files, kind: str):
+    for source in files:
+        source.text = cleaned_text(source.text).lower() if kind == "gourmet" else clean_text(source.text)
+        yield source
+
+def chunk(files, kind: str, processes: int = None, group_size: int = 8):
+    """
+    Produce (fichero, [(posición, texto)]) para cada fichero
+    """
+    if kind == "gourmet":
+        for source in files:
+            yield source, chunk_article(source.text)
+        return
+
+    # los libros se fragmentan por grupos; la cola guarda los ficheros de los grupos en vuelo
+    pending = deque()
+    def groups():
+        iterator = iter(files)
+        while group := list(islice(iterator, group_size)):
+            pending.append(group)
+            yield [source.text for source in group]
+
+    for fragments_per_book in chunk_books(groups(), processes=processes):
+        for source, fragments in zip(pending.popleft(), fragments_per_book):
+            yield source, with_offsets(source.text, fragments)
+
+def with_offsets(text: str, fragments: list[str]) -> list[tuple[int, str]]:
+    """
+    Posición de cada fragmento dentro del texto original
+    """
+    offsets = []
+    cursor = 0
+    for fragment in fragments:
+        position = text.find(fragment[:50], cursor)
+        if position >= 0:
+            cursor = position
+        offsets.append((cursor, fragment))
+        cursor += 1
+    return offsets
+
+def metadata_for(kind: str, folder: str):
+    """
+    Devuelve una función que construye los metadatos de un fichero
+    """
+    if kind == "gourmet":
+        store = ArticleStore(folder)
+        def gourmet_metadata(source: SourceFile) -> dict:
+            article = store.get_by_file(source.name) or {}
+            return {
+                "source": source.path,
+                "source_type": "gourmet",
+                "title": article.get("title", ""),
+                "url": article.get("url", ""),
+                "publication_date": article.get("publication_date", "")
+            }
+        return gourmet_metadata
+
+    metadata_path = os.path.join(folder, "metadata.json")
+    books = {}
+    if os.path.exists(metadata_path):
+        with open(metadata_path, "r", encoding="utf-8") as f:
+            books = json.load(f)
+    def gutenberg_metadata(source: SourceFile) -> dict:
+        ebook_no = source.name[:-len(".txt")]
+        book = books.get(ebook_no, {})
+        return {
+            "source": source.path,
+            "source_type": "gutenberg",
+            "title": book.get("Title", ""),
+            "url": f"https://www.gutenberg.org/ebooks/{ebook_no}",
+            "publication_date": book.get("Release Date", "")
+        }
+    return gutenberg_metadata
+
+def upsert(rag, manifest: Manifest, chunked, kind: str, metadata_fn, stats: dict, batch_size: int = 256):
+    """
+    Inserta los chunks nuevos de cada fichero y borra los que ya no existen
+    """
+    for source, chunks in chunked:
+        metadata = metadata_fn(source)
+        ids = [chunk_id(source.path, offset, text) for offset, text in chunks]
+        old_ids = manifest.chunk_ids(source.path)
+        stats["changed" if old_ids else "new"] += 1
+
+        stale = list(old_ids - set(ids))
+        rag.delete_documents(stale)
+        stats["deleted_chunks"] += len(stale)
+
+        # start_index permite unir en el prompt los chunks contiguos de un mismo documento
+        new = [(i, offset, text) for i, (offset, text) in zip(ids, chunks) if i not in old_ids]
+        for start in range(0, len(new), batch_size):
+            batch = new[start:start + batch_size]
+            rag.add_documents(
+                [Document(page_content=text, metadata=dict(metadata, start_index=offset)) for _, offset, text in batch],
+                ids=[i for i, _, _ in batch]
+            )
+            manifest.add_chunks(source.path, kind, [i for i, _, _ in batch])
+        stats["added_chunks"] += len(new)
+        manifest.replace(source.path, kind, source.sha, ids)
+        print(f"{source.name}: {len(new)} chunks nuevos, {len(stale)} borrados.")
+
+def remove_deleted(rag, manifest: Manifest, kind: str, seen: set, stats: dict):
+    """
+    Borra del índice los chunks de los ficheros que ya no existen
+    """
+    for path in manifest.paths(kind) - seen:
+        ids = manifest.chunk_ids(path)
+        rag.delete_documents(list(ids))
+        manifest.remove(path)
+        stats["removed"] += 1
+        stats["deleted_chunks"] += len(ids)
+        print(f"{path}: eliminado, {len(ids)} chunks borrados.")
+
+def ingest(kind: str, folder: str = None, rag=None, processes: int = None, batch_size: int = 256, force: bool = False) -> dict:
+    """
+    Ingesta incremental: leer -> limpiar -> fragmentar -> embeber e insertar.
+    Solo se procesan los ficheros nuevos o modificados y se borran los chunks de los
+    ficheros editados o eliminados. Devuelve un resumen de lo que cambió
+    """
+    if rag is None:
+        from src.rag.rag_model import RAG
+        rag = RAG()
+    folder = folder or SOURCES[kind]
+    manifest = Manifest(os.path.join(rag.persist_directory, "ingest_manifest.db"))
+    stats = dict.fromkeys(["new", "changed", "unchanged", "removed", "added_chunks", "deleted_chunks"], 0)
+    seen = set()
+    try:
+        files = read_sources(folder, manifest, seen, stats, force=force)
+        chunked = chunk(clean(files, kind), kind, processes=processes)
+        upsert(rag, manifest, chunked, kind, metadata_for(kind, folder), stats, batch_size=batch_size)
+        remove_deleted(rag, manifest, kind, seen, stats)
+    finally:
+        manifest.close()
+    print(f"Ingesta de {kind} terminada: {stats}")
+    return stats
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Ingesta incremental de documentos en el vector store")
+    parser.add_argument("source", choices=[*SOURCES, "all"])
+    parser.add_argument("--folder", help="carpeta con los .txt (por defecto la de cada fuente)")
+    parser.add_argument("--persist-directory", default="./chroma_lan")
+    parser.add_argument("--processes", type=int, default=None, help="procesos para la fragmentación semántica")
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--force", action="store_true", help="reprocesar aunque el fichero no haya cambiado")
+    args = parser.parse_args(argv)
+
+    from src.rag.rag_model import RAG
+    rag = RAG(persist_directory=args.persist_directory)
+    kinds = list(SOURCES) if args.source == "all" else [args.source]
+    for kind in kinds:
+        folder = args.folder if args.folder and len(kinds) == 1 else SOURCES[kind]
+        ingest(kind, folder, rag=rag, processes=args.processes, batch_size=args.batch_size, force=args.force)
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
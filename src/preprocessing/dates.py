@@ -0,0 +1,35 @@
+from datetime import datetime, timezone
+from dateutil.parser import isoparse, parse
+
+DATE_FIELD = "publication_ts"
+
+def to_epoch(value) -> int | None:
+    """
+    Convierte una fecha (ISO, texto o datetime) a segundos desde epoch.
+    Devuelve None si la fecha no se puede interpretar.
+    """
+    if value is None or value == "":
+        return None
+    if isinstance(value, (int, float)):
+        return int(value)
+    try:
+        dt = value if isinstance(value, datetime) else isoparse(value)
+    except (ValueError, TypeError, OverflowError):
+        # fechas no ISO como las de Gutenberg ("Jun 1, 2004")
+        try:
+            dt = parse(value)
+        except (ValueError, TypeError, OverflowError):
+            return None
+    # se ignora la zona horaria, igual que al comparar fechas en RAG.retrieve
+    dt = dt.replace(tzinfo=timezone.utc)
+    return int(dt.timestamp())
+
+def with_date_index(metadata: dict) -> dict:
+    """
+    Añade el campo numérico de fecha a los metadatos si se puede calcular
+    """
+    if DATE_FIELD not in metadata:
+        ts = to_epoch(metadata.get("publication_date"))
+        if ts is not None:
+            metadata[DATE_FIELD] = ts
+    return metadata
@@ -0,0 +1,92 @@
+import re
+import string
+import unicodedata
+from multiprocessing import Pool
+
+HEADER_MARKERS = ("preface", "table of contents", "contents")
+HEADER_WINDOW = 100_000
+FOOTER_WINDOW = 100_000
+
+_WHITESPACE = re.compile(r"\s+")
+_LEADING_WHITESPACE = re.compile(r"\s*")
+_SECTION = re.compile(r"\bsection\s*\d+")
+_FOOTER = re.compile(r"\bend of the project gutenberg ebook\b.*|\bstart: full license\b.*")
+_PROMOTIONS = re.compile(r"(P\.D\.|Descubre más en|Síguenos en|Visita nuestro sitio web|Ver:).*", re.IGNORECASE)
+_SOCIAL = re.compile(r"https?://[^\s]+|@gourmetjournal", re.IGNORECASE)
+
+# tras normalizar el texto solo quedan caracteres ascii, así que [^\w\s,.:\-] es
+# exactamente el conjunto de ascii que no son letras, dígitos, _, espacios ni ,.:-
+_ALLOWED = set(string.ascii_letters + string.digits + "_,.:-" + " \t\n\r\x0b\x0c\x1c\x1d\x1e\x1f")
+_DROP_SPECIAL = {i: None for i in range(128) if chr(i) not in _ALLOWED}
+
+
+def to_ascii(text: str) -> str:
+    return unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("utf-8")
+
+def strip_headers(text: str, window: int | None = HEADER_WINDOW) -> str:
+    """
+    Equivale a remove_headers sobre un texto en minúsculas: para cada marcador borra
+    desde el inicio de la línea de su primera aparición hasta el marcador y los espacios
+    siguientes. Solo se busca en los primeros window caracteres (None = todo el texto)
+    """
+    for marker in HEADER_MARKERS:
+        end = len(text) if window is None else min(len(text), window)
+        position = text.find(marker, 0, end)
+        if position < 0:
+            continue
+        line_start = text.rfind("\n", 0, position) + 1
+        cut = _LEADING_WHITESPACE.match(text, position + len(marker)).end()
+        text = text[:line_start] + text[cut:]
+    return text
+
+def strip_footer(text: str, window: int | None = FOOTER_WINDOW) -> str:
+    """
+    Equivale a remove_footer. Las marcas de fin del libro y de la licencia solo se
+    buscan en los últimos window caracteres (None = todo el texto)
+    """
+    text = _SECTION.sub("", text)
+    if window is None or len(text) <= window:
+        return _FOOTER.sub("", text)
+    # se empieza al inicio de una línea para que \b y .* se comporten igual que sobre todo el texto
+    start = text.rfind("\n", 0, len(text) - window) + 1
+    return text[:start] + _FOOTER.sub("", text[start:])
+
+def clean_gutenberg(text: str, header_window: int | None = HEADER_WINDOW, footer_window: int | None = FOOTER_WINDOW) -> str:
+    """
+    Limpieza de libros de Gutenberg equivalente a preprocessing.gutenberg.clean_text_stepwise
+    (idéntica con header_window=footer_window=None)
+    """
+    text = to_ascii(text).lower()
+    text = strip_headers(text, header_window)
+    text = strip_footer(text, footer_window)
+    text = text.translate(_DROP_SPECIAL)
+    return _WHITESPACE.sub(" ", text).strip()
+
+def clean_gourmet(text: str) -> str:
+    """
+    Limpieza de artículos de The Gourmet Journal equivalente a
+    preprocessing.gourmet.cleaned_text_stepwise
+    """
+    text = _PROMOTIONS.sub("", text)
+    text = to_ascii(text)
+    text = _SOCIAL.sub("", text)
+    text = _WHITESPACE.sub(" ", text).strip()
+    # tras colapsar los espacios ya no quedan saltos de línea, restructure_text no cambia nada
+    return text.translate(_DROP_SPECIAL)
+
+CLEANERS = {
+    "gutenberg": clean_gutenberg,
+    "gourmet": clean_gourmet,
+}
+
+def clean_many(texts, kind: str = "gutenberg", processes: int = None, chunksize: int = 4, min_parallel: int = 8):
+    """
+    Limpia muchos textos. Con más de min_parallel textos se reparten entre procesos
+    (processes=None usa todos los núcleos); el resultado mantiene el orden de entrada
+    """
+    cleaner = CLEANERS[kind]
+    texts = list(texts)
+    if processes == 1 or len(texts) < min_parallel:
+        return [cleaner(text) for text in texts]
+    with Pool(processes) as pool:
+        return pool.map(cleaner, texts, chunksize=chunksize)
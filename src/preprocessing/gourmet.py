@@ -1,5 +1,6 @@
 import re
 import unicodedata
+from src.preprocessing.engine import clean_gourmet
 
 def normalize_unicode(text):
     """
@@ -35,7 +36,7 @@ def clean_promotions(text):
     """
     Elimina promociones
     """
-    return re.sub(r"(P\.D\.|Descubre más en|Síguenos en|Visita nuestro sitio web|Ver:|).*", "", text, flags=re.IGNORECASE)
+    return re.sub(r"(P\.D\.|Descubre más en|Síguenos en|Visita nuestro sitio web|Ver:).*", "", text, flags=re.IGNORECASE)
 
 def restructure_text(text):
     """
@@ -44,9 +45,9 @@ def restructure_text(text):
     text = re.sub(r"\n\s*\n", "\n", text) 
     return text
 
-def cleaned_text(text):
+def cleaned_text_stepwise(text):
     """
-    Aplica todas las funciones anteriores
+    Aplica todas las funciones anteriores (versión de referencia de cleaned_text)
     """
     text = clean_promotions(text)
     text = normalize_unicode(text)
@@ -54,4 +55,10 @@ def cleaned_text(text):
     text = remove_extra_whitespace(text)
     text = remove_special_characters(text)
     text = restructure_text(text)
-    return text
\ No newline at end of file
+    return text
+
+def cleaned_text(text):
+    """
+    Aplica la misma limpieza con el motor compilado de preprocessing.engine
+    """
+    return clean_gourmet(text)
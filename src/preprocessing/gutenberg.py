@@ -1,5 +1,6 @@
 import re
 import unicodedata
+from src.preprocessing.engine import clean_gutenberg
 
 def normalize_unicode(text):
     """
@@ -39,13 +40,20 @@ def remove_footer(text):
     return re.sub(r'\bstart: full license\b.*', '', text)
 
 
-def clean_text(text):
+def clean_text_stepwise(text):
     """
-    Esta función se encarga de aplicar al texto cada una de las funciones del preprocesamiento."""
+    Esta función se encarga de aplicar al texto cada una de las funciones del preprocesamiento.
+    Es la versión de referencia, paso a paso, de clean_text"""
     text = normalize_unicode(text)
     text = remove_headers(text)         
     text = remove_footer(text)
     text = remove_special_characters(text)
     text = remove_spaces(text)
     
-    return text
\ No newline at end of file
+    return text
+
+def clean_text(text):
+    """
+    Limpia el texto en una sola pasada con el motor compilado de preprocessing.engine.
+    Las marcas de encabezado y pie solo se buscan al principio y al final del libro."""
+    return clean_gutenberg(text)
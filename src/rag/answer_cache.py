@@ -0,0 +1,190 @@
+from __future__ import annotations
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import TYPE_CHECKING
+import numpy as np
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+class SemanticCache:
+    def __init__(self, path: str = None, threshold: float = 0.92, max_entries: int = 1000, ttl: float = 86400):
+        """
+        Caché de respuestas indexada por el embedding de la query.
+        Una query reutiliza la respuesta de otra si la similitud coseno es >= threshold.
+        Se expulsan las entradas menos usadas (LRU) al superar max_entries y las que
+        tienen más de ttl segundos. Si path no es None se persiste en la base SQLite
+        path.db, a la que cada respuesta nueva se añade como una fila; los workers que
+        comparten path leen antes de cada consulta las respuestas añadidas por los demás
+        """
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.version = None
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self._next_key = 0
+        self._matrix = None
+        self._keys = []
+        self._lock = threading.Lock()
+        self.conn = None
+        self._last_id = 0
+        self._data_version = None
+        if path:
+            self.load()
+
+    def lookup(self, embedding, version) -> dict | None:
+        """
+        Devuelve {"answer", "sources", "similarity"} si hay una query equivalente en caché
+        """
+        query = self._normalize(embedding)
+        with self._lock:
+            self._check_version(version)
+            self._refresh()
+            self._expire()
+            if not self.entries:
+                self.misses += 1
+                return None
+            if self._matrix is None:
+                self._keys = list(self.entries)
+                self._matrix = np.stack([self.entries[key]["embedding"] for key in self._keys])
+            similarities = self._matrix @ query
+            best = int(np.argmax(similarities))
+            if similarities[best] < self.threshold:
+                self.misses += 1
+                return None
+            from langchain_core.documents import Document
+            key = self._keys[best]
+            self.entries.move_to_end(key)
+            self.hits += 1
+            entry = self.entries[key]
+            return {
+                "answer": entry["answer"],
+                "sources": [Document(page_content=s["page_content"], metadata=s["metadata"]) for s in entry["sources"]],
+                "similarity": float(similarities[best])
+            }
+
+    def store(self, embedding, answer: str, sources: list[Document], version):
+        """
+        Guarda la respuesta y sus documentos fuente para la versión actual de la colección
+        """
+        with self._lock:
+            if version != self.version:
+                # la colección cambió mientras se generaba la respuesta
+                return
+            entry = {
+                "embedding": self._normalize(embedding),
+                "answer": answer,
+                "sources": [{"page_content": d.page_content, "metadata": d.metadata} for d in sources],
+                "created_at": time.time()
+            }
+            key = self._persist(entry)
+            self.entries[key] = entry
+            while len(self.entries) > self.max_entries:
+                self._delete([self.entries.popitem(last=False)[0]])
+            self._matrix = None
+
+    def clear(self):
+        with self._lock:
+            self._delete(list(self.entries))
+            self.entries.clear()
+            self._matrix = None
+
+    def load(self):
+        """
+        Abre path.db y carga las respuestas guardadas
+        """
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(self.path + ".db", check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                version INTEGER,
+                created_at REAL NOT NULL,
+                embedding BLOB NOT NULL,
+                answer TEXT NOT NULL,
+                sources TEXT NOT NULL
+            )
+        """)
+        self.conn.commit()
+        last = self.conn.execute("SELECT version FROM entries ORDER BY id DESC LIMIT 1").fetchone()
+        self.version = last[0] if last else None
+        self._refresh()
+
+    def _refresh(self):
+        """
+        Carga las filas añadidas (por este u otro proceso) desde la última lectura
+        """
+        if self.conn is None:
+            return
+        data_version = self.conn.execute("PRAGMA data_version").fetchone()[0]
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        rows = self.conn.execute(
+            "SELECT id, version, created_at, embedding, answer, sources FROM entries WHERE id > ? ORDER BY id", (self._last_id,)
+        ).fetchall()
+        for key, version, created_at, embedding, answer, sources in rows:
+            self._last_id = key
+            if version != self.version or key in self.entries:
+                continue
+            self.entries[key] = {
+                "embedding": np.frombuffer(embedding, dtype=np.float32),
+                "answer": answer,
+                "sources": json.loads(sources),
+                "created_at": created_at
+            }
+            self._matrix = None
+        while len(self.entries) > self.max_entries:
+            self._delete([self.entries.popitem(last=False)[0]])
+
+    def _persist(self, entry: dict) -> int:
+        if self.conn is None:
+            self._next_key += 1
+            return self._next_key
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO entries (version, created_at, embedding, answer, sources) VALUES (?, ?, ?, ?, ?)",
+                (self.version, entry["created_at"], entry["embedding"].astype(np.float32).tobytes(), entry["answer"],
+                 json.dumps(entry["sources"], ensure_ascii=False))
+            )
+        return cursor.lastrowid
+
+    def _delete(self, keys: list[int]):
+        if self.conn is None or not keys:
+            return
+        with self.conn:
+            self.conn.executemany("DELETE FROM entries WHERE id = ?", [(key,) for key in keys])
+
+    def _check_version(self, version):
+        # si la colección cambió, las respuestas guardadas pueden estar desactualizadas
+        if version != self.version:
+            self.entries.clear()
+            self._matrix = None
+            self.version = version
+            if self.conn is not None:
+                with self.conn:
+                    self.conn.execute("DELETE FROM entries WHERE version IS NOT ?", (version,))
+
+    def _expire(self):
+        now = time.time()
+        expired = [key for key, entry in self.entries.items() if now - entry["created_at"] > self.ttl]
+        for key in expired:
+            del self.entries[key]
+        if expired:
+            self._delete(expired)
+            self._matrix = None
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
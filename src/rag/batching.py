@@ -0,0 +1,86 @@
+import os
+import time
+import queue
+import threading
+from concurrent.futures import Future
+from langchain_core.embeddings import Embeddings
+from src.rag.metrics import Counter, Histogram
+
+BATCH_WINDOW_ENV = "FORKPILOT_BATCH_WINDOW_MS"
+MAX_BATCH_ENV = "FORKPILOT_MAX_BATCH"
+
+BATCH_SIZE = Histogram("forkpilot_embedding_batch_size", "Queries por lote de embeddings", buckets=(1, 2, 4, 8, 16, 32, 64, 128))
+BATCH_FILL = Histogram("forkpilot_embedding_batch_fill", "Fracción de max_batch ocupada por cada lote",
+                       buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1))
+BATCH_WAIT = Histogram("forkpilot_embedding_batch_wait_seconds", "Espera de cada query hasta entrar en un lote",
+                       buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1))
+BATCHES = Counter("forkpilot_embedding_batches_total", "Lotes de queries embebidos")
+# con el servicio de embeddings los lotes se forman en su proceso y los workers reenvían estas métricas
+BATCH_METRICS = (BATCH_SIZE, BATCH_FILL, BATCH_WAIT, BATCHES)
+
+
+class MicroBatchEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings, window: float = None, max_batch: int = None):
+        """
+        Agrupa las queries que llegan a la vez desde varios hilos en un solo forward del modelo.
+        Un hilo recoge las queries durante window segundos desde la primera (o hasta max_batch)
+        y las embebe juntas; mientras el modelo trabaja se acumulan las siguientes.
+        Por defecto window y max_batch se leen de FORKPILOT_BATCH_WINDOW_MS y FORKPILOT_MAX_BATCH.
+        embed_documents no pasa por el lote porque ya recibe muchos textos
+        """
+        self.inner = inner
+        self.window = window if window is not None else float(os.environ.get(BATCH_WINDOW_ENV, 5)) / 1000
+        self.max_batch = max_batch or int(os.environ.get(MAX_BATCH_ENV, 32))
+        self._queue = queue.Queue()
+        self._worker = None
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> list[float]:
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future, time.perf_counter()))
+        return future.result()
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        # los modelos de sentence-transformers embeben igual queries y documentos
+        embed = getattr(self.inner, "embed_queries", None) or self.inner.embed_documents
+        return embed(texts)
+
+    def _ensure_worker(self):
+        if self._worker is None:
+            with self._lock:
+                if self._worker is None:
+                    self._worker = threading.Thread(target=self._work, name="embedding-batcher", daemon=True)
+                    self._worker.start()
+
+    def _collect(self) -> list:
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._collect()
+            started = time.perf_counter()
+            for _, _, queued_at in batch:
+                BATCH_WAIT.observe(started - queued_at)
+            BATCHES.inc()
+            BATCH_SIZE.observe(len(batch))
+            BATCH_FILL.observe(len(batch) / self.max_batch)
+            try:
+                vectors = self.embed_queries([text for text, _, _ in batch])
+            except Exception as e:
+                for _, future, _ in batch:
+                    future.set_exception(e)
+                continue
+            for (_, future, _), vector in zip(batch, vectors):
+                future.set_result(vector)
@@ -0,0 +1,158 @@
+import re
+import math
+import heapq
+import sqlite3
+import threading
+import unicodedata
+from collections import Counter, defaultdict
+
+STOPWORDS = {
+    "a", "al", "algo", "con", "como", "cual", "de", "del", "el", "en", "es", "esta", "este", "hay", "la", "las",
+    "lo", "los", "mas", "me", "mi", "muy", "no", "o", "para", "pero", "por", "que", "quiero", "se", "si", "sin",
+    "sobre", "su", "sus", "tu", "un", "una", "uno", "unos", "unas", "y", "ya", "receta", "recetas",
+    "the", "and", "of", "to", "in", "with", "for", "or",
+}
+
+def stem(token: str) -> str:
+    """
+    Singular aproximado en español: limones -> limon, nueces -> nuez, tomates -> tomate
+    """
+    if len(token) > 4 and token.endswith("ces"):
+        return token[:-3] + "z"
+    if len(token) > 4 and token.endswith("es") and token[-3] in "lnrdj":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+def tokenize(text: str) -> list[str]:
+    """
+    Términos de un texto: sin tildes, en minúsculas, sin palabras vacías y en singular
+    """
+    text = unicodedata.normalize("NFKD", text).encode("ascii", "ignore").decode("utf-8").lower()
+    return [stem(token) for token in re.findall(r"[a-z0-9]+", text) if len(token) > 1 and token not in STOPWORDS]
+
+
+class BM25Index:
+    def __init__(self, path: str, k1: float = 1.5, b: float = 0.75):
+        """
+        Índice invertido BM25 en SQLite sobre los mismos chunks (y con los mismos ids)
+        que el vector store. Guarda la frecuencia de cada término por chunk y la longitud
+        de cada chunk; el número de chunks y la longitud total se mantienen en stats
+        """
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS docs (id TEXT PRIMARY KEY, length INTEGER NOT NULL) WITHOUT ROWID")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS postings (
+                term TEXT NOT NULL,
+                doc_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (term, doc_id)
+            ) WITHOUT ROWID
+        """)
+        self.conn.execute("CREATE INDEX IF NOT EXISTS postings_doc ON postings(doc_id)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS stats (key TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+        self.conn.execute("INSERT OR IGNORE INTO stats (key, value) VALUES ('docs', 0), ('length', 0)")
+        self.conn.commit()
+
+    @classmethod
+    def load(cls, path: str, vector_store, batch_size: int = 1000):
+        """
+        Abre el índice; si está vacío y el vector store no, lo construye desde Chroma
+        """
+        index = cls(path)
+        collection = vector_store._collection
+        if len(index) or not collection.count():
+            return index
+        print("Construyendo el índice BM25 desde el vector store…")
+        offset = 0
+        while True:
+            batch = collection.get(include=["documents"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            index.add(batch["ids"], [text or "" for text in batch["documents"]])
+            offset += len(batch["ids"])
+        return index
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT value FROM stats WHERE key = 'docs'").fetchone()[0]
+
+    def add(self, ids: list[str], texts: list[str]):
+        """
+        Indexa chunks; si un id ya existía se reemplaza
+        """
+        rows = []
+        docs = []
+        # si un id se repite en el mismo lote se queda el último texto
+        for doc_id, text in dict(zip(ids, texts)).items():
+            terms = Counter(tokenize(text))
+            docs.append((doc_id, sum(terms.values())))
+            rows.extend((term, doc_id, tf) for term, tf in terms.items())
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._delete([doc_id for doc_id, _ in docs])
+            self.conn.executemany("INSERT INTO docs (id, length) VALUES (?, ?)", docs)
+            self.conn.executemany("INSERT INTO postings (term, doc_id, tf) VALUES (?, ?, ?)", rows)
+            self._update_stats(len(docs), sum(length for _, length in docs))
+
+    def remove(self, ids: list[str]):
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            self._delete(ids)
+
+    def search(self, query: str, k: int = 20, min_coverage: float = 0.5) -> list[tuple[str, float]]:
+        """
+        Los k chunks con mayor puntuación BM25 para la query, como (id, puntuación).
+        Solo se devuelven chunks que contienen al menos min_coverage de los términos de la query
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms:
+            return []
+        with self._lock:
+            total_docs, total_length = self._stats()
+            if not total_docs:
+                return []
+            average = total_length / total_docs
+            scores = defaultdict(float)
+            matched = defaultdict(int)
+            for term in terms:
+                postings = self.conn.execute(
+                    "SELECT p.doc_id, p.tf, d.length FROM postings p JOIN docs d ON d.id = p.doc_id WHERE p.term = ?", (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = math.log(1 + (total_docs - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, tf, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / average)
+                    scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+                    matched[doc_id] += 1
+        needed = math.ceil(min_coverage * len(terms))
+        candidates = ((score, doc_id) for doc_id, score in scores.items() if matched[doc_id] >= needed)
+        return [(doc_id, score) for score, doc_id in heapq.nlargest(k, candidates)]
+
+    def close(self):
+        self.conn.close()
+
+    def _stats(self) -> tuple[int, int]:
+        values = dict(self.conn.execute("SELECT key, value FROM stats"))
+        return values["docs"], values["length"]
+
+    def _delete(self, ids: list[str]):
+        if not ids:
+            return
+        placeholders = ",".join("?" * len(ids))
+        existing = self.conn.execute(f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM docs WHERE id IN ({placeholders})", ids).fetchone()
+        self.conn.execute(f"DELETE FROM postings WHERE doc_id IN ({placeholders})", ids)
+        self.conn.execute(f"DELETE FROM docs WHERE id IN ({placeholders})", ids)
+        self._update_stats(-existing[0], -existing[1])
+
+    def _update_stats(self, docs: int, length: int):
+        self.conn.execute("UPDATE stats SET value = value + ? WHERE key = 'docs'", (docs,))
+        self.conn.execute("UPDATE stats SET value = value + ? WHERE key = 'length'", (length,))
@@ -0,0 +1,202 @@
+from __future__ import annotations
+import numpy as np
+from typing import TYPE_CHECKING
+from src.rag.metrics import Counter, Histogram, annotate
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+# aproximación para texto en español con el tokenizador de Mistral
+CHARS_PER_TOKEN = 3.5
+# caracteres entre dos chunks para considerarlos contiguos (el separador del splitter)
+MAX_GAP = 2
+
+CONTEXT_TOKENS = Histogram("forkpilot_context_tokens", "Tokens estimados del contexto enviado al LLM",
+                           buckets=(128, 256, 512, 1024, 1536, 2048, 3072, 4096, 8192))
+CONTEXT_INPUT_TOKENS = Counter("forkpilot_context_input_tokens_total", "Tokens estimados de los documentos recuperados antes de empaquetarlos")
+CONTEXT_SAVED_TOKENS = Counter("forkpilot_context_saved_tokens_total", "Tokens estimados que el empaquetado del contexto evita enviar al LLM")
+CONTEXT_DROPPED = Counter("forkpilot_context_dropped_total", "Pasajes descartados al empaquetar el contexto", ("reason",))
+
+def estimate_tokens(text: str) -> int:
+    return round(len(text) / CHARS_PER_TOKEN)
+
+def source_key(doc: Document) -> str:
+    return doc.metadata.get("url") or doc.metadata.get("source") or doc.id or doc.page_content[:100]
+
+def merge_overlap(first: str, second: str, min_overlap: int = 20, max_overlap: int = 400) -> str | None:
+    """
+    Si second continúa a first (el final de first coincide con el principio de second,
+    como en los chunks con solapamiento) devuelve los dos unidos sin repetir el solape
+    """
+    if len(second) < min_overlap:
+        return None
+    probe = second[:min_overlap]
+    start = max(0, len(first) - max_overlap)
+    while True:
+        position = first.find(probe, start)
+        if position < 0:
+            return None
+        overlap = len(first) - position
+        if second.startswith(first[position:]) and overlap <= len(second):
+            return first + second[overlap:]
+        start = position + 1
+
+
+class Passage:
+    def __init__(self, doc: Document, score: float, embedding: np.ndarray | None):
+        """
+        Uno o varios chunks consecutivos de un mismo documento
+        """
+        self.docs = [doc]
+        self.text = doc.page_content
+        self.source = source_key(doc)
+        self.start = doc.metadata.get("start_index")
+        self.score = score
+        self.embeddings = [embedding] if embedding is not None else []
+
+    @property
+    def end(self) -> int | None:
+        return None if self.start is None else self.start + len(self.text)
+
+    def extend(self, other: Passage) -> bool:
+        """
+        Une other a este pasaje si son contiguos o se solapan
+        """
+        first, second = (self, other) if (self.start or 0) <= (other.start or 0) else (other, self)
+        gap = second.start - first.end if first.start is not None and second.start is not None else None
+        if gap is not None and 0 <= gap <= MAX_GAP:
+            # entre dos chunks consecutivos solo queda el separador (salto de línea o espacio)
+            text = first.text + ("\n\n" if gap else "") + second.text
+            start = first.start
+        elif gap is not None and gap < 0 and first.text[second.start - first.start:].startswith(second.text[:-gap]):
+            # las posiciones solo se usan si el solape que indican coincide con el texto
+            text = first.text + second.text[-gap:]
+            start = first.start
+        else:
+            text = merge_overlap(self.text, other.text)
+            if text is None:
+                text = merge_overlap(other.text, self.text)
+            if text is None:
+                return False
+            start = None
+        self.text = text
+        self.start = start
+        self.docs.extend(other.docs)
+        self.score = max(self.score, other.score)
+        self.embeddings.extend(other.embeddings)
+        return True
+
+    def embedding(self) -> np.ndarray | None:
+        if not self.embeddings:
+            return None
+        mean = np.mean(self.embeddings, axis=0)
+        return mean / max(np.linalg.norm(mean), 1e-12)
+
+
+class ContextPacker:
+    def __init__(self, max_tokens: int = 1500, mmr_lambda: float = 0.7, duplicate_threshold: float = 0.95):
+        """
+        Construye el contexto del prompt a partir de los documentos recuperados:
+        une los chunks contiguos de un mismo documento, elige los pasajes con MMR
+        (relevancia frente a parecido con los ya elegidos) descartando los casi
+        duplicados y se detiene al llegar a max_tokens. Sin embeddings solo se
+        descartan los textos repetidos o contenidos en otro ya elegido
+        """
+        self.max_tokens = max_tokens
+        self.mmr_lambda = mmr_lambda
+        self.duplicate_threshold = duplicate_threshold
+
+    def pack(self, docs: list[Document], embeddings: list | None = None, query_embedding=None,
+             scores: list[float] | None = None) -> tuple[str, list[Document]]:
+        """
+        docs en orden de relevancia; embeddings (uno por documento, o None) y
+        query_embedding son opcionales. Devuelve (contexto, documentos usados)
+        """
+        if not docs:
+            return "", []
+        scores = scores or [1 / (rank + 1) for rank in range(len(docs))]
+        embeddings = embeddings or [None] * len(docs)
+        input_tokens = sum(estimate_tokens(doc.page_content) for doc in docs)
+
+        passages = self._merge([
+            Passage(doc, score, np.asarray(embedding, dtype=np.float32) if embedding is not None else None)
+            for doc, score, embedding in zip(docs, scores, embeddings)
+        ])
+        selected, dropped = self._select(passages, query_embedding)
+        selected.sort(key=lambda p: p.score, reverse=True)
+        context = "\n\n".join(p.text for p in selected)
+
+        output_tokens = estimate_tokens(context)
+        CONTEXT_TOKENS.observe(output_tokens)
+        CONTEXT_INPUT_TOKENS.inc(input_tokens)
+        CONTEXT_SAVED_TOKENS.inc(max(input_tokens - output_tokens, 0))
+        for reason, count in dropped.items():
+            if count:
+                CONTEXT_DROPPED.inc(count, reason=reason)
+        annotate(context_tokens=output_tokens, context_saved_tokens=max(input_tokens - output_tokens, 0),
+                 context_merged=len(docs) - len(passages))
+        return context, [doc for p in selected for doc in p.docs]
+
+    def _merge(self, passages: list[Passage]) -> list[Passage]:
+        merged = []
+        for passage in passages:
+            # se repite porque al crecer un pasaje puede quedar contiguo a otro ya guardado
+            while True:
+                target = next((p for p in merged if p.source == passage.source and p.extend(passage)), None)
+                if target is None:
+                    break
+                merged.remove(target)
+                passage = target
+            merged.append(passage)
+        return merged
+
+    def _select(self, passages: list[Passage], query_embedding) -> tuple[list[Passage], dict]:
+        dropped = {"duplicate": 0, "budget": 0}
+        vectors = [p.embedding() for p in passages]
+        use_mmr = all(v is not None for v in vectors)
+        if use_mmr:
+            matrix = np.stack(vectors)
+            if query_embedding is not None:
+                query = np.asarray(query_embedding, dtype=np.float32)
+                relevance = matrix @ (query / max(np.linalg.norm(query), 1e-12))
+            else:
+                relevance = np.asarray([p.score for p in passages], dtype=np.float32)
+            similarity = matrix @ matrix.T
+
+        selected = []
+        seen_texts = set()
+        remaining = list(range(len(passages)))
+        budget = self.max_tokens
+        while remaining:
+            if use_mmr and selected:
+                redundancy = similarity[np.ix_(remaining, selected)].max(axis=1)
+                mmr = self.mmr_lambda * relevance[remaining] - (1 - self.mmr_lambda) * redundancy
+                pick = int(np.argmax(mmr))
+                if redundancy[pick] >= self.duplicate_threshold:
+                    # lo más útil que queda ya está en el contexto; todo lo de encima del umbral sobra
+                    duplicates = [remaining[i] for i in np.flatnonzero(redundancy >= self.duplicate_threshold)]
+                    dropped["duplicate"] += len(duplicates)
+                    remaining = [i for i in remaining if i not in duplicates]
+                    continue
+            elif use_mmr:
+                pick = int(np.argmax(relevance[remaining]))
+            else:
+                pick = 0
+            index = remaining.pop(pick)
+            passage = passages[index]
+            if any(passage.text in text for text in seen_texts):
+                # el mismo texto (o uno que lo contiene) ya está en el contexto, quizá desde otra fuente
+                dropped["duplicate"] += 1
+                continue
+            tokens = estimate_tokens(passage.text)
+            if tokens > budget:
+                if selected:
+                    dropped["budget"] += 1
+                    continue
+                # el pasaje más relevante no cabe entero: se recorta
+                passage.text = passage.text[:int(budget * CHARS_PER_TOKEN)]
+                tokens = budget
+            seen_texts.add(passage.text)
+            selected.append(index)
+            budget -= tokens
+        return [passages[i] for i in selected], dropped
@@ -0,0 +1,244 @@
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from src.rag.metrics import CRAWL_TRIGGERS
+
+PENDING = "pending"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+def normalize_query(query: str) -> str:
+    """
+    Normaliza la query para deduplicar trabajos: minúsculas, sin tildes y sin espacios extra
+    """
+    text = unicodedata.normalize("NFKD", query).encode("ascii", "ignore").decode("utf-8")
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+
+class CrawlJob:
+    def __init__(self, query: str, key: str, k: int, max_crawls: int, store=None):
+        """
+        Trabajo de crawling para una query normalizada.
+        Con store su estado se guarda en la base compartida por los workers
+        """
+        self.query = query
+        self.key = key
+        self.k = k
+        self.max_crawls = max_crawls
+        self.status = PENDING
+        self.attempts = 0
+        self.added = 0
+        self.error = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.store = store
+        # los trabajos que ejecuta otro proceso se siguen consultando la base
+        self.remote = False
+        self._done = threading.Event()
+
+    @classmethod
+    def from_dict(cls, data: dict, store) -> "CrawlJob":
+        job = cls(data["query"], normalize_query(data["query"]), 0, data["max_crawls"], store=store)
+        for field in ("status", "attempts", "added", "error", "created_at", "finished_at"):
+            setattr(job, field, data[field])
+        job.remote = True
+        return job
+
+    @property
+    def active(self) -> bool:
+        return self.status in (PENDING, RUNNING)
+
+    def save(self):
+        """
+        Publica el progreso del trabajo (intentos, documentos añadidos) a los demás workers
+        """
+        if self.store is not None:
+            self.store.save(self)
+
+    def wait(self, timeout: float = None, interval: float = 0.5) -> bool:
+        """
+        Espera a que el trabajo termine
+        """
+        if not self.remote:
+            return self._done.wait(timeout)
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            data = self.store.get(self.key)
+            if data is None or data["status"] not in (PENDING, RUNNING):
+                return True
+            if deadline is not None and time.time() >= deadline:
+                return False
+            time.sleep(interval)
+
+    def to_dict(self) -> dict:
+        return {
+            "query": self.query,
+            "status": self.status,
+            "attempts": self.attempts,
+            "max_crawls": self.max_crawls,
+            "added": self.added,
+            "error": self.error,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+        }
+
+
+class CrawlJobStore:
+    def __init__(self, path: str, stale_after: float = 3600):
+        """
+        Estado de los trabajos de crawling en SQLite, compartido por todos los workers
+        de gunicorn: cualquiera responde al estado de un crawl y una query solo se
+        crawlea en un proceso a la vez. Un trabajo activo que no se actualiza en
+        stale_after segundos (su worker murió) se puede volver a encolar
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self.stale_after = stale_after
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS crawl_jobs (
+                key TEXT PRIMARY KEY,
+                query TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                max_crawls INTEGER NOT NULL,
+                added INTEGER NOT NULL,
+                error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def claim(self, job: CrawlJob, cooldown: float) -> dict | None:
+        """
+        Registra job si no hay otro activo o reciente para su query.
+        Devuelve el trabajo existente (como dict) o None si job queda registrado
+        """
+        now = time.time()
+        with self._lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                existing = self._get(job.key)
+                if existing and (
+                    (existing["status"] in (PENDING, RUNNING) and now - existing["updated_at"] < self.stale_after)
+                    or (existing["finished_at"] and now - existing["finished_at"] < cooldown)
+                ):
+                    return existing
+                self._write(job, now)
+                return None
+            finally:
+                self.conn.execute("COMMIT")
+
+    def save(self, job: CrawlJob):
+        with self._lock:
+            self._write(job, time.time())
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            return self._get(key)
+
+    def _get(self, key: str) -> dict | None:
+        row = self.conn.execute(
+            "SELECT query, status, attempts, max_crawls, added, error, created_at, finished_at, updated_at "
+            "FROM crawl_jobs WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        fields = ("query", "status", "attempts", "max_crawls", "added", "error", "created_at", "finished_at", "updated_at")
+        return dict(zip(fields, row))
+
+    def _write(self, job: CrawlJob, now: float):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO crawl_jobs (key, query, status, attempts, max_crawls, added, error, created_at, finished_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (job.key, job.query, job.status, job.attempts, job.max_crawls, job.added, job.error,
+             job.created_at, job.finished_at, now)
+        )
+
+
+class CrawlQueue:
+    def __init__(self, crawl_fn, workers: int = 1, cooldown: float = 600, path: str = None):
+        """
+        Cola de crawling en segundo plano.
+        crawl_fn(job) ejecuta el crawl, actualiza job.attempts / job.added y llama a job.save().
+        Una query ya crawleada no se vuelve a encolar hasta que pasen cooldown segundos.
+        Con path el estado de los trabajos se comparte entre procesos (ver CrawlJobStore)
+        """
+        self.crawl_fn = crawl_fn
+        self.cooldown = cooldown
+        self.store = CrawlJobStore(path) if path else None
+        self.jobs = {}
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._workers = []
+        for i in range(workers):
+            worker = threading.Thread(target=self._work, name=f"crawl-worker-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, query: str, k: int = 5, max_crawls: int = 3) -> CrawlJob:
+        """
+        Encola un crawl para la query si no hay uno activo o reciente
+        """
+        key = normalize_query(query)
+        with self._lock:
+            job = self.jobs.get(key)
+            if job and (job.active or time.time() - job.finished_at < self.cooldown):
+                return job
+            job = CrawlJob(query, key, k, max_crawls, store=self.store)
+            if self.store is not None:
+                existing = self.store.claim(job, self.cooldown)
+                if existing is not None:
+                    # lo está ejecutando (o lo ejecutó hace poco) otro worker
+                    return CrawlJob.from_dict(existing, self.store)
+            self.jobs[key] = job
+        CRAWL_TRIGGERS.inc()
+        self._queue.put(job)
+        return job
+
+    def status(self, query: str) -> dict | None:
+        """
+        Devuelve el estado del trabajo asociado a la query, o None si no existe
+        """
+        key = normalize_query(query)
+        if self.store is not None:
+            data = self.store.get(key)
+            return CrawlJob.from_dict(data, self.store).to_dict() if data else None
+        job = self.jobs.get(key)
+        return job.to_dict() if job else None
+
+    def shutdown(self, timeout: float = None):
+        """
+        Detiene los workers cuando terminen el trabajo en curso
+        """
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+
+    def _work(self):
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = RUNNING
+            job.save()
+            try:
+                self.crawl_fn(job)
+                job.status = DONE
+            except Exception as e:
+                print(f"Error en el crawl de '{job.query}': {e}")
+                job.error = str(e)
+                job.status = FAILED
+            finally:
+                job.finished_at = time.time()
+                job.save()
+                job._done.set()
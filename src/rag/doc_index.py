@@ -0,0 +1,190 @@
+import os
+import json
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+from collections import defaultdict
+
+SOURCE_FIELD = "source_type"
+
+def source_type(metadata: dict) -> str:
+    """
+    Fuente de un documento (cookpad, gourmet, gutenberg). Para documentos antiguos
+    sin el campo source_type se deduce del url o de la ruta del fichero
+    """
+    if metadata.get(SOURCE_FIELD):
+        return metadata[SOURCE_FIELD]
+    url = metadata.get("url") or ""
+    path = metadata.get("source") or ""
+    if "cookpad.com" in url:
+        return "cookpad"
+    if "gourmetjournal" in url or "saved_articles" in path:
+        return "gourmet"
+    if "gutenberg" in url or "gutemberg" in path:
+        return "gutenberg"
+    return "unknown"
+
+def document_key(metadata: dict) -> str | None:
+    """
+    Identificador del documento original dentro de su fuente: el id numérico para
+    las recetas de Cookpad y el url (o la ruta del fichero) para el resto
+    """
+    if source_type(metadata) == "cookpad" and metadata.get("id"):
+        return str(metadata["id"])
+    return metadata.get("url") or metadata.get("source")
+
+
+class DocumentIndex:
+    def __init__(self, path: str):
+        """
+        Índice en memoria de los documentos del vector store, por fuente.
+        Cada alta o baja se añade a un log JSONL en path, que se relee al arrancar.
+        version cuenta los cambios aplicados y sirve como versión del contenido.
+        Varios procesos pueden compartir el log: antes de cada consulta se leen las
+        líneas que hayan añadido los demás
+        """
+        self.path = path
+        self.counts = defaultdict(dict)
+        self.urls = defaultdict(int)
+        self._version = 0
+        self._offset = 0
+        self._lock = threading.RLock()
+
+    @classmethod
+    def load(cls, path: str, vector_store, batch_size: int = 1000):
+        """
+        Carga el índice desde el log; si no existe lo construye una sola vez desde Chroma
+        """
+        index = cls(path)
+        if os.path.exists(path):
+            index.refresh()
+            return index
+
+        # los workers que arrancan a la vez construyen el log uno detrás de otro: el
+        # primero lo escribe y los demás, al obtener el cerrojo, ya lo encuentran hecho
+        with open(path + ".lock", "a+b") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                if os.path.exists(path):
+                    index.refresh()
+                    return index
+                index._build(vector_store, batch_size)
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+        return index
+
+    def _build(self, vector_store, batch_size: int):
+        # se escribe en un fichero temporal propio para no dejar un log a medias si se interrumpe
+        path = self.path
+        self.path = f"{path}.tmp-{os.getpid()}"
+        open(self.path, "w", encoding="utf-8").close()
+        collection = vector_store._collection
+        offset = 0
+        while True:
+            batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
+                break
+            self.add(meta or {} for meta in batch["metadatas"])
+            offset += len(batch["ids"])
+        os.replace(self.path, path)
+        self.path = path
+
+    def add(self, metadatas):
+        """
+        Registra los chunks añadidos al vector store
+        """
+        self._log("add", metadatas)
+
+    def remove(self, metadatas):
+        """
+        Registra los chunks borrados del vector store
+        """
+        self._log("del", metadatas)
+
+    @property
+    def version(self) -> int:
+        self.refresh()
+        return self._version
+
+    def contains(self, source: str, key: str) -> bool:
+        self.refresh()
+        return key in self.counts.get(source, {})
+
+    def contains_url(self, url: str) -> bool:
+        self.refresh()
+        return url in self.urls
+
+    def stored_urls(self) -> set:
+        self.refresh()
+        with self._lock:
+            return set(self.urls)
+
+    def ids(self, source: str) -> set:
+        """
+        Identificadores de los documentos guardados de una fuente (ids de receta para cookpad)
+        """
+        self.refresh()
+        with self._lock:
+            return set(self.counts.get(source, {}))
+
+    def refresh(self):
+        """
+        Aplica las entradas que otros procesos hayan añadido al log
+        """
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == self._offset:
+            return
+        with self._lock:
+            with open(self.path, "rb") as f:
+                self._read_from(f)
+
+    def _read_from(self, f):
+        # solo se aplican líneas completas; una escritura a medias se leerá en la siguiente llamada
+        f.seek(self._offset)
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                entry = json.loads(line)
+                self._apply(entry["op"], entry["source"], entry["key"], entry.get("url"))
+        self._offset += end
+
+    def _log(self, op: str, metadatas):
+        entries = []
+        for meta in metadatas:
+            key = document_key(meta)
+            if key:
+                entries.append({"op": op, "source": source_type(meta), "key": key, "url": meta.get("url")})
+        if not entries:
+            return
+        data = "".join(json.dumps(entry, ensure_ascii=False) + "\n" for entry in entries).encode("utf-8")
+        with self._lock, open(self.path, "a+b") as f:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self._read_from(f)
+                f.write(data)
+                f.flush()
+                self._offset += len(data)
+            finally:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+            for entry in entries:
+                self._apply(entry["op"], entry["source"], entry["key"], entry["url"])
+
+    def _apply(self, op: str, source: str, key: str, url: str = None):
+        # se cuentan chunks por documento para que un borrado parcial no lo elimine del índice
+        self._version += 1
+        keys = self.counts[source]
+        delta = 1 if op == "add" else -1
+        keys[key] = keys.get(key, 0) + delta
+        if keys[key] <= 0:
+            del keys[key]
+        if url:
+            self.urls[url] += delta
+            if self.urls[url] <= 0:
+                del self.urls[url]
@@ -0,0 +1,207 @@
+import os
+import sys
+import json
+import time
+import socket
+import struct
+import argparse
+import threading
+import socketserver
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from src.rag.batching import BATCH_METRICS, MicroBatchEmbeddings
+from src.rag.embeddings import CACHE_DIR, DEFAULT_MODEL, load_embeddings
+from src.rag.metrics import render
+
+DEFAULT_SOCKET = "/tmp/forkpilot-embeddings.sock"
+_LENGTH = struct.Struct(">I")
+_SHAPE = struct.Struct(">II")
+OK = b"\x00"
+ERROR = b"\x01"
+
+def send_frame(sock: socket.socket, payload: bytes):
+    sock.sendall(_LENGTH.pack(len(payload)) + payload)
+
+def recv_frame(sock: socket.socket) -> bytes | None:
+    """
+    Lee un mensaje (longitud de 4 bytes + contenido); None si la conexión se cerró
+    """
+    header = _recv_exact(sock, _LENGTH.size)
+    if header is None:
+        return None
+    return _recv_exact(sock, _LENGTH.unpack(header)[0])
+
+def _recv_exact(sock: socket.socket, size: int) -> bytes | None:
+    chunks = []
+    while size:
+        chunk = sock.recv(min(size, 1 << 20))
+        if not chunk:
+            return None
+        chunks.append(chunk)
+        size -= len(chunk)
+    return b"".join(chunks)
+
+
+class EmbeddingService:
+    def __init__(self, cache_dir: str = CACHE_DIR, batch_window: float = None, max_batch: int = None):
+        """
+        Modelos de embeddings cargados una sola vez en este proceso y compartidos
+        por todos los workers que se conectan al socket. Las queries de distintos
+        workers que llegan a la vez se embeben en un mismo lote
+        """
+        self.cache_dir = cache_dir
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.models = {}
+        self._lock = threading.Lock()
+
+    def model(self, model_name: str):
+        with self._lock:
+            if model_name not in self.models:
+                print(f"Cargando modelo de embeddings {model_name}…")
+                self.models[model_name] = MicroBatchEmbeddings(
+                    load_embeddings(model_name, self.cache_dir), window=self.batch_window, max_batch=self.max_batch
+                )
+            return self.models[model_name]
+
+    def handle(self, request: dict) -> np.ndarray:
+        model = self.model(request["model"])
+        if request["kind"] == "query" and len(request["texts"]) == 1:
+            vectors = [model.embed_query(request["texts"][0])]
+        elif request["kind"] == "query":
+            vectors = model.embed_queries(request["texts"])
+        else:
+            vectors = model.embed_documents(request["texts"])
+        return np.asarray(vectors, dtype=np.float32).reshape(len(request["texts"]), -1)
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        # una conexión por worker (o hilo del worker) que se reutiliza para muchas peticiones
+        while True:
+            payload = recv_frame(self.request)
+            if payload is None:
+                return
+            try:
+                request = json.loads(payload)
+                if request["kind"] == "metrics":
+                    # métricas de los lotes, que solo existen en este proceso
+                    response = OK + render(BATCH_METRICS).encode("utf-8")
+                else:
+                    vectors = self.server.service.handle(request)
+                    response = OK + _SHAPE.pack(*vectors.shape) + vectors.tobytes()
+            except Exception as e:
+                response = ERROR + f"{type(e).__name__}: {e}".encode("utf-8")
+            send_frame(self.request, response)
+
+
+class EmbeddingServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: str, service: EmbeddingService):
+        """
+        Servidor del servicio de embeddings sobre un socket Unix
+        """
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        self.service = service
+        super().__init__(socket_path, _Handler)
+        os.chmod(socket_path, 0o600)
+
+
+class RemoteEmbeddings(Embeddings):
+    def __init__(self, socket_path: str, model_name: str = DEFAULT_MODEL, timeout: float = 120):
+        """
+        Cliente del servicio de embeddings. Cada hilo usa su propia conexión
+        y se reconecta una vez si el servicio se reinició
+        """
+        self.socket_path = socket_path
+        self.model_name = model_name
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        if not texts:
+            return []
+        return self._request("documents", texts).tolist()
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._request("query", [text])[0].tolist()
+
+    def _connection(self) -> socket.socket:
+        sock = getattr(self._local, "sock", None)
+        if sock is None:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            sock.settimeout(self.timeout)
+            sock.connect(self.socket_path)
+            self._local.sock = sock
+        return sock
+
+    def _close(self):
+        sock = getattr(self._local, "sock", None)
+        if sock is not None:
+            sock.close()
+            self._local.sock = None
+
+    def metrics(self) -> str:
+        """
+        Métricas de los lotes de embeddings del servicio, en formato Prometheus
+        """
+        return self._call({"kind": "metrics"}).decode("utf-8")
+
+    def _request(self, kind: str, texts: list[str]) -> np.ndarray:
+        response = self._call({"model": self.model_name, "kind": kind, "texts": texts})
+        rows, dim = _SHAPE.unpack(response[:_SHAPE.size])
+        return np.frombuffer(response, dtype=np.float32, offset=_SHAPE.size).reshape(rows, dim)
+
+    def _call(self, request: dict) -> bytes:
+        payload = json.dumps(request, ensure_ascii=False).encode("utf-8")
+        for attempt in range(2):
+            try:
+                sock = self._connection()
+                send_frame(sock, payload)
+                response = recv_frame(sock)
+                if response is None:
+                    raise ConnectionError("El servicio de embeddings cerró la conexión")
+                break
+            except OSError:
+                self._close()
+                if attempt:
+                    raise
+        if response[:1] == ERROR:
+            raise RuntimeError(f"Error en el servicio de embeddings: {response[1:].decode('utf-8')}")
+        return response[1:]
+
+def wait_for_service(socket_path: str, timeout: float = 300) -> bool:
+    """
+    Espera a que el servicio acepte conexiones
+    """
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+                sock.connect(socket_path)
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Servicio compartido de embeddings sobre un socket Unix")
+    parser.add_argument("--socket", default=DEFAULT_SOCKET)
+    parser.add_argument("--cache-dir", default=CACHE_DIR)
+    parser.add_argument("--preload", nargs="*", default=[DEFAULT_MODEL], help="modelos que se cargan al arrancar")
+    parser.add_argument("--batch-window-ms", type=float, default=None, help="espera máxima para llenar un lote de queries")
+    parser.add_argument("--max-batch", type=int, default=None, help="queries por lote como máximo")
+    args = parser.parse_args(argv)
+
+    window = args.batch_window_ms / 1000 if args.batch_window_ms is not None else None
+    service = EmbeddingService(args.cache_dir, batch_window=window, max_batch=args.max_batch)
+    for model_name in args.preload:
+        service.model(model_name).embed_query("receta de tortilla de patatas")
+    with EmbeddingServer(args.socket, service) as server:
+        print(f"Servicio de embeddings escuchando en {args.socket}")
+        server.serve_forever()
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,230 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import unicodedata
+from collections import OrderedDict
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DEFAULT_MODEL = "sentence-transformers/distiluse-base-multilingual-cased-v2"
+CACHE_DIR = "./embedding_cache"
+EMBEDDING_SOCKET_ENV = "FORKPILOT_EMBEDDING_SOCKET"
+KEY_SIZE = 20
+
+def text_key(model_name: str, text: str, kind: str = "doc") -> bytes:
+    """
+    Clave del embedding: sha1 de (modelo, tipo, texto normalizado)
+    """
+    normalized = re.sub(r"\s+", " ", unicodedata.normalize("NFC", text)).strip()
+    return hashlib.sha1(f"{model_name}\0{kind}\0{normalized}".encode("utf-8")).digest()
+
+
+class EmbeddingCache:
+    def __init__(self, directory: str):
+        """
+        Caché de embeddings en disco, direccionada por contenido.
+        vectors.f16 guarda los vectores en float16 uno tras otro y se lee con memmap;
+        keys.bin guarda la clave sha1 (20 bytes) de cada fila en el mismo orden.
+        Ambos ficheros solo crecen, así que varios procesos pueden compartirlos
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.keys_path = os.path.join(directory, "keys.bin")
+        self.vectors_path = os.path.join(directory, "vectors.f16")
+        self.meta_path = os.path.join(directory, "meta.json")
+        self.dim = None
+        self.rows = {}
+        self._count = 0
+        self._vectors = None
+        self._lock = threading.Lock()
+        if os.path.exists(self.meta_path):
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                self.dim = json.load(f)["dim"]
+        self._refresh()
+
+    def get_many(self, keys: list[bytes]) -> tuple[dict, list[int]]:
+        """
+        Devuelve ({posición: vector}, posiciones que no están en caché)
+        """
+        with self._lock:
+            if any(key not in self.rows for key in keys):
+                self._refresh()
+            found, missing = {}, []
+            for i, key in enumerate(keys):
+                row = self.rows.get(key)
+                if row is None:
+                    missing.append(i)
+                else:
+                    found[i] = self._vectors[row]
+            return found, missing
+
+    def put_many(self, keys: list[bytes], vectors: np.ndarray):
+        """
+        Añade vectores nuevos al final de los ficheros
+        """
+        vectors = np.asarray(vectors, dtype=np.float16)
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+                with open(self.meta_path, "w", encoding="utf-8") as f:
+                    json.dump({"dim": self.dim}, f)
+            with open(self.keys_path, "ab") as keys_file, open(self.vectors_path, "ab") as vectors_file:
+                if fcntl:
+                    fcntl.flock(keys_file, fcntl.LOCK_EX)
+                try:
+                    # otro proceso pudo escribir entre medias; se leen sus filas antes de añadir
+                    # y se descarta cualquier fila a medias de una escritura interrumpida
+                    self._refresh()
+                    keys_file.truncate(self._count * KEY_SIZE)
+                    vectors_file.truncate(self._count * self.dim * 2)
+                    keys_file.write(b"".join(keys))
+                    vectors_file.write(vectors.tobytes())
+                finally:
+                    if fcntl:
+                        fcntl.flock(keys_file, fcntl.LOCK_UN)
+            self._refresh()
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _refresh(self):
+        # lee solo las filas añadidas desde la última lectura
+        if self.dim is None or not os.path.exists(self.keys_path):
+            return
+        row_bytes = self.dim * 2
+        count = min(os.path.getsize(self.keys_path) // KEY_SIZE, os.path.getsize(self.vectors_path) // row_bytes)
+        if count == self._count:
+            return
+        with open(self.keys_path, "rb") as f:
+            f.seek(self._count * KEY_SIZE)
+            data = f.read((count - self._count) * KEY_SIZE)
+        for i in range(count - self._count):
+            self.rows[data[i * KEY_SIZE:(i + 1) * KEY_SIZE]] = self._count + i
+        self._count = count
+        self._vectors = np.memmap(self.vectors_path, dtype=np.float16, mode="r", shape=(count, self.dim))
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings, model_name: str, cache: EmbeddingCache, query_cache_size: int = 4096):
+        """
+        Envuelve un modelo de embeddings y solo calcula los textos que no estén en caché.
+        Los documentos se guardan en la caché en disco; las queries de los usuarios,
+        casi siempre distintas, solo en una LRU en memoria de query_cache_size entradas.
+        Los vectores se devuelven siempre redondeados a float16 para que el resultado
+        sea el mismo venga o no de la caché
+        """
+        self.inner = inner
+        self.model_name = model_name
+        self.cache = cache
+        self.query_cache_size = query_cache_size
+        self._queries = OrderedDict()
+        self._queries_lock = threading.Lock()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        return self._embed(texts, "doc", self.inner.embed_documents)
+
+    def embed_query(self, text: str) -> list[float]:
+        return self._embed_queries([text], lambda texts: [self.inner.embed_query(texts[0])])[0]
+
+    def embed_queries(self, texts: list[str]) -> list[list[float]]:
+        """
+        Embebe varias queries en un solo forward (los modelos de sentence-transformers
+        embeben igual queries y documentos)
+        """
+        return self._embed_queries(texts, self.inner.embed_documents)
+
+    def _embed_queries(self, texts, compute) -> list[list[float]]:
+        keys = [text_key(self.model_name, text, "query") for text in texts]
+        with self._queries_lock:
+            found = {}
+            for i, key in enumerate(keys):
+                if key in self._queries:
+                    self._queries.move_to_end(key)
+                    found[i] = self._queries[key]
+        missing = [i for i in range(len(texts)) if i not in found]
+        if missing:
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], i)
+            computed = np.asarray(compute([texts[i] for i in unique.values()]), dtype=np.float16)
+            by_key = dict(zip(unique, computed))
+            with self._queries_lock:
+                self._queries.update(by_key)
+                while len(self._queries) > self.query_cache_size:
+                    self._queries.popitem(last=False)
+            for i in missing:
+                found[i] = by_key[keys[i]]
+        return [np.asarray(found[i], dtype=np.float32).tolist() for i in range(len(texts))]
+
+    def _embed(self, texts, kind, compute) -> list[list[float]]:
+        keys = [text_key(self.model_name, text, kind) for text in texts]
+        found, missing = self.cache.get_many(keys)
+        if missing:
+            # textos repetidos dentro del mismo lote se calculan una sola vez
+            unique = {}
+            for i in missing:
+                unique.setdefault(keys[i], i)
+            computed = np.asarray(compute([texts[i] for i in unique.values()]), dtype=np.float16)
+            self.cache.put_many(list(unique), computed)
+            by_key = dict(zip(unique, computed))
+            for i in missing:
+                found[i] = by_key[keys[i]]
+        return [np.asarray(found[i], dtype=np.float32).tolist() for i in range(len(texts))]
+
+
+_shared = {}
+_shared_lock = threading.Lock()
+
+_models = {}
+_models_lock = threading.Lock()
+
+def get_model(model_name: str = DEFAULT_MODEL) -> Embeddings:
+    """
+    El modelo de HuggingFace sin caché ni redondeo a float16, cargado una sola vez por
+    proceso. Lo usan los chunkers, que embeben oraciones que no se vuelven a pedir
+    """
+    with _models_lock:
+        if model_name not in _models:
+            from langchain_huggingface import HuggingFaceEmbeddings
+            _models[model_name] = HuggingFaceEmbeddings(model_name=model_name)
+        return _models[model_name]
+
+def load_embeddings(model_name: str = DEFAULT_MODEL, cache_dir: str = CACHE_DIR) -> CachedEmbeddings:
+    """
+    Carga el modelo de HuggingFace en este proceso, con caché en disco
+    """
+    directory = os.path.join(cache_dir, re.sub(r"[^\w.-]", "_", model_name))
+    return CachedEmbeddings(get_model(model_name), model_name, EmbeddingCache(directory))
+
+def get_embeddings(model_name: str = DEFAULT_MODEL, cache_dir: str = CACHE_DIR) -> Embeddings:
+    """
+    Devuelve el modelo de embeddings con caché en disco. Se carga una sola vez por proceso
+    y lo comparten RAG, los chunkers y la ingesta; las queries concurrentes se embeben
+    en lotes. Si FORKPILOT_EMBEDDING_SOCKET apunta a un servicio de embeddings, se usa
+    ese servicio en lugar de cargar el modelo
+    """
+    with _shared_lock:
+        if model_name not in _shared:
+            socket_path = os.environ.get(EMBEDDING_SOCKET_ENV)
+            if socket_path:
+                from src.rag.embedding_service import RemoteEmbeddings
+                _shared[model_name] = RemoteEmbeddings(socket_path, model_name)
+            else:
+                from src.rag.batching import MicroBatchEmbeddings
+                _shared[model_name] = MicroBatchEmbeddings(load_embeddings(model_name, cache_dir))
+        return _shared[model_name]
+
+def set_embeddings(model_name: str, embeddings: Embeddings):
+    """
+    Sustituye el modelo compartido de model_name en este proceso
+    (por ejemplo por un modelo falso para ejecutar los benchmarks sin red)
+    """
+    with _shared_lock:
+        _shared[model_name] = embeddings
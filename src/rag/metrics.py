@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import threading
+import contextvars
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+REQUEST_LOG_ENV = "FORKPILOT_REQUEST_LOG"
+# directorio en el que cada proceso (worker de gunicorn) vuelca sus métricas para sumarlas en /metrics
+METRICS_DIR_ENV = "FORKPILOT_METRICS_DIR"
+
+_registry = []
+_lock = threading.Lock()
+_started = time.time_ns()
+
+def _format_labels(names: tuple, values: tuple, extra: dict = None) -> str:
+    pairs = list(zip(names, values)) + list((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        """
+        Contador monótono con etiquetas, en formato Prometheus
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with _lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def snapshot(self) -> dict:
+        with _lock:
+            return dict(self.values)
+
+    @staticmethod
+    def merge(values: dict, other: dict):
+        for key, value in other.items():
+            values[key] = values.get(key, 0) + value
+
+    def render(self, values: dict = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        values = self.snapshot() if values is None else values
+        values = values or ({(): 0} if not self.labels else {})
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Histograma acumulado (buckets, suma y cuenta) con etiquetas, en formato Prometheus
+        """
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(sorted(buckets))
+        self.values = {}
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labels)
+        with _lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    def snapshot(self) -> dict:
+        with _lock:
+            return {key: (list(counts), total, count) for key, (counts, total, count) in self.values.items()}
+
+    @staticmethod
+    def merge(values: dict, other: dict):
+        for key, (counts, total, count) in other.items():
+            if key in values:
+                old_counts, old_total, old_count = values[key]
+                values[key] = ([a + b for a, b in zip(old_counts, counts)], old_total + total, old_count + count)
+            else:
+                values[key] = (list(counts), total, count)
+
+    def render(self, values: dict = None) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        values = self.snapshot() if values is None else values
+        for key, (counts, total, count) in sorted(values.items()):
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, {'le': bound})} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labels, key, {'le': '+Inf'})} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labels, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labels, key)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("forkpilot_stage_seconds", "Duración de cada etapa del RAG en segundos", ("stage",))
+REQUEST_SECONDS = Histogram("forkpilot_request_seconds", "Duración total de cada petición en segundos", ("request",))
+CRAWL_TRIGGERS = Counter("forkpilot_crawl_triggers_total", "Crawls de Cookpad encolados por falta de documentos")
+CRAWL_ATTEMPTS = Counter("forkpilot_crawl_attempts_total", "Ejecuciones del crawler de Cookpad")
+ANSWER_CACHE = Counter("forkpilot_answer_cache_total", "Consultas a la caché semántica de respuestas", ("result",))
+DOCUMENTS_ADDED = Counter("forkpilot_documents_added_total", "Chunks añadidos al vector store", ("source",))
+LLM_TOKENS = Counter("forkpilot_llm_tokens_total", "Tokens generados por el LLM")
+INGREDIENT_ANSWERS = Counter("forkpilot_ingredient_answers_total", "Consultas de ingredientes respondidas desde el índice sin LLM")
+
+
+class RequestTrace:
+    def __init__(self, name: str, **fields):
+        """
+        Tiempos de las etapas de una petición, para el log JSON por petición
+        """
+        self.name = name
+        self.fields = fields
+        self.spans = []
+        self.start = time.perf_counter()
+
+    def add(self, stage: str, seconds: float):
+        self.spans.append({"stage": stage, "ms": round(seconds * 1000, 3)})
+
+    def annotate(self, **fields):
+        self.fields.update(fields)
+
+    def to_dict(self) -> dict:
+        return {
+            "ts": time.time(),
+            "request": self.name,
+            **self.fields,
+            "total_ms": round((time.perf_counter() - self.start) * 1000, 3),
+            "spans": self.spans,
+        }
+
+
+_current_trace = contextvars.ContextVar("forkpilot_trace", default=None)
+_request_log = {"path": os.environ.get(REQUEST_LOG_ENV)}
+
+def configure_request_log(path: str | None):
+    """
+    Activa el log JSON por petición: una línea por petición en path ("-" para stdout).
+    None lo desactiva. Por defecto se toma de la variable de entorno FORKPILOT_REQUEST_LOG
+    """
+    _request_log["path"] = path
+
+def current_trace() -> RequestTrace | None:
+    return _current_trace.get()
+
+def annotate(**fields):
+    """
+    Añade campos a la petición en curso (si la hay)
+    """
+    trace = _current_trace.get()
+    if trace:
+        trace.annotate(**fields)
+
+@contextmanager
+def span(stage: str):
+    """
+    Mide una etapa: la registra en el histograma y en la petición en curso
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage=stage)
+        trace = _current_trace.get()
+        if trace:
+            trace.add(stage, elapsed)
+
+@contextmanager
+def request_trace(name: str, **fields):
+    """
+    Agrupa las etapas de una petición. Al terminar registra su duración y, si el log
+    por petición está activo, escribe una línea JSON con los tiempos de cada etapa.
+    Si ya hay una petición en curso se reutiliza
+    """
+    trace = _current_trace.get()
+    if trace:
+        yield trace
+        return
+    trace = RequestTrace(name, **fields)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    except BaseException as e:
+        trace.annotate(error=type(e).__name__)
+        raise
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:
+            # un generador en streaming puede cerrarse desde otro contexto
+            pass
+        record = trace.to_dict()
+        REQUEST_SECONDS.observe(record["total_ms"] / 1000, request=name)
+        _write_request_log(record)
+
+def _write_request_log(record: dict):
+    path = _request_log["path"]
+    if not path:
+        return
+    line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+    with _lock:
+        if path == "-":
+            sys.stdout.write(line)
+            sys.stdout.flush()
+        else:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+def render(metrics: list = None, skip: set = frozenset(), directory: str = None) -> str:
+    """
+    Las métricas (todas por defecto, menos las de nombre en skip) en el formato de texto de Prometheus.
+    Con directory se suman las que han volcado allí todos los procesos (ver start_dump)
+    """
+    merged = _load_dumps(directory) if directory else {}
+    lines = []
+    for metric in _registry if metrics is None else metrics:
+        if metric.name not in skip:
+            lines.extend(metric.render(merged.get(metric.name)) if directory else metric.render())
+    return "\n".join(lines) + "\n"
+
+def dump(directory: str):
+    """
+    Escribe las métricas de este proceso en directory/<pid>-<arranque>.json
+    """
+    data = {metric.name: [[list(key), value] for key, value in metric.snapshot().items()] for metric in _registry}
+    # el instante de arranque evita que un worker nuevo con el mismo pid pise el fichero de otro
+    path = os.path.join(directory, f"{os.getpid()}-{_started}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    os.replace(tmp, path)
+
+def _load_dumps(directory: str) -> dict:
+    # los ficheros de los workers que ya terminaron se siguen sumando: los contadores no bajan
+    dump(directory)
+    by_name = {metric.name: metric for metric in _registry}
+    merged = {}
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, name), "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for metric_name, values in data.items():
+            if metric_name in by_name:
+                by_name[metric_name].merge(merged.setdefault(metric_name, {}), {tuple(key): value for key, value in values})
+    return merged
+
+def start_dump(directory: str, interval: float = 5.0) -> threading.Thread:
+    """
+    Vuelca las métricas de este proceso en directory cada interval segundos, para que
+    cualquier worker pueda responder a /metrics con la suma de todos
+    """
+    os.makedirs(directory, exist_ok=True)
+
+    def run():
+        while True:
+            try:
+                dump(directory)
+            except OSError as e:
+                print(f"No se pudieron volcar las métricas en {directory}: {e}")
+            time.sleep(interval)
+    thread = threading.Thread(target=run, name="metrics-dump", daemon=True)
+    thread.start()
+    return thread
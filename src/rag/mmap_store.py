@@ -0,0 +1,541 @@
+import os
+import sys
+import json
+import time
+import uuid
+import shutil
+import argparse
+import threading
+import numpy as np
+from src.preprocessing.dates import DATE_FIELD
+from src.rag.doc_index import SOURCE_FIELD
+
+MISSING_TS = np.iinfo(np.int64).min
+BLOCK_ROWS = 32768
+MANIFEST = "manifest.json"
+
+def write_strings(directory: str, name: str, values: list[str]):
+    """
+    Columna de textos de longitud variable: los bytes UTF-8 seguidos en name.bin
+    y la posición de inicio de cada uno en name.idx.npy
+    """
+    encoded = [value.encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(value) for value in encoded], out=offsets[1:])
+    with open(os.path.join(directory, f"{name}.bin"), "wb") as f:
+        for value in encoded:
+            f.write(value)
+    np.save(os.path.join(directory, f"{name}.idx.npy"), offsets)
+
+
+class StringColumn:
+    def __init__(self, directory: str, name: str):
+        """
+        Lectura de una columna de write_strings, mapeada en memoria
+        """
+        self.offsets = np.load(os.path.join(directory, f"{name}.idx.npy"), mmap_mode="r")
+        path = os.path.join(directory, f"{name}.bin")
+        self.data = np.memmap(path, dtype=np.uint8, mode="r") if os.path.getsize(path) else np.zeros(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, row: int) -> str:
+        return self.data[self.offsets[row]:self.offsets[row + 1]].tobytes().decode("utf-8")
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    return matrix / np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-12)
+
+def quantize(vectors: np.ndarray, dtype: str) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Vectores normalizados en int8 (escala simétrica por fila) o float16.
+    Devuelve (vectores cuantizados, escala de cada fila)
+    """
+    if dtype == "float16":
+        return vectors.astype(np.float16), np.ones(len(vectors), dtype=np.float32)
+    if dtype != "int8":
+        raise ValueError(f"Tipo de cuantización no soportado: {dtype}")
+    scales = np.maximum(np.abs(vectors).max(axis=1), 1e-12) / 127
+    quantized = np.clip(np.rint(vectors / scales[:, None]), -127, 127).astype(np.int8)
+    return quantized, scales.astype(np.float32)
+
+def kmeans(vectors: np.ndarray, nlist: int, iterations: int = 10, sample: int = 100_000, seed: int = 0) -> np.ndarray:
+    """
+    Centroides (normalizados) de k-means esférico sobre una muestra de los vectores
+    """
+    rng = np.random.default_rng(seed)
+    if len(vectors) > sample:
+        vectors = vectors[rng.choice(len(vectors), sample, replace=False)]
+    centroids = vectors[rng.choice(len(vectors), nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=nlist) == 0
+        # una lista vacía toma un vector al azar para no perder particiones
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+def export_snapshot(collection, directory: str, dtype: str = "int8", nlist: int = None, batch_size: int = 5000) -> dict:
+    """
+    Copia una colección de Chroma a un índice en disco para MmapVectorStore.
+    nlist=None usa búsqueda exacta hasta 50.000 vectores y particiones IVF a partir de ahí;
+    nlist=0 fuerza la búsqueda exacta. El índice anterior se reemplaza al final
+    """
+    ids, embeddings, texts, metadatas = [], [], [], []
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not len(batch["ids"]):
+            break
+        ids.extend(batch["ids"])
+        embeddings.append(np.asarray(batch["embeddings"], dtype=np.float32))
+        texts.extend(text or "" for text in batch["documents"])
+        metadatas.extend(meta or {} for meta in batch["metadatas"])
+        offset += len(batch["ids"])
+    if not ids:
+        raise ValueError("La colección está vacía")
+    raw = np.concatenate(embeddings)
+    norms = np.linalg.norm(raw, axis=1).astype(np.float32)
+    vectors = normalize_rows(raw)
+
+    if nlist is None:
+        nlist = 0 if len(vectors) < 50_000 else int(4 * np.sqrt(len(vectors)))
+    nlist = min(nlist, len(vectors))
+    if nlist:
+        # las filas se ordenan por partición para que cada una sea un rango contiguo del fichero
+        centroids = kmeans(vectors, nlist)
+        assignment = np.concatenate([
+            np.argmax(vectors[i:i + BLOCK_ROWS] @ centroids.T, axis=1) for i in range(0, len(vectors), BLOCK_ROWS)
+        ])
+        order = np.argsort(assignment, kind="stable")
+        lists = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=nlist)))).astype(np.int64)
+    else:
+        order = np.arange(len(vectors))
+
+    tmp = f"{directory.rstrip(os.sep)}.tmp-{os.getpid()}"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    quantized, scales = quantize(vectors[order], dtype)
+    np.save(os.path.join(tmp, "vectors.npy"), quantized)
+    np.save(os.path.join(tmp, "scales.npy"), scales)
+    # la norma original de cada vector, para calcular la misma distancia L2 que Chroma
+    np.save(os.path.join(tmp, "norms.npy"), norms[order])
+    if nlist:
+        np.save(os.path.join(tmp, "centroids.npy"), centroids)
+        np.save(os.path.join(tmp, "lists.npy"), lists)
+
+    ordered_meta = [metadatas[i] for i in order]
+    sources = sorted({meta.get(SOURCE_FIELD) or "" for meta in ordered_meta} - {""})
+    codes = {source: code for code, source in enumerate([""] + sources)}
+    np.save(os.path.join(tmp, "ts.npy"), np.array([
+        int(meta[DATE_FIELD]) if isinstance(meta.get(DATE_FIELD), (int, float)) else MISSING_TS for meta in ordered_meta
+    ], dtype=np.int64))
+    np.save(os.path.join(tmp, "source.npy"), np.array([codes[meta.get(SOURCE_FIELD) or ""] for meta in ordered_meta], dtype=np.uint8))
+    write_strings(tmp, "ids", [ids[i] for i in order])
+    # ids ordenados (y su fila) para buscar por id con searchsorted sin cargarlos en memoria
+    id_keys = np.array([ids[i].encode("utf-8") for i in order])
+    id_order = np.argsort(id_keys, kind="stable")
+    np.save(os.path.join(tmp, "id_keys.npy"), id_keys[id_order])
+    np.save(os.path.join(tmp, "id_rows.npy"), id_order.astype(np.int64))
+    write_strings(tmp, "urls", [meta.get("url") or meta.get("source") or "" for meta in ordered_meta])
+    write_strings(tmp, "texts", [texts[i] for i in order])
+    write_strings(tmp, "metadatas", [json.dumps(meta, ensure_ascii=False) for meta in ordered_meta])
+
+    manifest = {
+        "count": len(vectors), "dim": vectors.shape[1], "dtype": dtype, "nlist": nlist,
+        "sources": [""] + sources, "created_at": time.time(),
+    }
+    with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    # los workers que tengan abierto el índice anterior siguen leyendo sus ficheros hasta recargar
+    old = f"{directory.rstrip(os.sep)}.old-{os.getpid()}"
+    if os.path.exists(directory):
+        os.replace(directory, old)
+    os.replace(tmp, directory)
+    shutil.rmtree(old, ignore_errors=True)
+    return manifest
+
+
+class MmapCollection:
+    def __init__(self, store):
+        """
+        Subconjunto de la API de colección de Chroma (get, count, update) que usa RAG
+        """
+        self.store = store
+
+    def count(self) -> int:
+        return self.store.count()
+
+    def get(self, ids: list[str] = None, where: dict = None, include: list[str] = None, limit: int = None, offset: int = 0) -> dict:
+        return self.store.get(ids=ids, where=where, include=include or ["documents", "metadatas"], limit=limit, offset=offset)
+
+    def update(self, ids: list[str], metadatas: list[dict]):
+        self.store.update_metadatas(ids, metadatas)
+
+
+class MmapVectorStore:
+    def __init__(self, directory: str, embeddings, writer=None, nprobe: int = 8):
+        """
+        Vector store de solo lectura sobre un snapshot exportado con export_snapshot:
+        vectores cuantizados (int8 o float16) en un .npy mapeado en memoria y metadatos
+        por columnas (fecha, fuente, url). Como los ficheros se abren con mmap, los workers
+        de un mismo servidor comparten las páginas en la caché del sistema.
+        La búsqueda es exacta o, si el snapshot tiene particiones IVF, recorre las nprobe
+        más cercanas a la query. Las distancias son L2 al cuadrado entre los vectores sin
+        normalizar (con la norma guardada de cada uno), como en Chroma, para que min_score
+        signifique lo mismo en los dos backends; los snapshots exportados antes de guardar
+        las normas comparan vectores normalizados.
+        Los documentos añadidos después del snapshot se buscan en memoria y, si hay writer
+        (una función que devuelve el Chroma de origen), también se guardan allí. Lo añadido
+        y lo borrado en memoria es de este proceso: los demás workers no lo ven hasta la
+        siguiente exportación
+        """
+        self.directory = directory
+        self.embeddings = embeddings
+        self.writer = writer
+        self.nprobe = nprobe
+        self._collection = MmapCollection(self)
+        self._lock = threading.RLock()
+        self._manifest_mtime = None
+        self._deleted = set()
+        self._delta_ids = []
+        self._delta_vectors = np.zeros((0, 0), dtype=np.float32)
+        self._delta_norms = np.zeros(0, dtype=np.float32)
+        self._delta_texts = []
+        self._delta_metadatas = []
+        self._open()
+
+    def _open(self):
+        manifest_path = os.path.join(self.directory, MANIFEST)
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self._manifest_mtime = os.stat(manifest_path).st_mtime_ns
+        load = lambda name: np.load(os.path.join(self.directory, name), mmap_mode="r")
+        self.vectors = load("vectors.npy")
+        self.scales = load("scales.npy")
+        self.ts = load("ts.npy")
+        self.source = load("source.npy")
+        self.centroids = load("centroids.npy") if self.manifest["nlist"] else None
+        self.lists = load("lists.npy") if self.manifest["nlist"] else None
+        self.norms = load("norms.npy") if os.path.exists(os.path.join(self.directory, "norms.npy")) else None
+        self.ids = StringColumn(self.directory, "ids")
+        self.urls = StringColumn(self.directory, "urls")
+        self.texts = StringColumn(self.directory, "texts")
+        self.metadatas = StringColumn(self.directory, "metadatas")
+        self.source_codes = {source: code for code, source in enumerate(self.manifest["sources"])}
+        if os.path.exists(os.path.join(self.directory, "id_keys.npy")):
+            self.id_keys, self.id_rows = load("id_keys.npy"), load("id_rows.npy")
+        else:
+            # snapshot anterior sin índice de ids: se ordenan en memoria
+            keys = np.array([self.ids[row].encode("utf-8") for row in range(len(self.ids))])
+            self.id_rows = np.argsort(keys, kind="stable")
+            self.id_keys = keys[self.id_rows]
+        self.alive = np.ones(len(self.ids), dtype=bool)
+        # los borrados que el snapshot nuevo ya no contiene no hace falta recordarlos
+        self._deleted = {doc_id for doc_id in self._deleted if self._row(doc_id) is not None}
+        for doc_id in self._deleted:
+            self.alive[self._row(doc_id)] = False
+        # lo añadido en memoria que ya está en el snapshot nuevo deja de buscarse aparte
+        self._keep_delta([i for i, doc_id in enumerate(self._delta_ids) if self._row(doc_id) is None])
+
+    def _row(self, doc_id: str) -> int | None:
+        """
+        Fila del snapshot con este id, o None
+        """
+        key = doc_id.encode("utf-8")
+        i = int(np.searchsorted(self.id_keys, key))
+        if i < len(self.id_keys) and self.id_keys[i] == key:
+            return int(self.id_rows[i])
+        return None
+
+    def _keep_delta(self, keep: list[int]):
+        if len(keep) == len(self._delta_ids):
+            return
+        self._delta_ids = [self._delta_ids[i] for i in keep]
+        self._delta_vectors = self._delta_vectors[keep] if keep else np.zeros((0, 0), dtype=np.float32)
+        self._delta_norms = self._delta_norms[keep]
+        self._delta_texts = [self._delta_texts[i] for i in keep]
+        self._delta_metadatas = [self._delta_metadatas[i] for i in keep]
+
+    def refresh(self):
+        """
+        Reabre el índice si se exportó un snapshot nuevo
+        """
+        try:
+            mtime = os.stat(os.path.join(self.directory, MANIFEST)).st_mtime_ns
+        except FileNotFoundError:
+            return
+        if mtime != self._manifest_mtime:
+            with self._lock:
+                if mtime != self._manifest_mtime:
+                    self._open()
+
+    def count(self) -> int:
+        return int(self.alive.sum()) + len(self._delta_ids)
+
+    def _select_relevance_score_fn(self):
+        # la misma conversión que usa langchain para la distancia L2 de Chroma
+        return lambda distance: 1.0 - distance / np.sqrt(2)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4, filter: dict = None) -> list[tuple]:
+        self.refresh()
+        query = np.asarray(embedding, dtype=np.float32)
+        query_norm = max(float(np.linalg.norm(query)), 1e-12)
+        query = query / query_norm
+        with self._lock:
+            if self.norms is None:
+                query_norm = 1.0
+            distances, rows = self._search_snapshot(query, query_norm, k, filter)
+            hits = [(float(distance), row) for distance, row in zip(distances, rows)]
+            hits.extend(self._search_delta(query, query_norm, k, filter))
+            hits.sort(key=lambda hit: hit[0])
+            return [(self._document(row), distance) for distance, row in hits[:k]]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: dict = None) -> list:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)]
+
+    def _ranges(self, query: np.ndarray) -> list[tuple[int, int]]:
+        if self.centroids is None:
+            return [(0, len(self.ids))]
+        probes = np.argsort(-(self.centroids @ query))[:self.nprobe]
+        return [(int(self.lists[p]), int(self.lists[p + 1])) for p in sorted(probes) if self.lists[p + 1] > self.lists[p]]
+
+    def _distances(self, cosines: np.ndarray, norms, query_norm: float) -> np.ndarray:
+        # L2 al cuadrado entre los vectores originales a partir del coseno y las normas
+        if self.norms is None:
+            return 2 - 2 * cosines
+        return query_norm ** 2 + norms ** 2 - 2 * query_norm * norms * cosines
+
+    def _search_snapshot(self, query: np.ndarray, query_norm: float, k: int, where: dict) -> tuple[np.ndarray, np.ndarray]:
+        best_distances, best_rows = [], []
+        for start, stop in self._ranges(query):
+            for a in range(start, stop, BLOCK_ROWS):
+                b = min(a + BLOCK_ROWS, stop)
+                mask = self.alive[a:b]
+                if where:
+                    mask = mask & self._mask(where, a, b)
+                if not mask.any():
+                    continue
+                cosines = (self.vectors[a:b].astype(np.float32) @ query) * self.scales[a:b]
+                distances = self._distances(cosines, None if self.norms is None else self.norms[a:b], query_norm)
+                distances[~mask] = np.inf
+                top = np.argpartition(distances, min(k, len(distances)) - 1)[:k]
+                top = top[np.isfinite(distances[top])]
+                best_distances.append(distances[top])
+                best_rows.append(top + a)
+        if not best_distances:
+            return np.zeros(0), np.zeros(0, dtype=np.int64)
+        distances, rows = np.concatenate(best_distances), np.concatenate(best_rows)
+        order = np.argsort(distances)[:k]
+        return distances[order], rows[order]
+
+    def _search_delta(self, query: np.ndarray, query_norm: float, k: int, where: dict) -> list[tuple[float, str]]:
+        if not self._delta_ids:
+            return []
+        distances = self._distances(self._delta_vectors @ query, self._delta_norms, query_norm)
+        return sorted(
+            (float(distance), doc_id) for doc_id, meta, distance in zip(self._delta_ids, self._delta_metadatas, distances)
+            if not where or matches(where, meta)
+        )[:k]
+
+    def _mask(self, where: dict, start: int, stop: int) -> np.ndarray:
+        """
+        Filtro de Chroma evaluado por columnas; los campos sin columna se leen de los metadatos
+        """
+        if "$and" in where:
+            return np.logical_and.reduce([self._mask(part, start, stop) for part in where["$and"]])
+        if "$or" in where:
+            return np.logical_or.reduce([self._mask(part, start, stop) for part in where["$or"]])
+        (field, condition), = where.items()
+        op, operand = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+        if field == DATE_FIELD:
+            values = self.ts[start:stop]
+            return (values != MISSING_TS) & compare(values, op, operand)
+        if field == SOURCE_FIELD and op in ("$eq", "$ne", "$in", "$nin"):
+            values = self.source[start:stop]
+            code = lambda value: self.source_codes.get(value, -1)
+            operand = [code(value) for value in operand] if op in ("$in", "$nin") else code(operand)
+            return (values != 0) & compare(values, op, operand)
+        return np.fromiter(
+            (matches({field: condition}, json.loads(self.metadatas[row])) for row in range(start, stop)),
+            dtype=bool, count=stop - start
+        )
+
+    def _document(self, row):
+        from langchain_core.documents import Document
+        if isinstance(row, str):
+            i = self._delta_ids.index(row)
+            return Document(id=row, page_content=self._delta_texts[i], metadata=self._delta_metadatas[i])
+        row = int(row)
+        return Document(id=self.ids[row], page_content=self.texts[row], metadata=json.loads(self.metadatas[row]))
+
+    def get(self, ids: list[str] = None, where: dict = None, include: list[str] = (), limit: int = None, offset: int = 0) -> dict:
+        self.refresh()
+        with self._lock:
+            if ids is not None:
+                keys = []
+                for doc_id in ids:
+                    row = self._row(doc_id)
+                    if row is not None and self.alive[row]:
+                        keys.append(row)
+                    elif doc_id in self._delta_ids:
+                        keys.append(doc_id)
+                docs = [self._document(key) for key in keys]
+                docs = [doc for doc in docs if not where or matches(where, doc.metadata)]
+                docs = docs[offset:offset + limit if limit else None]
+            else:
+                # primero las filas del snapshot (filtradas por columnas) y después las añadidas en memoria
+                mask = self.alive & self._mask(where, 0, len(self.ids)) if where else self.alive
+                rows = np.flatnonzero(mask)
+                stop = offset + limit if limit else None
+                docs = [self._document(row) for row in rows[offset:stop]]
+                if stop is None or stop > len(rows):
+                    delta = [self._document(doc_id) for doc_id in self._delta_ids]
+                    delta = [doc for doc in delta if not where or matches(where, doc.metadata)]
+                    docs.extend(delta[max(offset - len(rows), 0):None if stop is None else stop - len(rows)])
+            result = {"ids": [doc.id for doc in docs]}
+            if "documents" in include:
+                result["documents"] = [doc.page_content for doc in docs]
+            if "metadatas" in include:
+                result["metadatas"] = [doc.metadata for doc in docs]
+            if "embeddings" in include:
+                result["embeddings"] = [self._vector(doc.id) for doc in docs]
+            return result
+
+    def _vector(self, doc_id: str) -> np.ndarray:
+        row = self._row(doc_id)
+        if row is not None and self.alive[row]:
+            norm = self.norms[row] if self.norms is not None else 1.0
+            return self.vectors[row].astype(np.float32) * self.scales[row] * norm
+        i = self._delta_ids.index(doc_id)
+        return self._delta_vectors[i] * self._delta_norms[i]
+
+    def add_documents(self, documents: list, ids: list[str] = None) -> list[str]:
+        ids = ids or [str(uuid.uuid4()) for _ in documents]
+        texts = [doc.page_content for doc in documents]
+        embeddings = np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+        if self.writer is not None:
+            # a Chroma van los embeddings tal cual, como los demás documentos de la colección
+            self.writer()._collection.upsert(ids=ids, embeddings=embeddings.tolist(), documents=texts,
+                                             metadatas=[doc.metadata for doc in documents])
+        vectors = normalize_rows(embeddings)
+        with self._lock:
+            # la versión nueva sustituye a la del snapshot sin contar como borrado: al
+            # reabrir, el snapshot que ya la contenga debe seguir devolviéndola
+            self._deleted.difference_update(ids)
+            self._hide(ids)
+            self._delta_ids.extend(ids)
+            self._delta_vectors = vectors if not len(self._delta_vectors) else np.vstack([self._delta_vectors, vectors])
+            self._delta_norms = np.concatenate([self._delta_norms, np.linalg.norm(embeddings, axis=1).astype(np.float32)])
+            self._delta_texts.extend(texts)
+            self._delta_metadatas.extend(dict(doc.metadata) for doc in documents)
+        return ids
+
+    def delete(self, ids: list[str] = None):
+        if not ids:
+            return
+        if self.writer is not None:
+            self.writer().delete(ids=ids)
+        with self._lock:
+            self._forget(ids)
+
+    def _forget(self, ids: list[str]):
+        """
+        Borra estos ids: se dejan de devolver y se siguen ocultando en los snapshots
+        exportados antes del borrado
+        """
+        self._deleted.update(ids)
+        self._hide(ids)
+
+    def _hide(self, ids: list[str]):
+        """
+        Deja de devolver estos ids, tanto del snapshot como de lo añadido en memoria
+        """
+        removed = set(ids)
+        for doc_id in removed:
+            row = self._row(doc_id)
+            if row is not None:
+                self.alive[row] = False
+        self._keep_delta([i for i, doc_id in enumerate(self._delta_ids) if doc_id not in removed])
+
+    def update_metadatas(self, ids: list[str], metadatas: list[dict]):
+        """
+        Actualiza los metadatos en el Chroma de origen; los documentos añadidos en memoria
+        los cambian ya y los del snapshot, en la siguiente exportación
+        """
+        if self.writer is None:
+            raise RuntimeError("El índice mmap es de solo lectura y no tiene un Chroma de origen en el que actualizar")
+        self.writer()._collection.update(ids=ids, metadatas=metadatas)
+        with self._lock:
+            for doc_id, meta in zip(ids, metadatas):
+                if doc_id in self._delta_ids:
+                    self._delta_metadatas[self._delta_ids.index(doc_id)] = dict(meta)
+
+def compare(values: np.ndarray, op: str, operand) -> np.ndarray:
+    if op == "$eq":
+        return values == operand
+    if op == "$ne":
+        return values != operand
+    if op == "$gt":
+        return values > operand
+    if op == "$gte":
+        return values >= operand
+    if op == "$lt":
+        return values < operand
+    if op == "$lte":
+        return values <= operand
+    if op == "$in":
+        return np.isin(values, operand)
+    if op == "$nin":
+        return ~np.isin(values, operand)
+    raise ValueError(f"Operador de filtro no soportado: {op}")
+
+def matches(where: dict, metadata: dict) -> bool:
+    """
+    Evalúa un filtro de Chroma sobre los metadatos de un documento
+    """
+    if "$and" in where:
+        return all(matches(part, metadata) for part in where["$and"])
+    if "$or" in where:
+        return any(matches(part, metadata) for part in where["$or"])
+    (field, condition), = where.items()
+    op, operand = next(iter(condition.items())) if isinstance(condition, dict) else ("$eq", condition)
+    if field not in metadata:
+        return False
+    return bool(compare(np.asarray(metadata[field]), op, operand))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Exporta la colección de Chroma a un índice mmap cuantizado")
+    parser.add_argument("--persist-directory", default="./chroma_lan")
+    parser.add_argument("--collection", default="gastronomia")
+    parser.add_argument("--output", default=None, help="por defecto <persist-directory>/mmap_index")
+    parser.add_argument("--dtype", choices=["int8", "float16"], default="int8")
+    parser.add_argument("--nlist", type=int, default=None, help="particiones IVF (0 = búsqueda exacta)")
+    parser.add_argument("--single", action="store_true",
+                        help="exportar la colección única en lugar de una colección por fuente")
+    args = parser.parse_args(argv)
+
+    import chromadb
+    from src.rag.shards import SHARDS
+    client = chromadb.PersistentClient(path=args.persist_directory)
+    output = args.output or os.path.join(args.persist_directory, "mmap_index")
+    # cada shard <collection>_<fuente> se exporta a <output>/<fuente>
+    targets = [(args.collection, output)] if args.single else [
+        (f"{args.collection}_{shard}", os.path.join(output, shard)) for shard in SHARDS
+    ]
+    for name, directory in targets:
+        collection = client.get_or_create_collection(name)
+        if not collection.count():
+            # sin snapshot el shard se sigue leyendo de Chroma
+            print(f"{name}: vacía, no se exporta")
+            continue
+        start = time.perf_counter()
+        manifest = export_snapshot(collection, directory, dtype=args.dtype, nlist=args.nlist)
+        print(f"{name}: {manifest['count']} vectores exportados a {directory} en {time.perf_counter() - start:.1f}s")
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -1,101 +1,652 @@
-from langchain_community.chat_models import ChatOllama
-from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.prompts import ChatPromptTemplate
-from langchain.schema import Document
-from datetime import datetime
-from src.crawler.cookpad import CookpadCrawler
-from dateutil.parser import isoparse
+from __future__ import annotations
+from typing import TYPE_CHECKING
+from src.preprocessing.dates import DATE_FIELD, to_epoch, with_date_index
+from src.rag.crawl_queue import CrawlQueue
+from src.rag.doc_index import DocumentIndex, source_type
+from src.rag.answer_cache import SemanticCache
+from src.rag.bm25 import BM25Index
+from src.rag.context import ContextPacker
+from src.rag.shards import SHARD_SKIPPED, SHARDS, Router, ShardedVectorStore, migrate_collection, shard_of
+from src.rag.metrics import (
+    ANSWER_CACHE, CRAWL_ATTEMPTS, DOCUMENTS_ADDED, INGREDIENT_ANSWERS, LLM_TOKENS, STAGE_SECONDS, annotate, request_trace, span
+)
+from src.crawler.ingredients import IngredientIndex, ingredient_query
+import os
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+if TYPE_CHECKING:
+    from langchain_core.documents import Document
+
+LOADING_MESSAGE = "Todavía no tenemos recetas para esta consulta. Las estamos buscando ahora mismo, vuelve a intentarlo en unos segundos."
+CHROMA_URL_ENV = "FORKPILOT_CHROMA_URL"
+VECTOR_BACKEND_ENV = "FORKPILOT_VECTOR_BACKEND"
+SHARDED_ENV = "FORKPILOT_SHARDED"
+SYSTEM_PROMPT = "Usa el siguiente contexto para responder la pregunta. Solo responde basado en los documentos. Si no sabes la respuesta, informa educadamente.\n\nContexto: {context}"
+
+# la búsqueda léxica se ejecuta en estos hilos mientras se embebe la query y se busca en Chroma
+_lexical_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="bm25")
+
+def reciprocal_rank_fusion(rankings: list[list], rrf_k: int = 60) -> list[tuple]:
+    """
+    Combina varias listas ordenadas de documentos: cada documento suma 1 / (rrf_k + posición)
+    por cada lista en la que aparece. Devuelve (documento, puntuación) de mayor a menor
+    """
+    scores = {}
+    docs = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = doc.id or (doc.metadata.get("url"), doc.page_content)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0) + 1 / (rrf_k + rank)
+    return sorted(((docs[key], score) for key, score in scores.items()), key=lambda x: x[1], reverse=True)
+
+def format_ingredient_answer(names: list[str], recipes: list[dict]) -> str:
+    """
+    Respuesta en texto para una consulta de ingredientes respondida desde el índice
+    """
+    lines = [f"Recetas que puedes preparar con {', '.join(names)}:", ""]
+    for i, recipe in enumerate(recipes, start=1):
+        line = f"{i}. {recipe['title']} (usa {', '.join(recipe['matched'])})"
+        if recipe["missing"]:
+            line += f". También necesitas: {', '.join(recipe['missing'])}"
+        lines.append(line)
+    return "\n".join(lines)
+
+def output_tokens(message, fallback: int) -> int:
+    """
+    Tokens generados según el LLM (usage_metadata); si no lo informa se usa fallback
+    """
+    usage = getattr(message, "usage_metadata", None) or {}
+    return usage.get("output_tokens") or fallback
 
 class RAG:
-    def __init__(self, collection_name="gastronomia", embedding_model="sentence-transformers/distiluse-base-multilingual-cased-v2", persist_directory="./chroma_lan"):
+    def __init__(self, collection_name="gastronomia", embedding_model=None, persist_directory="./chroma_lan", crawl_workers=1,
+                 cache_threshold=0.92, cache_size=1000, cache_ttl=86400, llm=None, chroma_url=None, context_tokens=1500,
+                 vector_backend=None, mmap_directory=None, sharded=None, shard_settings=None, router=None):
         """
-        Inicializar RAG 
+        Inicializar RAG.
+        Las respuestas se guardan en una caché semántica: una query con similitud
+        >= cache_threshold con otra ya respondida reutiliza su respuesta.
+        llm permite usar otro modelo de chat en lugar de mistral en Ollama y
+        embedding_model=None usa el modelo de embeddings por defecto.
+        Con chroma_url (o FORKPILOT_CHROMA_URL) se usa un servidor de Chroma en lugar de
+        abrir persist_directory en este proceso, para que varios workers lo compartan.
+        Con vector_backend="mmap" (o FORKPILOT_VECTOR_BACKEND=mmap) las búsquedas se hacen
+        sobre el snapshot cuantizado de mmap_directory (por defecto persist_directory/mmap_index,
+        ver src/rag/mmap_store.py) y Chroma solo se abre para escribir.
+        Por defecto cada fuente (cookpad, gourmet, gutenberg) tiene su propia colección
+        <collection_name>_<fuente> y retrieve busca en paralelo en las que elige router,
+        con los filtros y cupos de shard_settings (ver src/rag/shards.py). La colección
+        única anterior se copia a los shards la primera vez. sharded=False
+        (o FORKPILOT_SHARDED=0) usa una sola colección collection_name.
+        El modelo de embeddings, Chroma y el cliente del LLM se crean la primera vez
+        que se usan (o en warm_up), así que construir el objeto es inmediato.
+        El contexto del prompt se limita a unos context_tokens tokens (ver ContextPacker)
         """
-        self.vector_store = Chroma(
-            collection_name=collection_name,
-            embedding_function=HuggingFaceEmbeddings(model_name=embedding_model),
-            persist_directory=persist_directory
+        self.collection_name = collection_name
+        self.embedding_model = embedding_model
+        self.persist_directory = persist_directory
+        self.chroma_url = chroma_url or os.environ.get(CHROMA_URL_ENV)
+        self.vector_backend = vector_backend or os.environ.get(VECTOR_BACKEND_ENV, "chroma")
+        self.mmap_directory = mmap_directory or os.path.join(persist_directory, "mmap_index")
+        self.sharded = sharded if sharded is not None else os.environ.get(SHARDED_ENV, "1") != "0"
+        self.shard_settings = shard_settings
+        self.router = router or Router()
+        self._vector_store = None
+        self._chromas = {}
+        self._doc_index = None
+        self._bm25 = None
+        self._ingredient_index = None
+        self._llm = llm
+        self._prompt = None
+        self._init_lock = threading.RLock()
+        self.crawl_queue = CrawlQueue(self._crawl, workers=crawl_workers, path=os.path.join(persist_directory, "crawl_jobs.db"))
+        self.answer_cache = SemanticCache(
+            os.path.join(persist_directory, "answer_cache"),
+            threshold=cache_threshold, max_entries=cache_size, ttl=cache_ttl
         )
-        self.llm = ChatOllama(model="mistral")
-        self.prompt = ChatPromptTemplate.from_messages([
-            ("system", "Usa el siguiente contexto para responder la pregunta. Solo responde basado en los documentos. Si no sabes la respuesta, informa educadamente.\n\nContexto: {context}"),
-            ("human", "{input}")
-        ])
+        self.packer = ContextPacker(max_tokens=context_tokens)
+        self.ready = threading.Event()
+        self.warm_up_error = None
+        self.warm_up_seconds = None
+
+    @property
+    def vector_store(self):
+        if self._vector_store is None:
+            with self._init_lock:
+                if self._vector_store is None:
+                    if self.sharded:
+                        from src.rag.embeddings import DEFAULT_MODEL, get_embeddings
+                        store = ShardedVectorStore(
+                            self._open_store, get_embeddings(self.embedding_model or DEFAULT_MODEL), settings=self.shard_settings
+                        )
+                        self._migrate_to_shards(store)
+                        self._vector_store = store
+                    else:
+                        self._vector_store = self._open_store(None)
+        return self._vector_store
+
+    def _open_store(self, shard: str = None):
+        """
+        Vector store de un shard (o de la colección única si shard es None): Chroma o,
+        con el backend mmap, el snapshot exportado de esa colección si existe
+        """
+        collection_name = f"{self.collection_name}_{shard}" if shard else self.collection_name
+        directory = os.path.join(self.mmap_directory, shard) if shard else self.mmap_directory
+        if self.vector_backend == "mmap" and os.path.exists(directory):
+            from src.rag.mmap_store import MmapVectorStore
+            from src.rag.embeddings import DEFAULT_MODEL, get_embeddings
+            return MmapVectorStore(
+                directory, get_embeddings(self.embedding_model or DEFAULT_MODEL), writer=lambda: self.chroma(collection_name)
+            )
+        return self.chroma(collection_name)
+
+    def chroma(self, collection_name: str = None):
+        """
+        El vector store de Chroma (local o servidor) de una colección; con el backend mmap
+        solo se usa para escribir
+        """
+        collection_name = collection_name or self.collection_name
+        if collection_name not in self._chromas:
+            with self._init_lock:
+                if collection_name not in self._chromas:
+                    from langchain_chroma import Chroma
+                    from src.rag.embeddings import DEFAULT_MODEL, get_embeddings
+                    location = {"persist_directory": self.persist_directory}
+                    if self.chroma_url:
+                        import chromadb
+                        url = urlparse(self.chroma_url)
+                        location = {"client": chromadb.HttpClient(host=url.hostname, port=url.port or 8000, ssl=url.scheme == "https")}
+                    self._chromas[collection_name] = Chroma(
+                        collection_name=collection_name,
+                        embedding_function=get_embeddings(self.embedding_model or DEFAULT_MODEL),
+                        **location
+                    )
+        return self._chromas[collection_name]
+
+    def _migrate_to_shards(self, store: ShardedVectorStore):
+        """
+        Copia la colección única a los shards si estos están vacíos y ella no
+        """
+        if self.vector_backend == "mmap" or store._collection.count():
+            return
+        legacy = self.chroma(self.collection_name)._collection
+        if not legacy.count():
+            return
+        print(f"Copiando la colección {self.collection_name} a una colección por fuente…")
+        copied = migrate_collection(legacy, store)
+        print(f"{copied} chunks copiados a {', '.join(f'{self.collection_name}_{shard}' for shard in SHARDS)}.")
+
+    @property
+    def doc_index(self) -> DocumentIndex:
+        if self._doc_index is None:
+            with self._init_lock:
+                if self._doc_index is None:
+                    self._doc_index = DocumentIndex.load(os.path.join(self.persist_directory, "doc_index.jsonl"), self.vector_store)
+        return self._doc_index
+
+    @property
+    def bm25(self) -> BM25Index:
+        if self._bm25 is None:
+            with self._init_lock:
+                if self._bm25 is None:
+                    os.makedirs(self.persist_directory, exist_ok=True)
+                    self._bm25 = BM25Index.load(os.path.join(self.persist_directory, "bm25.db"), self.vector_store)
+        return self._bm25
+
+    @property
+    def ingredient_index(self) -> IngredientIndex:
+        if self._ingredient_index is None:
+            with self._init_lock:
+                if self._ingredient_index is None:
+                    os.makedirs(self.persist_directory, exist_ok=True)
+                    self._ingredient_index = IngredientIndex.load(os.path.join(self.persist_directory, "ingredients.db"), self.vector_store)
+        return self._ingredient_index
+
+    @property
+    def llm(self):
+        if self._llm is None:
+            with self._init_lock:
+                if self._llm is None:
+                    from langchain_community.chat_models import ChatOllama
+                    self._llm = ChatOllama(model="mistral")
+        return self._llm
+
+    @property
+    def prompt(self):
+        if self._prompt is None:
+            with self._init_lock:
+                if self._prompt is None:
+                    from langchain_core.prompts import ChatPromptTemplate
+                    self._prompt = ChatPromptTemplate.from_messages([("system", SYSTEM_PROMPT), ("human", "{input}")])
+        return self._prompt
+
+    def warm_up(self):
+        """
+        Carga todos los componentes y hace un embedding y una búsqueda de prueba para
+        que la primera consulta real no pague la carga del modelo. Marca ready al terminar
+        """
+        start = time.perf_counter()
+        try:
+            with span("warm_up"):
+                self.llm
+                self.prompt
+                embedding = self.embed_query("receta de tortilla de patatas")
+                self.doc_index
+                self.bm25.search("tortilla patata", k=1)
+                self.ingredient_index
+                self.vector_store.similarity_search_by_vector(embedding, k=1)
+        except Exception as e:
+            self.warm_up_error = f"{type(e).__name__}: {e}"
+            print(f"Error al precargar el RAG: {self.warm_up_error}")
+            raise
+        self.warm_up_seconds = time.perf_counter() - start
+        self.ready.set()
+        print(f"RAG listo en {self.warm_up_seconds:.1f}s.")
+
+    def start_warm_up(self) -> threading.Thread:
+        """
+        Ejecuta warm_up en un hilo en segundo plano
+        """
+        def run():
+            try:
+                self.warm_up()
+            except Exception:
+                pass
+        thread = threading.Thread(target=run, name="rag-warm-up", daemon=True)
+        thread.start()
+        return thread
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready.is_set(),
+            "error": self.warm_up_error,
+            "warm_up_seconds": self.warm_up_seconds,
+        }
 
     def get_stored_urls(self) -> set:
         """
         Obtiene los urls de los documentos almacenados en el vector store
         """
-        results = self.vector_store.get(include=["metadatas"])
-        return set(meta["url"] for meta in results["metadatas"] if "url" in meta)
+        return self.doc_index.stored_urls()
 
-    
-    def retrieve(self, query: str, k = 5, min_score: float = 0.5, min_date: str = "2000-06-01", verbose = True):
-        """ 
-        Obtiene los documentos que mejor se ajustan a la query
+    def add_documents(self, documents: list[Document], ids: list[str] = None):
+        """
+        Añade documentos al vector store guardando la fecha como epoch numérico
         """
-        retrieved = self.vector_store.similarity_search_with_score(query)
-        retrieved.sort(key=lambda x: x[1], reverse=True)
-        min_dt = datetime.fromisoformat(min_date)
+        for doc in documents:
+            with_date_index(doc.metadata)
+        # el índice BM25 se abre antes de insertar para que no se reconstruya con estos chunks
+        bm25 = self.bm25
+        ids = self.vector_store.add_documents(documents, ids=ids)
+        bm25.add(ids, [doc.page_content for doc in documents])
+        self.doc_index.add(doc.metadata for doc in documents)
+        for doc in documents:
+            DOCUMENTS_ADDED.inc(source=source_type(doc.metadata))
+        return ids
 
-        filtered = []
-        for doc, score in retrieved:
-            pub_date = doc.metadata.get("publication_date")
-            try:
-                pub_dt = isoparse(pub_date)
-            except:
-                pub_dt = None
-
-            if pub_dt:
-                pub_dt = pub_dt.replace(tzinfo=None)
-
-            if score >= min_score and pub_dt and pub_dt >= min_dt:
-                if verbose: 
-                    print(f"{doc.metadata.get('title')} - Relevancia: {score:.4f}")
-                    print(f"{doc.metadata.get('url')}")
-                filtered.append(doc)
-            if len(filtered) >= k:
+    def delete_documents(self, ids: list[str]):
+        """
+        Borra documentos del vector store por id
+        """
+        if not ids:
+            return
+        existing = self.vector_store._collection.get(ids=ids, include=["metadatas"])
+        if not existing["ids"]:
+            return
+        self.vector_store.delete(ids=existing["ids"])
+        self.bm25.remove(existing["ids"])
+        self.ingredient_index.remove(
+            meta["id"] for meta in existing["metadatas"] if meta and source_type(meta) == "cookpad" and meta.get("id")
+        )
+        self.doc_index.remove(meta or {} for meta in existing["metadatas"])
+
+    def backfill_date_index(self, batch_size: int = 1000) -> int:
+        """
+        Añade el campo numérico de fecha a los documentos indexados antes de que existiera.
+        Devuelve la cantidad de documentos actualizados. Se actualiza Chroma directamente
+        (cada shard por separado), también con el backend mmap, que es de solo lectura
+        """
+        if isinstance(self.vector_store, ShardedVectorStore):
+            names = [f"{self.collection_name}_{shard}" for shard in self.vector_store.shards]
+        else:
+            names = [self.collection_name]
+        return sum(self._backfill_date_index(self.chroma(name)._collection, batch_size) for name in names)
+
+    @staticmethod
+    def _backfill_date_index(collection, batch_size: int) -> int:
+        updated = 0
+        offset = 0
+        while True:
+            batch = collection.get(include=["metadatas"], limit=batch_size, offset=offset)
+            if not batch["ids"]:
                 break
+            ids, metadatas = [], []
+            for doc_id, meta in zip(batch["ids"], batch["metadatas"]):
+                meta = dict(meta or {})
+                if DATE_FIELD in meta:
+                    continue
+                with_date_index(meta)
+                if DATE_FIELD in meta:
+                    ids.append(doc_id)
+                    metadatas.append(meta)
+            if ids:
+                collection.update(ids=ids, metadatas=metadatas)
+                updated += len(ids)
+            offset += len(batch["ids"])
+        return updated
 
-        return filtered
+    def embed_query(self, query: str) -> list[float]:
+        with span("embed_query"):
+            return self.vector_store.embeddings.embed_query(query)
 
-    def generate(self, query: str, k = 5, max_crawls = 3, verbose = True):
-        """
-        Obtiene los documentos que mejor se ajustan a la query y genera un texto basado
-        en los documentos obtenidos
+    def retrieve(self, query: str, k = 5, min_score: float = 0.5, min_date: str = "2000-06-01", verbose = True, overfetch: int = 4, max_fetch: int = 200,
+                 embedding: list[float] = None, hybrid: bool = True, rrf_k: int = 60):
+        """ 
+        Obtiene los documentos que mejor se ajustan a la query.
+        El filtro de fecha se ejecuta dentro de Chroma y la cantidad de candidatos
+        se duplica (hasta max_fetch) mientras no haya k documentos sobre min_score.
+        Si ya se tiene el embedding de la query se puede pasar para no recalcularlo.
+        El filtro de fecha forma parte del tiempo de similarity_search.
+        Con hybrid=True se busca a la vez en el índice BM25 y las dos listas se
+        combinan con reciprocal rank fusion.
+        Con los shards por fuente solo se busca en los que elige el router, en paralelo,
+        y los resultados se mezclan por puntuación normalizada
         """
-        filtered_docs = self.retrieve(query, k=k)
-        if filtered_docs:
-            print(f"Se encontraron {len(filtered_docs)} documentos relevantes. Omitiendo crawler.")
+        min_ts = to_epoch(min_date) if min_date else None
+        where = {DATE_FIELD: {"$gte": min_ts}} if min_ts is not None else None
+        fetch_k = min(max(k * overfetch, k), max_fetch)
+        lexical = _lexical_executor.submit(self._lexical_search, query, fetch_k, where) if hybrid else None
+        if embedding is None:
+            embedding = self.embed_query(query)
+
+        shards = self._route(query)
+        if shards is not None:
+            annotate(shards=",".join(shards))
+            for shard in set(self.vector_store.shards) - set(shards):
+                SHARD_SKIPPED.inc(shard=shard)
+            with span("similarity_search"):
+                filtered = self.vector_store.search(
+                    embedding, k, shards, lambda settings: self._shard_where(settings, where), min_score, fetch_k, max_fetch
+                )
+            rounds = 1
         else:
-            print("No se encontraron documentos relevantes. Ejecutando crawler…")
+            relevance = self.vector_store._select_relevance_score_fn()
+            rounds = 0
+            while True:
+                rounds += 1
+                with span("similarity_search"):
+                    retrieved = [
+                        (doc, relevance(distance)) for doc, distance
+                        in self.vector_store.similarity_search_by_vector_with_relevance_scores(embedding, k=fetch_k, filter=where)
+                    ]
+                with span("score_filter"):
+                    filtered = [(doc, score) for doc, score in retrieved if score >= min_score]
+                exhausted = len(retrieved) < fetch_k
+                below_threshold = bool(retrieved) and retrieved[-1][1] < min_score
+                if len(filtered) >= k or exhausted or below_threshold or fetch_k >= max_fetch:
+                    break
+                fetch_k = min(fetch_k * 2, max_fetch)
+
+        filtered.sort(key=lambda x: x[1], reverse=True)
+        if lexical:
+            lexical_docs = lexical.result()
+            if shards is not None:
+                lexical_docs = [doc for doc in lexical_docs if shard_of(doc.metadata) in shards]
+            filtered = reciprocal_rank_fusion([[doc for doc, _ in filtered], lexical_docs], rrf_k)
+            annotate(lexical=len(lexical_docs))
+        # los cupos de los shards se aplican al resultado final, con los documentos de BM25
+        filtered = self.vector_store.apply_quotas(filtered, k) if shards is not None else filtered[:k]
+        annotate(search_rounds=rounds, fetch_k=fetch_k, retrieved=len(filtered))
+        if verbose:
+            for doc, score in filtered:
+                print(f"{doc.metadata.get('title')} - {'RRF' if lexical else 'Relevancia'}: {score:.4f}")
+                print(f"{doc.metadata.get('url')}")
+
+        return [doc for doc, _ in filtered]
+
+    def _route(self, query: str) -> list[str] | None:
+        """
+        Los shards en los que se busca la query; None sin shards por fuente
+        """
+        if not isinstance(self.vector_store, ShardedVectorStore):
+            return None
+        return self.router.route(query, self.vector_store.shards)
+
+    def _needed(self, query: str, k: int) -> int | None:
+        """
+        Cuántos documentos debería encontrar retrieve para no crawlear: k o, con shards,
+        lo que pueden devolver los elegidos para la query con sus cupos. None si crawlear
+        no sirve porque los documentos nuevos de Cookpad no se buscarían para esta query
+        """
+        shards = self._route(query)
+        if shards is None:
+            return k
+        if "cookpad" not in shards:
+            return None
+        return self.vector_store.capacity(shards, k)
+
+    @staticmethod
+    def _shard_where(settings, where: dict | None) -> dict | None:
+        """
+        Filtro de fecha de un shard: el suyo si tiene min_date propio y si no el de retrieve
+        """
+        if settings.min_date == "":
+            return where
+        min_ts = to_epoch(settings.min_date) if settings.min_date else None
+        return {DATE_FIELD: {"$gte": min_ts}} if min_ts is not None else None
+
+    def _lexical_search(self, query: str, k: int, where: dict = None) -> list[Document]:
+        """
+        Los k mejores chunks según BM25 que cumplen el filtro de metadatos
+        """
+        from langchain_core.documents import Document
+        with span("bm25_search"):
+            hits = self.bm25.search(query, k=k)
+            if not hits:
+                return []
+            found = self.vector_store._collection.get(ids=[doc_id for doc_id, _ in hits], where=where, include=["documents", "metadatas"])
+        by_id = {
+            doc_id: Document(id=doc_id, page_content=text or "", metadata=meta or {})
+            for doc_id, text, meta in zip(found["ids"], found["documents"], found["metadatas"])
+        }
+        return [by_id[doc_id] for doc_id, _ in hits if doc_id in by_id]
 
-        for attempt in range(max_crawls):
-            if len(filtered_docs) >= k:
+    def _crawl(self, job):
+        """
+        Ejecuta en segundo plano los crawls de Cookpad de un trabajo de la cola
+        """
+        # selenium solo se importa cuando hace falta crawlear
+        from src.crawler.cookpad import CookpadCrawler
+        needed = self._needed(job.query, job.k)
+        if needed is None:
+            return
+        for attempt in range(job.max_crawls):
+            if len(self.retrieve(job.query, k=job.k, verbose=False)) >= needed:
                 break
-            
-            crawler = CookpadCrawler(query=query, min_new=k, exclude_ids=self.get_stored_urls())
-            crawler.search()
+            job.attempts = attempt + 1
+            job.save()
+
+            CRAWL_ATTEMPTS.inc()
+            with span("crawl_attempt"):
+                crawler = CookpadCrawler(query=job.query, min_new=job.k, exclude_ids=self.doc_index.ids("cookpad"))
+                crawler.search()
             new_docs = [d for d in crawler.documents if d.page_content.strip()]
             if not new_docs:
                 print(f"Crawl {attempt+1} no encontro recetas válidas. Siguiente intento.")
                 continue
 
-            self.vector_store.add_documents(new_docs)
+            self.add_documents(new_docs)
+            self.ingredient_index.add_many(crawler.recipes)
+            job.added += len(new_docs)
+            job.save()
             print(f"Añadidos {len(new_docs)} docs tras crawl #{attempt+1}")
 
-            filtered_docs = self.retrieve(query, k=k)
-
-        unique_docs = []
-        seen = set()
-        for doc in filtered_docs:
-            url = doc.metadata.get("url")
-            if url not in seen:
-                unique_docs.append(doc)
-                seen.add(url)
-        context = "\n\n".join(d.page_content for d in unique_docs)
-        messages = self.prompt.invoke({"input": query, "context": context})
-        response = self.llm.invoke(messages).content
-        return response, unique_docs[:k]
\ No newline at end of file
+    def answer_from_ingredients(self, query: str, k: int = 5) -> tuple[str, list[Document]] | None:
+        """
+        Si la query es solo una lista de ingredientes conocidos responde con las recetas
+        del índice de ingredientes que más de ellos usan, sin embeddings ni LLM.
+        Devuelve (respuesta, documentos) o None si la query no es de ese tipo o no hay recetas
+        """
+        from langchain_core.documents import Document
+        with span("ingredient_lookup"):
+            names = ingredient_query(query, self.ingredient_index)
+            recipes = self.ingredient_index.rank(names, k=k) if names else []
+        if not recipes:
+            return None
+        INGREDIENT_ANSWERS.inc()
+        annotate(ingredients=len(names), documents=len(recipes))
+        docs = [
+            Document(page_content="; ".join(recipe["ingredients"]),
+                     metadata={"title": recipe["title"], "url": recipe["url"], "id": recipe["id"], "source_type": "cookpad"})
+            for recipe in recipes
+        ]
+        return format_ingredient_answer(names, recipes), docs
+
+    def crawl_status(self, query: str) -> dict | None:
+        """
+        Estado del crawl en segundo plano para la query (para que la UI consulte el progreso)
+        """
+        return self.crawl_queue.status(query)
+
+    def prepare(self, query: str, k = 5, max_crawls = 3, verbose = True, wait = False, embedding: list[float] = None):
+        """
+        Recupera los documentos de la query y construye el prompt.
+        Si faltan documentos se encola un crawl en segundo plano y se usa lo que ya
+        está indexado; con wait=True se espera a que el crawl termine. Con shards por
+        fuente faltan si no se llega a lo que permiten los cupos de los shards elegidos,
+        y solo se crawlea si entre ellos está el de Cookpad.
+        Devuelve (documentos, mensajes); mensajes es None si no hay ningún documento
+        """
+        if embedding is None:
+            embedding = self.embed_query(query)
+        filtered_docs = self.retrieve(query, k=k, verbose=verbose, embedding=embedding)
+        needed = self._needed(query, k)
+        if needed is None:
+            print("La consulta no busca en las recetas de Cookpad. Omitiendo crawler.")
+        elif len(filtered_docs) >= needed:
+            print(f"Se encontraron {len(filtered_docs)} documentos relevantes. Omitiendo crawler.")
+        else:
+            print("No hay suficientes documentos relevantes. Encolando crawler…")
+            job = self.crawl_queue.submit(query, k=k, max_crawls=max_crawls)
+            annotate(crawl=job.status)
+            if wait:
+                job.wait()
+                filtered_docs = self.retrieve(query, k=k, verbose=verbose, embedding=embedding)
+
+        if not filtered_docs:
+            return [], None
+
+        with span("prompt_build"):
+            context, used_docs = self.packer.pack(
+                filtered_docs, embeddings=self._chunk_embeddings(filtered_docs), query_embedding=embedding
+            )
+            unique_docs = []
+            seen = set()
+            for doc in used_docs:
+                url = doc.metadata.get("url")
+                if url not in seen:
+                    unique_docs.append(doc)
+                    seen.add(url)
+            messages = self.prompt.invoke({"input": query, "context": context})
+        return unique_docs[:k], messages
+
+    def _chunk_embeddings(self, docs: list[Document]) -> list | None:
+        """
+        Embeddings guardados en Chroma de los chunks recuperados (sin volver a calcularlos);
+        None si algún documento no tiene id
+        """
+        ids = [doc.id for doc in docs]
+        if not ids or any(doc_id is None for doc_id in ids):
+            return None
+        found = self.vector_store._collection.get(ids=ids, include=["embeddings"])
+        by_id = dict(zip(found["ids"], found["embeddings"]))
+        return [by_id.get(doc_id) for doc_id in ids]
+
+    def generate(self, query: str, k = 5, max_crawls = 3, verbose = True, wait = False):
+        """
+        Obtiene los documentos que mejor se ajustan a la query y genera un texto basado
+        en los documentos obtenidos. Las consultas que son solo ingredientes se responden
+        desde el índice de ingredientes; el resto consulta antes la caché semántica de respuestas
+        """
+        with request_trace("generate", query=query):
+            found = self.answer_from_ingredients(query, k=k)
+            if found:
+                return found
+            embedding = self.embed_query(query)
+            version = self.doc_index.version
+            cached = self._cache_lookup(embedding, version)
+            if cached:
+                print(f"Respuesta en caché (similitud {cached['similarity']:.3f}).")
+                return cached["answer"], cached["sources"]
+
+            docs, messages = self.prepare(query, k=k, max_crawls=max_crawls, verbose=verbose, wait=wait, embedding=embedding)
+            annotate(documents=len(docs))
+            if messages is None:
+                return LOADING_MESSAGE, []
+            with span("llm"):
+                message = self.llm.invoke(messages)
+            response = message.content
+            tokens = output_tokens(message, len(response.split()))
+            LLM_TOKENS.inc(tokens)
+            annotate(tokens=tokens)
+            self.answer_cache.store(embedding, response, docs, version)
+            return response, docs
+
+    def generate_stream(self, query: str, k = 5, max_crawls = 3, verbose = True):
+        """
+        Versión en streaming de generate. Produce tuplas (evento, datos):
+        primero ("sources", documentos), luego ("token", texto) por cada fragmento
+        que emite el LLM y por último ("done", None)
+        """
+        with request_trace("generate_stream", query=query):
+            found = self.answer_from_ingredients(query, k=k)
+            if found:
+                answer, docs = found
+                yield "sources", docs
+                yield "token", answer
+                yield "done", None
+                return
+            embedding = self.embed_query(query)
+            version = self.doc_index.version
+            cached = self._cache_lookup(embedding, version)
+            if cached:
+                yield "sources", cached["sources"]
+                yield "token", cached["answer"]
+                yield "done", None
+                return
+
+            docs, messages = self.prepare(query, k=k, max_crawls=max_crawls, verbose=verbose, embedding=embedding)
+            annotate(documents=len(docs))
+            yield "sources", docs
+            if messages is None:
+                yield "token", LOADING_MESSAGE
+            else:
+                tokens = []
+                last = None
+                start = time.perf_counter()
+                with span("llm"):
+                    for chunk in self.llm.stream(messages):
+                        last = chunk
+                        if chunk.content:
+                            if not tokens:
+                                first_token = time.perf_counter() - start
+                                STAGE_SECONDS.observe(first_token, stage="first_token")
+                                annotate(first_token_ms=round(first_token * 1000, 3))
+                            tokens.append(chunk.content)
+                            yield "token", chunk.content
+                count = output_tokens(last, len(tokens))
+                LLM_TOKENS.inc(count)
+                annotate(tokens=count)
+                self.answer_cache.store(embedding, "".join(tokens), docs, version)
+            yield "done", None
+
+    def _cache_lookup(self, embedding, version) -> dict | None:
+        with span("cache_lookup"):
+            cached = self.answer_cache.lookup(embedding, version)
+        ANSWER_CACHE.inc(result="hit" if cached else "miss")
+        annotate(cached=bool(cached))
+        return cached
@@ -0,0 +1,287 @@
+import re
+import json
+import uuid
+import unicodedata
+from concurrent.futures import ThreadPoolExecutor
+from src.rag.doc_index import source_type
+from src.rag.metrics import Counter, span
+
+SHARDS = ("cookpad", "gourmet", "gutenberg", "unknown")
+
+SHARD_SEARCHES = Counter("forkpilot_shard_searches_total", "Búsquedas por shard", ("shard",))
+SHARD_SKIPPED = Counter("forkpilot_shard_skipped_total", "Shards descartados por el enrutado de la query", ("shard",))
+
+# los chunks de libros son largos y muy numerosos: se limitan para que no tapen las recetas
+DEFAULT_SHARD_SETTINGS = {
+    "cookpad": {},
+    "gourmet": {"quota": 3},
+    # la fecha de Gutenberg es la de publicación del ebook, no sirve como filtro de actualidad
+    "gutenberg": {"quota": 2, "min_date": None},
+    "unknown": {"quota": 2},
+}
+
+ROUTING_KEYWORDS = {
+    # "receta" no sirve: también aparece en las consultas sobre artículos y libros
+    "cookpad": {"ingrediente", "ingredientes", "casera", "casero", "paso", "pasos", "raciones", "rapida", "facil"},
+    "gourmet": {"tendencia", "tendencias", "restaurante", "restaurantes", "chef", "chefs", "vino", "vinos", "maridaje", "noticia", "noticias"},
+    "gutenberg": {"historia", "historica", "historico", "antigua", "antiguo", "siglo", "siglos", "libro", "libros", "clasica", "clasico", "tradicion", "origen"},
+}
+
+def shard_of(metadata: dict) -> str:
+    source = source_type(metadata)
+    return source if source in SHARDS else "unknown"
+
+
+class ShardSettings:
+    def __init__(self, quota: int = None, min_score: float = None, min_date: str = "", weight: float = 1.0):
+        """
+        Filtros y límites de un shard. quota limita cuántos documentos del shard entran
+        en el resultado; min_score y min_date sustituyen a los de retrieve (min_date=None
+        quita el filtro de fecha y "" usa el de retrieve); weight multiplica la puntuación
+        normalizada al mezclar con los demás shards
+        """
+        self.quota = quota
+        self.min_score = min_score
+        self.min_date = min_date
+        self.weight = weight
+
+
+class Router:
+    def __init__(self, keywords: dict = None):
+        """
+        Elige los shards relevantes para una query por palabras clave. Si la query no
+        contiene ninguna, o contiene de todos los shards, se buscan todos
+        """
+        self.keywords = ROUTING_KEYWORDS if keywords is None else keywords
+
+    def route(self, query: str, shards: list[str]) -> list[str]:
+        text = unicodedata.normalize("NFKD", query).encode("ascii", "ignore").decode("utf-8").lower()
+        words = set(re.findall(r"[a-z]+", text))
+        hits = [shard for shard in shards if words & self.keywords.get(shard, set())]
+        return hits or list(shards)
+
+
+class ShardedCollection:
+    def __init__(self, store):
+        """
+        Vista de las colecciones de todos los shards con la API de colección de Chroma
+        (get, count, add, upsert, update) que usan RAG, los índices y los benchmarks
+        """
+        self.store = store
+        # tamaño de cada shard con un filtro, para paginar sin contar en cada página;
+        # vale mientras el shard tenga el mismo número de documentos
+        self._sizes = {}
+
+    def count(self) -> int:
+        return sum(store._collection.count() for store in self.store.stores.values())
+
+    def get(self, ids: list[str] = None, where: dict = None, include: list[str] = None, limit: int = None, offset: int = 0) -> dict:
+        include = ["documents", "metadatas"] if include is None else include
+        keys = ["ids"] + list(include)
+        result = {key: [] for key in keys}
+        if ids is not None:
+            found = {}
+            for store in self.store.stores.values():
+                batch = store._collection.get(ids=ids, where=where, include=include)
+                for i, doc_id in enumerate(batch["ids"]):
+                    found[doc_id] = {key: batch[key][i] for key in keys}
+            rows = [found[doc_id] for doc_id in ids if doc_id in found][offset:offset + limit if limit else None]
+            return {key: [row[key] for row in rows] for key in keys}
+
+        # paginación continua a través de los shards, en orden
+        for shard, store in self.store.stores.items():
+            if limit is not None and len(result["ids"]) >= limit:
+                break
+            collection = store._collection
+            size = self._size(shard, collection, where)
+            if offset >= size:
+                offset -= size
+                continue
+            remaining = None if limit is None else limit - len(result["ids"])
+            batch = collection.get(where=where, include=include, limit=remaining, offset=offset)
+            for key in keys:
+                result[key].extend(batch[key])
+            offset = 0
+        return result
+
+    def _size(self, shard: str, collection, where: dict | None) -> int:
+        count = collection.count()
+        if where is None:
+            return count
+        key = (shard, json.dumps(where, sort_keys=True))
+        cached = self._sizes.get(key)
+        if cached is not None and cached[0] == count:
+            return cached[1]
+        size = len(collection.get(where=where, include=[])["ids"])
+        self._sizes[key] = (count, size)
+        return size
+
+    def add(self, ids: list[str], embeddings=None, documents: list[str] = None, metadatas: list[dict] = None):
+        self._routed("add", ids, embeddings, documents, metadatas)
+
+    def upsert(self, ids: list[str], embeddings=None, documents: list[str] = None, metadatas: list[dict] = None):
+        self._routed("upsert", ids, embeddings, documents, metadatas)
+
+    def update(self, ids: list[str], metadatas: list[dict]):
+        # los metadatos nuevos pueden cambiar qué documentos cumplen cada filtro
+        self._sizes.clear()
+        for store in self.store.stores.values():
+            existing = set(store._collection.get(ids=ids, include=[])["ids"])
+            rows = [(doc_id, meta) for doc_id, meta in zip(ids, metadatas) if doc_id in existing]
+            if rows:
+                store._collection.update(ids=[doc_id for doc_id, _ in rows], metadatas=[meta for _, meta in rows])
+
+    def _routed(self, method: str, ids, embeddings, documents, metadatas):
+        self._sizes.clear()
+        groups = {}
+        for i, meta in enumerate(metadatas):
+            groups.setdefault(shard_of(meta or {}), []).append(i)
+        for shard, rows in groups.items():
+            getattr(self.store.store(shard)._collection, method)(
+                ids=[ids[i] for i in rows],
+                embeddings=[embeddings[i] for i in rows] if embeddings is not None else None,
+                documents=[documents[i] for i in rows] if documents is not None else None,
+                metadatas=[metadatas[i] for i in rows],
+            )
+
+
+class ShardedVectorStore:
+    def __init__(self, factory, embeddings, shards: tuple = SHARDS, settings: dict = None, workers: int = None):
+        """
+        Un vector store por fuente (factory(nombre) lo crea). Los documentos se guardan
+        en el shard de su source_type y las búsquedas se lanzan en paralelo en los
+        shards elegidos, cada uno con su filtro de fecha, umbral y cupo
+        """
+        self.factory = factory
+        self.embeddings = embeddings
+        self.shards = tuple(shards)
+        self.settings = {name: ShardSettings(**(settings or DEFAULT_SHARD_SETTINGS).get(name, {})) for name in self.shards}
+        self.stores = {name: factory(name) for name in self.shards}
+        self._collection = ShardedCollection(self)
+        self._executor = ThreadPoolExecutor(max_workers=workers or len(self.shards), thread_name_prefix="shard")
+
+    def store(self, shard: str):
+        return self.stores[shard]
+
+    def _select_relevance_score_fn(self):
+        return next(iter(self.stores.values()))._select_relevance_score_fn()
+
+    def capacity(self, shards: list[str], k: int) -> int:
+        """
+        Cuántos documentos puede devolver como mucho una búsqueda de k en estos shards
+        con sus cupos
+        """
+        quotas = [self.settings[shard].quota for shard in shards]
+        return min(k, sum(k if quota is None else min(k, quota) for quota in quotas))
+
+    def apply_quotas(self, hits: list[tuple], k: int) -> list[tuple]:
+        """
+        Los k primeros (documento, puntuación) de hits, ordenados de mejor a peor, sin
+        pasar del cupo de cada shard
+        """
+        taken = {}
+        kept = []
+        for doc, score in hits:
+            shard = shard_of(doc.metadata)
+            quota = self.settings[shard].quota if shard in self.settings else None
+            if quota is not None and taken.get(shard, 0) >= quota:
+                continue
+            taken[shard] = taken.get(shard, 0) + 1
+            kept.append((doc, score))
+            if len(kept) >= k:
+                break
+        return kept
+
+    def add_documents(self, documents: list, ids: list[str] = None) -> list[str]:
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in documents]
+        groups = {}
+        for i, doc in enumerate(documents):
+            groups.setdefault(shard_of(doc.metadata), []).append(i)
+        for shard, rows in groups.items():
+            self.store(shard).add_documents([documents[i] for i in rows], ids=[ids[i] for i in rows])
+        return ids
+
+    def delete(self, ids: list[str] = None):
+        if not ids:
+            return
+        for store in self.stores.values():
+            store.delete(ids=ids)
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k: int = 4, filter: dict = None) -> list[tuple]:
+        """
+        Búsqueda en todos los shards con el mismo filtro, mezclada por distancia
+        """
+        futures = [
+            self._executor.submit(store.similarity_search_by_vector_with_relevance_scores, embedding, k=k, filter=filter)
+            for store in self.stores.values()
+        ]
+        hits = [hit for future in futures for hit in future.result()]
+        return sorted(hits, key=lambda hit: hit[1])[:k]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4, filter: dict = None) -> list:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)]
+
+    def search(self, embedding, k: int, shards: list[str], where_for, min_score: float, fetch_k: int, max_fetch: int) -> list[tuple]:
+        """
+        Busca en paralelo en los shards indicados y mezcla por puntuación normalizada:
+        (relevancia - umbral del shard) / (1 - umbral) por el peso del shard, respetando
+        los cupos. where_for(settings) devuelve el filtro de cada shard.
+        Devuelve (documento, puntuación normalizada) de mayor a menor
+        """
+        futures = {
+            shard: self._executor.submit(self._search_shard, shard, embedding, k, where_for(self.settings[shard]),
+                                         min_score, fetch_k, max_fetch)
+            for shard in shards
+        }
+        candidates = []
+        for shard, future in futures.items():
+            settings = self.settings[shard]
+            threshold = settings.min_score if settings.min_score is not None else min_score
+            for doc, score in future.result():
+                normalized = (score - threshold) / max(1 - threshold, 1e-6) * settings.weight
+                candidates.append((doc, normalized))
+        candidates.sort(key=lambda c: c[1], reverse=True)
+        return self.apply_quotas(candidates, k)
+
+    def _search_shard(self, shard: str, embedding, k: int, where: dict, min_score: float, fetch_k: int, max_fetch: int) -> list[tuple]:
+        """
+        Los documentos del shard sobre su umbral; como en RAG.retrieve, se piden más
+        candidatos (hasta max_fetch) mientras no haya k sobre el umbral
+        """
+        store = self.store(shard)
+        settings = self.settings[shard]
+        threshold = settings.min_score if settings.min_score is not None else min_score
+        k = min(k, settings.quota) if settings.quota is not None else k
+        relevance = store._select_relevance_score_fn()
+        SHARD_SEARCHES.inc(shard=shard)
+        with span(f"shard_search_{shard}"):
+            while True:
+                retrieved = [
+                    (doc, relevance(distance)) for doc, distance
+                    in store.similarity_search_by_vector_with_relevance_scores(embedding, k=fetch_k, filter=where)
+                ]
+                filtered = [(doc, score) for doc, score in retrieved if score >= threshold]
+                exhausted = len(retrieved) < fetch_k
+                below_threshold = bool(retrieved) and retrieved[-1][1] < threshold
+                if len(filtered) >= k or exhausted or below_threshold or fetch_k >= max_fetch:
+                    return filtered
+                fetch_k = min(fetch_k * 2, max_fetch)
+
+def migrate_collection(collection, sharded: ShardedVectorStore, batch_size: int = 1000) -> int:
+    """
+    Copia los chunks de una colección única a los shards, con sus embeddings
+    (sin volver a calcularlos). Devuelve la cantidad de chunks copiados
+    """
+    copied = 0
+    offset = 0
+    while True:
+        batch = collection.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+        if not len(batch["ids"]):
+            break
+        sharded._collection.upsert(
+            ids=list(batch["ids"]), embeddings=[list(map(float, e)) for e in batch["embeddings"]],
+            documents=list(batch["documents"]), metadatas=[meta or None for meta in batch["metadatas"]]
+        )
+        copied += len(batch["ids"])
+        offset += len(batch["ids"])
+    return copied
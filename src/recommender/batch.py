@@ -0,0 +1,189 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import numpy as np
+from src.recommender.profiles import DEFAULT_PROFILES_DIR, ProfileStore
+
+DEFAULT_CACHE_PATH = "./chroma_lan/recommendations.db"
+
+def source_of(metadata: dict) -> str | None:
+    """
+    Documento original de un chunk: el url o, para los ficheros locales, su ruta
+    """
+    return metadata.get("url") or metadata.get("source")
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+def load_documents(vector_store, batch_size: int = 5000) -> tuple[list[str], list[str], np.ndarray]:
+    """
+    Un vector por documento original (la media normalizada de sus chunks).
+    Devuelve (fuentes, títulos, matriz float32 con una fila por fuente)
+    """
+    collection = vector_store._collection
+    sums = {}
+    titles = {}
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not len(batch["ids"]):
+            break
+        for meta, embedding in zip(batch["metadatas"], batch["embeddings"]):
+            source = source_of(meta or {})
+            if not source:
+                continue
+            embedding = np.asarray(embedding, dtype=np.float32)
+            if source in sums:
+                sums[source] += embedding
+            else:
+                sums[source] = embedding.copy()
+                titles[source] = meta.get("title") or source
+        offset += len(batch["ids"])
+    sources = list(sums)
+    if not sources:
+        return [], [], np.zeros((0, 0), dtype=np.float32)
+    return sources, [titles[source] for source in sources], _normalize(np.stack([sums[source] for source in sources]))
+
+def seen_mask(users: list[str], sources: list[str], seen: list[tuple[str, str]]) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Documentos vistos por cada usuario en formato CSR: los índices de las fuentes
+    vistas por el usuario i son indices[indptr[i]:indptr[i + 1]]
+    """
+    user_rows = {user_id: i for i, user_id in enumerate(users)}
+    source_cols = {source: j for j, source in enumerate(sources)}
+    pairs = sorted(
+        (user_rows[user_id], source_cols[source]) for user_id, source in seen
+        if user_id in user_rows and source in source_cols
+    )
+    indices = np.fromiter((j for _, j in pairs), dtype=np.int64, count=len(pairs))
+    counts = np.bincount(np.fromiter((i for i, _ in pairs), dtype=np.int64, count=len(pairs)), minlength=len(users))
+    indptr = np.concatenate(([0], np.cumsum(counts)))
+    return indptr, indices
+
+def top_n(profiles: np.ndarray, documents: np.ndarray, indptr: np.ndarray, indices: np.ndarray,
+          n: int = 4, block_size: int = 1024) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Los n documentos más similares (coseno) a cada perfil sin contar los ya vistos.
+    Se multiplica un bloque de block_size usuarios por toda la matriz de documentos cada vez,
+    así la matriz de similitudes en memoria es de block_size x documentos.
+    Devuelve (índices, similitudes), ambos de forma usuarios x n; -1 donde no hay documento
+    """
+    profiles = _normalize(np.asarray(profiles, dtype=np.float32))
+    documents = np.asarray(documents, dtype=np.float32)
+    n_users = len(profiles)
+    k = min(n, len(documents))
+    best = np.full((n_users, n), -1, dtype=np.int64)
+    scores = np.full((n_users, n), -np.inf, dtype=np.float32)
+    if not k:
+        return best, scores
+    for start in range(0, n_users, block_size):
+        stop = min(start + block_size, n_users)
+        similarity = profiles[start:stop] @ documents.T
+        # máscara dispersa: solo se tocan las posiciones vistas de este bloque
+        rows = np.repeat(np.arange(stop - start), np.diff(indptr[start:stop + 1]))
+        similarity[rows, indices[indptr[start]:indptr[stop]]] = -np.inf
+        candidates = np.argpartition(-similarity, k - 1, axis=1)[:, :k]
+        candidate_scores = np.take_along_axis(similarity, candidates, axis=1)
+        order = np.argsort(-candidate_scores, axis=1)
+        block_best = np.take_along_axis(candidates, order, axis=1)
+        block_scores = np.take_along_axis(candidate_scores, order, axis=1)
+        valid = np.isfinite(block_scores)
+        best[start:stop, :k] = np.where(valid, block_best, -1)
+        scores[start:stop, :k] = block_scores
+    return best, scores
+
+
+class RecommendationCache:
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        """
+        Recomendaciones precalculadas por usuario (clave primaria en SQLite) para que
+        la app las lea con una sola consulta
+        """
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS recommendations (
+                user_id TEXT PRIMARY KEY,
+                items TEXT NOT NULL,
+                computed_at REAL NOT NULL
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def get(self, user_id: str) -> list[dict]:
+        """
+        Lista de {"title", "url", "score"} del usuario; vacía si no hay recomendaciones
+        """
+        with self._lock:
+            row = self.conn.execute("SELECT items FROM recommendations WHERE user_id = ?", (user_id,)).fetchone()
+        return json.loads(row[0]) if row else []
+
+    def put_many(self, items: dict[str, list[dict]]):
+        computed_at = time.time()
+        rows = [(user_id, json.dumps(recs, ensure_ascii=False), computed_at) for user_id, recs in items.items()]
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO recommendations (user_id, items, computed_at) VALUES (?, ?, ?)", rows)
+
+    def close(self):
+        self.conn.close()
+
+def run_batch(profiles: ProfileStore, vector_store, cache: RecommendationCache, n: int = 4, days_limit: float = 7,
+              block_size: int = 1024) -> dict:
+    """
+    Calcula las recomendaciones de todos los usuarios activos y las guarda en la caché.
+    Devuelve un resumen con tiempos
+    """
+    start = time.perf_counter()
+    users, matrix = profiles.snapshot(max_age_days=days_limit)
+    sources, titles, documents = load_documents(vector_store)
+    loaded = time.perf_counter()
+    if not users or not sources:
+        return {"users": len(users), "documents": len(sources), "seconds": loaded - start}
+
+    indptr, indices = seen_mask(users, sources, profiles.seen())
+    best, scores = top_n(matrix, documents, indptr, indices, n=n, block_size=block_size)
+    computed = time.perf_counter()
+
+    cache.put_many({
+        user_id: [
+            {"title": titles[j], "url": sources[j], "score": round(float(score), 4)}
+            for j, score in zip(best[i], scores[i]) if j >= 0
+        ]
+        for i, user_id in enumerate(users)
+    })
+    return {
+        "users": len(users),
+        "documents": len(sources),
+        "load_seconds": loaded - start,
+        "topn_seconds": computed - loaded,
+        "seconds": time.perf_counter() - start,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Precalcula las recomendaciones de todos los usuarios")
+    parser.add_argument("--persist-directory", default="./chroma_lan")
+    parser.add_argument("--collection", default="gastronomia")
+    parser.add_argument("--profiles", default=DEFAULT_PROFILES_DIR)
+    parser.add_argument("--cache", default=DEFAULT_CACHE_PATH)
+    parser.add_argument("--n", type=int, default=4, help="recomendaciones por usuario")
+    parser.add_argument("--days", type=float, default=7, help="solo usuarios con queries en los últimos días")
+    parser.add_argument("--block-size", type=int, default=1024, help="usuarios por multiplicación de matrices")
+    args = parser.parse_args(argv)
+
+    # el vector store de RAG: con los shards por fuente se leen todas sus colecciones
+    from src.rag.rag_model import RAG
+    vector_store = RAG(persist_directory=args.persist_directory, collection_name=args.collection).vector_store
+    summary = run_batch(ProfileStore(args.profiles), vector_store, RecommendationCache(args.cache),
+                        n=args.n, days_limit=args.days, block_size=args.block_size)
+    print(json.dumps(summary, indent=2))
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
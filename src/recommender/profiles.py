@@ -0,0 +1,192 @@
+import os
+import time
+import sqlite3
+import threading
+import numpy as np
+
+DEFAULT_PROFILES_DIR = "./chroma_lan/profiles"
+
+
+class ProfileStore:
+    def __init__(self, directory: str = DEFAULT_PROFILES_DIR, half_life_days: float = 3.5, initial_rows: int = 64):
+        """
+        Perfiles de usuario: una media de los embeddings de sus queries en la que cada
+        query pierde la mitad de su peso cada half_life_days. Los vectores están en una
+        matriz float32 de NumPy mapeada en memoria (una fila por usuario) y el índice
+        usuario -> fila, con el peso y la fecha de la última query, en SQLite
+        """
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.matrix_path = os.path.join(directory, "profiles.npy")
+        self.half_life = half_life_days * 86400
+        self.initial_rows = initial_rows
+        self._lock = threading.Lock()
+        self._matrix = None
+        self._inode = None
+        self.conn = sqlite3.connect(os.path.join(directory, "profiles.db"), check_same_thread=False, timeout=30)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS users (
+                user_id TEXT PRIMARY KEY,
+                row INTEGER NOT NULL UNIQUE,
+                weight REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                queries INTEGER NOT NULL
+            )
+        """)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS seen (
+                user_id TEXT NOT NULL,
+                source TEXT NOT NULL,
+                PRIMARY KEY (user_id, source)
+            ) WITHOUT ROWID
+        """)
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self.conn.execute("SELECT COUNT(*) FROM users").fetchone()[0]
+
+    def update(self, user_id: str, embedding, timestamp: float = None):
+        """
+        Añade una query al perfil del usuario en O(dim): el perfil anterior se pondera
+        con su peso decaído hasta timestamp y la query nueva con peso 1
+        """
+        embedding = np.asarray(embedding, dtype=np.float32)
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock, self.conn:
+            self.conn.execute("BEGIN IMMEDIATE")
+            found = self.conn.execute("SELECT row, weight, updated_at, queries FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if found:
+                row, weight, updated_at, queries = found
+                matrix = self._writable(row + 1, len(embedding))
+                weight *= self._decay(timestamp - updated_at)
+                matrix[row] = (matrix[row] * weight + embedding) / (weight + 1)
+            else:
+                row = self.conn.execute("SELECT COALESCE(MAX(row) + 1, 0) FROM users").fetchone()[0]
+                weight, queries = 0.0, 0
+                matrix = self._writable(row + 1, len(embedding))
+                matrix[row] = embedding
+            matrix.flush()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO users (user_id, row, weight, updated_at, queries) VALUES (?, ?, ?, ?, ?)",
+                (user_id, row, weight + 1, max(timestamp, found[2]) if found else timestamp, queries + 1)
+            )
+
+    def mark_seen(self, user_id: str, sources):
+        """
+        Guarda los documentos (url o ruta) que el usuario ya vio para no recomendárselos
+        """
+        rows = [(user_id, source) for source in sources if source]
+        if not rows:
+            return
+        with self._lock, self.conn:
+            self.conn.executemany("INSERT OR IGNORE INTO seen (user_id, source) VALUES (?, ?)", rows)
+
+    def seen(self, user_id: str = None) -> list[tuple[str, str]]:
+        """
+        Pares (usuario, documento visto), de un usuario o de todos
+        """
+        with self._lock:
+            if user_id is None:
+                return self.conn.execute("SELECT user_id, source FROM seen").fetchall()
+            return self.conn.execute("SELECT user_id, source FROM seen WHERE user_id = ?", (user_id,)).fetchall()
+
+    def get(self, user_id: str, max_age_days: float = None) -> np.ndarray | None:
+        """
+        Vector del perfil; None si el usuario no tiene queries o la última es
+        más antigua que max_age_days
+        """
+        with self._lock:
+            found = self.conn.execute("SELECT row, updated_at FROM users WHERE user_id = ?", (user_id,)).fetchone()
+            if not found:
+                return None
+            row, updated_at = found
+            if max_age_days is not None and time.time() - updated_at > max_age_days * 86400:
+                return None
+            matrix = self._readable(row + 1)
+            return np.array(matrix[row])
+
+    def snapshot(self, max_age_days: float = None) -> tuple[list[str], np.ndarray]:
+        """
+        Todos los perfiles (activos en los últimos max_age_days) como (usuarios, matriz)
+        """
+        query = "SELECT user_id, row FROM users"
+        params = ()
+        if max_age_days is not None:
+            query += " WHERE updated_at >= ?"
+            params = (time.time() - max_age_days * 86400,)
+        with self._lock:
+            users = self.conn.execute(query + " ORDER BY row", params).fetchall()
+            if not users:
+                return [], np.zeros((0, 0), dtype=np.float32)
+            rows = np.fromiter((row for _, row in users), dtype=np.int64, count=len(users))
+            matrix = self._readable(int(rows[-1]) + 1)
+            return [user_id for user_id, _ in users], np.asarray(matrix[rows])
+
+    def close(self):
+        self.conn.close()
+        self._matrix = None
+
+    def _decay(self, elapsed: float) -> float:
+        return 0.5 ** (max(elapsed, 0) / self.half_life)
+
+    def _reopen_if_replaced(self):
+        # otro proceso pudo agrandar la matriz, que se reemplaza por un archivo nuevo
+        try:
+            inode = os.stat(self.matrix_path).st_ino
+        except FileNotFoundError:
+            self._matrix = self._inode = None
+            return
+        if self._matrix is None or inode != self._inode:
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+            self._inode = inode
+
+    def _readable(self, rows: int) -> np.ndarray:
+        self._reopen_if_replaced()
+        if self._matrix is None or self._matrix.shape[0] < rows:
+            raise RuntimeError(f"La matriz de perfiles {self.matrix_path} no tiene {rows} filas")
+        return self._matrix
+
+    def _writable(self, rows: int, dim: int) -> np.ndarray:
+        self._reopen_if_replaced()
+        if self._matrix is None:
+            self._matrix = self._create(self.matrix_path, max(rows, self.initial_rows), dim)
+        elif self._matrix.shape[1] != dim:
+            raise ValueError(f"Dimensión {dim} distinta de la de los perfiles ({self._matrix.shape[1]})")
+        elif self._matrix.shape[0] < rows:
+            tmp_path = f"{self.matrix_path}.{os.getpid()}.tmp"
+            grown = self._create(tmp_path, max(rows, 2 * self._matrix.shape[0]), dim)
+            grown[:self._matrix.shape[0]] = self._matrix
+            grown.flush()
+            del grown
+            os.replace(tmp_path, self.matrix_path)
+            self._matrix = np.load(self.matrix_path, mmap_mode="r+")
+        self._inode = os.stat(self.matrix_path).st_ino
+        return self._matrix
+
+    @staticmethod
+    def _create(path: str, rows: int, dim: int) -> np.ndarray:
+        return np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(rows, dim))
+
+def rebuild_profiles(query_store, profiles: ProfileStore, batch_size: int = 1000) -> int:
+    """
+    Reconstruye los perfiles a partir del historial de queries guardado en query_store,
+    en orden cronológico. Devuelve la cantidad de queries procesadas
+    """
+    from datetime import datetime
+    collection = getattr(query_store, "_collection", query_store)
+    history = []
+    offset = 0
+    while True:
+        batch = collection.get(include=["metadatas", "embeddings"], limit=batch_size, offset=offset)
+        if not len(batch["ids"]):
+            break
+        for meta, embedding in zip(batch["metadatas"], batch["embeddings"]):
+            if meta and meta.get("user_id") and meta.get("date"):
+                history.append((datetime.fromisoformat(meta["date"]).timestamp(), meta["user_id"], embedding))
+        offset += len(batch["ids"])
+    history.sort(key=lambda item: item[0])
+    for timestamp, user_id, embedding in history:
+        profiles.update(user_id, embedding, timestamp)
+    return len(history)
@@ -1,44 +1,40 @@
 from datetime import datetime
-import numpy as np
+from src.recommender.profiles import ProfileStore
+from src.recommender.batch import source_of
 
 class Recommender:
-    def __init__(self, user_id, query_store, vector_store, n_recommendations=4, days_limit=7):
+    def __init__(self, user_id, query_store, vector_store, n_recommendations=4, days_limit=7, profiles: ProfileStore = None):
+        """
+        Recomienda documentos a partir del perfil del usuario: la media de los embeddings
+        de sus queries con decaimiento temporal, que se actualiza en cada store_query.
+        Sin queries en los últimos days_limit días no hay recomendaciones
+        """
         self.user_id = user_id
         self.query_store = query_store  
         self.vector_store = vector_store  
         self.n_recommendations = n_recommendations
         self.days_limit = days_limit
+        self.profiles = profiles or ProfileStore(half_life_days=days_limit / 2)
+        # lo ya recomendado en esta sesión; los documentos usados se guardan en profiles
         self.seen_docs = set()
 
     def store_query(self, query, used_docs):
-            embedding = self.query_store._embedding_function.embed_query(query)
-            self.query_store.add_texts(
-                texts=[query],
-                metadatas=[{
-                    "user_id": self.user_id,
-                    "query_text": query,
-                    "date": str(datetime.now()),
-                    "used_docs": ", ".join(used_docs)
-                }],
-                embeddings=[embedding]
-            )
-            self.seen_docs.update(used_docs)
+        embedding = self.query_store._embedding_function.embed_query(query)
+        self.query_store.add_texts(
+            texts=[query],
+            metadatas=[{
+                "user_id": self.user_id,
+                "query_text": query,
+                "date": str(datetime.now()),
+                "used_docs": ", ".join(used_docs)
+            }],
+            embeddings=[embedding]
+        )
+        self.profiles.update(self.user_id, embedding)
+        self.profiles.mark_seen(self.user_id, used_docs)
             
     def get_user_embedding(self):
-        user_queries = self.query_store.get(where={"user_id": self.user_id}, include=["metadatas", "embeddings"])
-        if not user_queries["metadatas"]:
-            return None
-
-        recent_embeddings = []
-        for metadata, emb in zip(user_queries["metadatas"], user_queries["embeddings"]):
-            query_date = datetime.fromisoformat(metadata["date"])
-            if (datetime.now() - query_date).days <= self.days_limit:
-                recent_embeddings.append(emb)
-
-        if not recent_embeddings:
-            return None
-
-        return np.mean(recent_embeddings, axis=0)
+        return self.profiles.get(self.user_id, max_age_days=self.days_limit)
     
     def recommend(self):
         user_profile = self.get_user_embedding()
@@ -47,10 +43,11 @@ class Recommender:
 
         all_docs = self.vector_store.similarity_search_by_vector(user_profile.tolist(), k=100)
         recommendations = []
-        seen_sources = self.seen_docs
+        # los vistos se leen del almacén de perfiles para que valgan tras reiniciar y en todos los workers
+        seen_sources = {source for _, source in self.profiles.seen(self.user_id)} | self.seen_docs
 
         for doc in all_docs:
-            src = doc.metadata.get("source")
+            src = source_of(doc.metadata)
             if src not in seen_sources:
                 similarity = doc.metadata.get("score", None)
                 recommendations.append((doc, similarity))
@@ -59,11 +56,12 @@ class Recommender:
 
         if len(recommendations) < self.n_recommendations:
             remaining = self.n_recommendations - len(recommendations)
+            recommended = {source_of(d.metadata) for d, _ in recommendations}
             fallback = [
                 (doc, doc.metadata.get("score", None)) for doc in all_docs
-                if doc.metadata.get("source") not in [d.metadata.get("source") for d, _ in recommendations]
+                if source_of(doc.metadata) not in recommended
             ][:remaining]
             recommendations.extend(fallback)
 
-        self.seen_docs.update(doc.metadata["source"] for doc, _ in recommendations)
+        self.seen_docs.update(source_of(doc.metadata) for doc, _ in recommendations)
         return recommendations
\ No newline at end of file
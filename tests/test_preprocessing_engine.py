@@ -0,0 +1,123 @@
+import random
+import pytest
+from src.preprocessing.engine import clean_gourmet, clean_gutenberg, clean_many
+from src.preprocessing.gourmet import cleaned_text, cleaned_text_stepwise
+from src.preprocessing.gutenberg import clean_text, clean_text_stepwise
+
+BOOK = """The Project Gutenberg eBook of Cocina Española
+
+Título: La cocina española antigua
+Autora: Emilia Pardo Bazán
+
+PREFACE
+
+Capítulo I. — Sopas y potajes: «caldo gallego», ¡olla podrida!
+Section 12 Receta núm. 3: 500 g de garbanzos; 2 chorizos & 1 morcilla...
+    Se cuece todo a fuego lento (unas 3 horas).
+
+*** END OF THE PROJECT GUTENBERG EBOOK COCINA ESPAÑOLA ***
+START: FULL LICENSE
+Términos de la licencia.
+"""
+
+ARTICLE = """Las 5 tendencias gastronómicas del año
+
+El chef Dabiz Muñoz (@GourmetJournal) presenta su menú “degustación” — 12 platos.
+Más info: https://gourmetjournal.example/tendencias?utm=1 y http://t.co/xyz
+
+
+Precio: 250 € por persona; ¿merece la pena?
+Descubre más en nuestra newsletter semanal.
+Ver: otras recetas
+Síguenos en Instagram
+P.D. no olvides reservar
+"""
+
+EDGE_CASES = [
+    "",
+    " ",
+    "\n\n\t  \n",
+    "preface",
+    "contents",
+    "table of contents",
+    "PREFACE\nCONTENTS\nTABLE OF CONTENTS",
+    "texto sin marcas",
+    "ñandú, pingüino y café",
+    "🍕🍝 emojis y símbolos ©®™ ½ ¼",
+    "section 1section2 section 33",
+    "end of the project gutenberg ebook",
+    "start: full license",
+    "línea 1\r\nlínea 2\rlínea 3",
+    "a b c​d",
+    "contents preface table of contents",
+    "pre face con tents",
+    "x" * 1000,
+]
+
+# piezas con las que se generan textos aleatorios: marcas, unicode y separadores
+PIECES = [
+    "preface", "Preface", "CONTENTS", "table of contents", "section 4", "Section12",
+    "end of the project gutenberg ebook", "START: FULL LICENSE", "P.D.", "Ver:", "Síguenos en",
+    "Descubre más en", "https://example.com/a?b=1", "@gourmetjournal", "ñ", "á", "€", "—", "«", "»",
+    "\n", "\n\n", "\t", " ", "  ", ",", ".", ":", "-", "_", "!", "?", "(", ")", "receta", "pollo", "123",
+]
+
+def random_texts(n: int, seed: int = 0, length: int = 40) -> list[str]:
+    rng = random.Random(seed)
+    return ["".join(rng.choice(PIECES) for _ in range(rng.randint(0, length))) for _ in range(n)]
+
+
+@pytest.mark.parametrize("text", [BOOK, ARTICLE, *EDGE_CASES])
+def test_clean_gutenberg_matches_stepwise(text):
+    assert clean_gutenberg(text) == clean_text_stepwise(text)
+    assert clean_text(text) == clean_text_stepwise(text)
+
+
+@pytest.mark.parametrize("text", [BOOK, ARTICLE, *EDGE_CASES])
+def test_clean_gourmet_matches_stepwise(text):
+    assert clean_gourmet(text) == cleaned_text_stepwise(text)
+    assert cleaned_text(text) == cleaned_text_stepwise(text)
+
+
+def test_random_texts_match_stepwise():
+    for text in random_texts(500):
+        assert clean_gutenberg(text, header_window=None, footer_window=None) == clean_text_stepwise(text)
+        assert clean_gourmet(text) == cleaned_text_stepwise(text)
+
+
+def test_gutenberg_without_windows_matches_stepwise():
+    # con las marcas en mitad del libro solo la versión sin ventanas es idéntica
+    text = "capitulo 1\n" * 50 + "preface\n" + "receta\n" * 50 + "end of the project gutenberg ebook\n" + "receta\n" * 50
+    assert clean_gutenberg(text, header_window=None, footer_window=None) == clean_text_stepwise(text)
+
+
+def test_markers_inside_windows_match_stepwise():
+    # libro más largo que las ventanas, con las marcas en el principio y el final
+    body = "se mezcla la harina con el agua.\n" * 200
+    text = "titulo\ncontents\nindice\npreface\n" + body + "end of the project gutenberg ebook\nlicencia\n"
+    assert len(text) > 2 * 500
+    assert clean_gutenberg(text, header_window=500, footer_window=500) == clean_text_stepwise(text)
+
+
+def test_footer_window_starts_at_line_start():
+    # la ventana del pie empieza a mitad de la línea de la marca: se amplía hasta su inicio
+    body = "paso.\n" * 300
+    text = "preface\n" + body + "end of the project gutenberg ebook y la licencia\n"
+    window = len("gutenberg ebook y la licencia\n")
+    assert clean_gutenberg(text, footer_window=window) == clean_text_stepwise(text)
+
+
+def test_markers_outside_windows_are_kept():
+    # las marcas fuera de las ventanas no se buscan (a diferencia de la versión paso a paso)
+    filler = "receta de pan.\n" * 100
+    text = filler + "preface\n" + filler + "end of the project gutenberg ebook\n" + filler
+    cleaned = clean_gutenberg(text, header_window=100, footer_window=100)
+    assert "preface" in cleaned
+    assert "end of the project gutenberg ebook" in cleaned
+    assert clean_gutenberg(text, header_window=None, footer_window=None) == clean_text_stepwise(text)
+
+
+@pytest.mark.parametrize("kind, stepwise", [("gutenberg", clean_text_stepwise), ("gourmet", cleaned_text_stepwise)])
+def test_clean_many_keeps_order(kind, stepwise):
+    texts = [BOOK, ARTICLE, *EDGE_CASES]
+    assert clean_many(texts, kind=kind, processes=1) == [stepwise(text) for text in texts]